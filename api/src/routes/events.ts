@@ -21,33 +21,35 @@ const r = Router();
  *   tags?: string[]
  * }
  */
-r.post("/", async (req, res) => {
-  try {
-    const body = req.body || {};
-    const { camera_id, event_type } = body;
-    if (!camera_id || !event_type) {
-      return res.status(400).json({ ok: false, error: "camera_id and event_type are required" });
-    }
+type Normalized = { doc?: any; error?: string };
 
-    // Normalize ts_utc -> Date
-    const tsRaw = body.ts_utc ?? Date.now();
-    let ts: Date | null = null;
-    if (typeof tsRaw === "number") {
-      // seconds or ms
-      ts = new Date(tsRaw < 2e10 ? tsRaw * 1000 : tsRaw);
-    } else if (typeof tsRaw === "string") {
-      const d = dayjs(tsRaw);
-      if (!d.isValid()) {
-        return res.status(400).json({ ok: false, error: "invalid ts_utc" });
-      }
-      ts = d.toDate();
-    } else if (tsRaw instanceof Date) {
-      ts = tsRaw;
-    } else {
-      ts = new Date();
+function normalizeEvent(body: any): Normalized {
+  body = body || {};
+  const { camera_id, event_type } = body;
+  if (!camera_id || !event_type) {
+    return { error: "camera_id and event_type are required" };
+  }
+
+  // Normalize ts_utc -> Date
+  const tsRaw = body.ts_utc ?? Date.now();
+  let ts: Date | null = null;
+  if (typeof tsRaw === "number") {
+    // seconds or ms
+    ts = new Date(tsRaw < 2e10 ? tsRaw * 1000 : tsRaw);
+  } else if (typeof tsRaw === "string") {
+    const d = dayjs(tsRaw);
+    if (!d.isValid()) {
+      return { error: "invalid ts_utc" };
     }
+    ts = d.toDate();
+  } else if (tsRaw instanceof Date) {
+    ts = tsRaw;
+  } else {
+    ts = new Date();
+  }
 
-    const doc = await Event.create({
+  return {
+    doc: {
       ts_utc: ts,
       camera_id,
       event_type,
@@ -58,7 +60,18 @@ r.post("/", async (req, res) => {
       artifacts: body.artifacts ?? {},
       explanation: body.explanation,
       tags: body.tags ?? []
-    });
+    }
+  };
+}
+
+r.post("/", async (req, res) => {
+  try {
+    const { doc: data, error } = normalizeEvent(req.body);
+    if (error) {
+      return res.status(400).json({ ok: false, error });
+    }
+
+    const doc = await Event.create(data);
 
     return res.status(201).json({ ok: true, id: doc._id, event: doc });
   } catch (e: any) {
@@ -67,6 +80,35 @@ r.post("/", async (req, res) => {
   }
 });
 
+/**
+ * CREATE MANY EVENTS
+ * POST /events/batch
+ * Body: { events: Event[] } (same shape as POST /events) or a bare array.
+ * Invalid items are skipped and reported; valid ones are inserted together.
+ */
+r.post("/batch", async (req, res) => {
+  try {
+    const items: any[] = Array.isArray(req.body) ? req.body : req.body?.events;
+    if (!Array.isArray(items)) {
+      return res.status(400).json({ ok: false, error: "events array is required" });
+    }
+
+    const docs: any[] = [];
+    const rejected: Array<{ index: number; error: string }> = [];
+    items.forEach((item, index) => {
+      const { doc, error } = normalizeEvent(item);
+      if (error) rejected.push({ index, error });
+      else docs.push(doc);
+    });
+
+    const inserted = docs.length ? await Event.insertMany(docs) : [];
+    return res.status(201).json({ ok: true, inserted: inserted.length, rejected });
+  } catch (e: any) {
+    console.error(e);
+    return res.status(500).json({ ok: false, error: e?.message || "error" });
+  }
+});
+
 /**
  * ATTACH A CLIP TO A NEARBY EVENT (±5s)
  * POST /events/attach
@@ -1,9 +1,10 @@
 # cv-worker/app.py
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-import os, time, threading, queue, yaml
+import threading, time
 import cv2
 import numpy as np
-from fastapi import FastAPI, Response, HTTPException
+from fastapi import Body, FastAPI, Request, Response, HTTPException
 from fastapi.responses import StreamingResponse, JSONResponse
 from starlette.background import BackgroundTask
 from fastapi.middleware.cors import CORSMiddleware
@@ -13,28 +14,14 @@ try:
 except Exception:
     pass
 
-from detectors.yolo import YoloDetector
-from tracking.simple_tracker import CentroidTracker
-from utils.zones import Zones
+from detectors.service import InferenceService
 from utils.bus import EventBus
-from features.intrusion import IntrusionDetector
-from features.loitering import LoiteringDetector
-from features.abandoned import AbandonedDetector
-from features.tamper import TamperDetector
-from features.fall import FallDetector
-from features.violence_proxy import ViolenceProxy
-from utils.ringbuffer import RingBuffer
-from utils.clipwriter import ClipWriter
-from utils.heatmap import HeatmapAccumulator
-
-def iso_utc(ts):
-    if isinstance(ts, (int, float)):
-        return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat(timespec="milliseconds").replace("+00:00","Z")
-    if isinstance(ts, str):
-        return ts
-    return datetime.now(tz=timezone.utc).isoformat(timespec="milliseconds").replace("+00:00","Z")
-
-CFG = yaml.safe_load(open("config.yaml", "r", encoding="utf-8"))
+from utils.heatmap import HeatmapRenderCache, render_grid
+from utils.governor import FpsGovernor
+from utils import config as cfgutil
+from worker import CFG, CONFIG_PATH, CameraWorker, iso_utc, make_event_bus, make_governor, make_inference, make_worker
+from workerproc import WorkerProcesses
+
 app = FastAPI()
 app.add_middleware(
     CORSMiddleware,
@@ -44,206 +31,345 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-class CameraWorker(threading.Thread):
-    def __init__(self, cam_id: str, source, yolo_cfg, overlay_cfg, fps_cap=15, zones_cfg=None, api_url="http://localhost:8080", clips_dir="C:/Hackathons/HoneyWell/clips"):
-        super().__init__(daemon=True)
-        self.id = cam_id
-        self.last_frame = None
-        self.current_occupancy = 0
-
-        if isinstance(source, int):
-            self.cap = cv2.VideoCapture(source, cv2.CAP_DSHOW)
-        else:
-            self.cap = cv2.VideoCapture(source)
-        if not self.cap.isOpened():
-            raise RuntimeError(f"[{cam_id}] Could not open camera/video source: {source}")
-
-        tconf = (CFG.get("tamper") or {})
-        self.tamper = TamperDetector(
-            warmup_frames=tconf.get("warmup_frames", 60),
-            persist_frames=tconf.get("persist_frames", 15),
-            cooldown_seconds=tconf.get("cooldown_seconds", 10.0),
-            blur_drop_ratio=tconf.get("blur_drop_ratio", 0.15),
-            abs_blur_floor=tconf.get("abs_blur_floor", 8.0),
-            freeze_seconds=tconf.get("freeze_seconds", 60),
-            hist_flat_thr=tconf.get("hist_flat_thr", 0.990),
-            ema_alpha=tconf.get("ema_alpha", 0.05),
-        )
-        self.det = YoloDetector(weights=yolo_cfg["weights"], conf=yolo_cfg.get("conf",0.35), iou=yolo_cfg.get("iou",0.45), classes=yolo_cfg.get("classes"))
-        self.trk = CentroidTracker(max_lost=15, dist_thr=80.0)
-        self.overlay_cfg = overlay_cfg
-
-        self.frame_q = queue.Queue(maxsize=5)
-        self.fps_cap = int(fps_cap)
-        self._stop = False
-
-        self.zones = Zones(zones_cfg or [])
-
-        self.features = [
-            IntrusionDetector(zones_cfg or []),
-            LoiteringDetector(zones_cfg or []),
-            AbandonedDetector(T_seconds=8, owner_dist=180.0),
-            FallDetector(),
-            ViolenceProxy()
-        ]
-        self.bus = EventBus(api_url=api_url)
-
-        # pre-roll buffer; keep post-roll = 0 to avoid stalls
-        self.pre_seconds = 7
-        self.post_seconds = 0
-        self.rbuf = RingBuffer(seconds=self.pre_seconds, fps=self.fps_cap)
-
-        w = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 640
-        h = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 480
-        self.heatmap = HeatmapAccumulator(width=w, height=h, decay_per_sec=0.15, blur_ksize=35)
-
-        self.writer = ClipWriter(out_dir=clips_dir, fps=self.fps_cap, width=w, height=h)
-
-    def stop(self):
-        self._stop = True
-        try:
-            if self.cap and self.cap.isOpened():
-                self.cap.release()
-        except Exception:
-            pass
-
-    def run(self):
-        last = 0.0
-        period = 1.0 / max(1, self.fps_cap)
-
-        while not self._stop:
-            ok, frame = self.cap.read()
-            if not ok:
-                time.sleep(0.05); continue
-
-            now = time.time()
-            if now - last < period:
-                time.sleep(max(0, period - (now - last)))
-                now = time.time()
-            last = now
-
-            # push to pre-roll
-            self.rbuf.push(now, frame)
-
-            # tamper feature may emit events
-            for ev in self.tamper.step_frame(frame, now, self.id):
-                self.bus.post_event(ev)
-
-            # detect + track
-            dets = self.det.infer(frame)
-            tracks = self.trk.update(dets)
-
-            # occupancy
-            self.current_occupancy = sum(
-                1 for t in tracks if t.get("class_name","") == "person" or t.get("class_id", -1) in (0,)
-            )
-
-            # heatmap
-            person_boxes = []
-            for t in tracks:
-                if t.get("class_name","") == "person" or t.get("class_id", -1) in (0,):
-                    x1,y1,x2,y2 = map(int, t["xyxy"])
-                    person_boxes.append((x1,y1,x2,y2))
-            self.heatmap.step_decay()
-            if person_boxes:
-                self.heatmap.add_boxes(person_boxes, strength=1.0)
-
-            # features → events
-            event_batch = []
-            for f in self.features:
-                event_batch.extend(f.step(tracks, now, self.id))
-
-            # overlays
-            out = frame.copy()
-            self.last_frame = out
-            if self.overlay_cfg.get("show_zones", True):
-                out = self.zones.draw(out)
-            for t in tracks:
-                x1,y1,x2,y2 = map(int, t["xyxy"])
-                cv2.rectangle(out, (x1,y1), (x2,y2), (0,200,255), 2)
-                lbl = f'{t["class_name"]}#{t["track_id"]}'
-                cv2.putText(out, lbl, (x1, max(20,y1-6)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255,255,255), 2, cv2.LINE_AA)
-
-            if self.frame_q.full():
-                try: self.frame_q.get_nowait()
-                except: pass
-            self.frame_q.put(out)
-
-            # >>> sync clip write + single POST that already includes clip (stable)
-            if event_batch:
-                pre_frames = self.rbuf.dump()
-                post_frames = []
-                target = now + self.post_seconds
-                while time.time() < target and not self._stop:
-                    ok2, fr2 = self.cap.read()
-                    if not ok2: break
-                    ts2 = time.time()
-                    post_frames.append((ts2, fr2))
-                    if self.frame_q.full():
-                        try: self.frame_q.get_nowait()
-                        except: pass
-                    self.frame_q.put(fr2)
-
-                for ev in event_batch:
-                    eid = ev["event_type"]
-                    name = self.writer.write_sync(self.id, eid, pre_frames, post_frames)
-                    ev.setdefault("artifacts", {})
-                    ev["artifacts"]["clip_mp4"] = f"http://localhost:8080/media/{name}"
-                    # ensure ISO time
-                    ev["ts_utc"] = iso_utc(ev.get("ts_utc", now))
-                    self.bus.post_event(ev)
-
 # ---------- Multi-camera orchestrator ----------
-workers: dict[str, CameraWorker] = {}
+# Startup returns at once: the model loads (and warms up) on one background
+# thread while cameras open in parallel on a small pool; each worker starts
+# as soon as both its source and the model are ready. camera_state tracks
+# every configured camera: opening -> [waiting_model ->] ready | failed.
+workers: dict[str, CameraWorker] = {}  # RemoteCamera stand-ins in processes mode
+infer_service: InferenceService = None
+event_bus: EventBus = None
+governor: FpsGovernor = None
+procs: WorkerProcesses = None
+
+camera_cfgs: dict[str, dict] = {}    # cam_id -> camera config (config.yaml + runtime additions)
+camera_state: dict[str, dict] = {}   # cam_id -> {"state", "error", "since"}
+model_state = {"state": "pending", "error": None, "load_ms": None}
+_model_ready = threading.Event()
+_waiting: dict[str, tuple] = {}      # opened cameras waiting for the model
+_orch_lock = threading.RLock()
+_opener: ThreadPoolExecutor = None
+
+def _set_state(cam_id: str, state: str, error: str = None):
+    camera_state[cam_id] = {"state": state, "error": error, "since": iso_utc(time.time())}
+
+def start_inference():
+    global infer_service
+    model_state["state"] = "loading"
+    t0 = time.perf_counter()
+    try:
+        infer_service = make_inference(warmup=(CFG.get("startup") or {}).get("warmup", True))
+        model_state.update(state="ready", load_ms=round((time.perf_counter() - t0) * 1000.0))
+    except Exception as e:
+        model_state.update(state="failed", error=str(e))
+        print(f"[cv] model failed to load: {e}")
+    with _orch_lock:
+        _model_ready.set()
+        waiting = list(_waiting.values())
+        _waiting.clear()
+        for cam, worker in waiting:
+            _activate(cam, worker)
+
+def _activate(cam: dict, worker: CameraWorker):
+    """Start an opened worker on the shared model (caller holds _orch_lock)."""
+    cam_id = cam["id"]
+    if infer_service is None:
+        worker.stop()
+        _set_state(cam_id, "failed", "model failed to load")
+        return
+    worker.det = infer_service
+    workers[cam_id] = worker
+    if governor is not None:
+        governor.register(worker)
+    worker.start()
+    _set_state(cam_id, "ready")
+    print(f"[cv] started worker for {cam_id} (source={cam['source']})")
+
+def _bring_up(cam: dict):
+    """Open one camera on the pool; it starts now or once the model is loaded."""
+    cam_id = cam["id"]
+    try:
+        worker = make_worker(cam, None, event_bus)
+    except Exception as e:
+        with _orch_lock:
+            if camera_cfgs.get(cam_id) is cam:
+                _set_state(cam_id, "failed", str(e))
+        print(f"[cv] {cam_id}: {e}")
+        return
+    with _orch_lock:
+        if camera_cfgs.get(cam_id) is not cam:
+            worker.stop()  # removed or restarted while opening
+        elif not _model_ready.is_set():
+            _waiting[cam_id] = (cam, worker)
+            _set_state(cam_id, "waiting_model")
+        else:
+            _activate(cam, worker)
+
+def _submit(cam: dict):
+    with _orch_lock:
+        camera_cfgs[cam["id"]] = cam
+        _set_state(cam["id"], "opening")
+    _opener.submit(_bring_up, cam)
+
+def _proc_state(cam_id: str, state: str, error: str = None):
+    with _orch_lock:
+        if cam_id in camera_state:
+            _set_state(cam_id, state, error)
+
+def start_processes(cams):
+    global procs
+    ecfg = CFG.get("execution") or {}
+    with _orch_lock:
+        for cam in cams:
+            camera_cfgs[cam["id"]] = cam
+            _set_state(cam["id"], "opening")
+    procs = WorkerProcesses(
+        cams, zones_cfg=CFG.get("zones", []), overlay_cfg=CFG["overlay"],
+        cameras_per_process=ecfg.get("cameras_per_process", 1),
+        start_timeout=ecfg.get("start_timeout_seconds", 120),
+        stale_seconds=ecfg.get("stale_seconds", 5.0),
+        on_state=_proc_state,
+    )
+    try:
+        started = procs.start()
+    except Exception as e:
+        with _orch_lock:
+            for cam in cams:
+                _set_state(cam["id"], "failed", str(e))
+        print(e)
+        return
+    with _orch_lock:
+        workers.update(started)
+        for cam_id in started:
+            _set_state(cam_id, "ready")
+    model_state["state"] = "ready"  # each worker process loaded its own
+    print(f"[cv] {len(started)} camera(s) in {len(procs.procs)} worker process(es)")
 
 def start_workers():
+    """Non-blocking: kicks off model load + camera opens, see camera_state."""
+    global event_bus, governor, _opener
     cams = CFG.get("cameras", [])
     if not cams:
         raise RuntimeError("No cameras defined. Add 'cameras:' list in config.yaml.")
+    errors = cfgutil.validate(CFG)
+    if errors:
+        raise RuntimeError("config.yaml: " + "; ".join(errors))
+    if (CFG.get("execution") or {}).get("mode", "threads") == "processes":
+        threading.Thread(target=start_processes, args=(cams,), name="start-procs", daemon=True).start()
+        return
+    if event_bus is None:
+        event_bus = make_event_bus()
+    if governor is None:
+        governor = make_governor()
+    if _opener is None:
+        _opener = ThreadPoolExecutor(max_workers=(CFG.get("startup") or {}).get("parallel_opens", 8),
+                                     thread_name_prefix="cam-open")
+    if infer_service is None and model_state["state"] == "pending":
+        threading.Thread(target=start_inference, name="model-load", daemon=True).start()
     for cam in cams:
-        cam_id = cam["id"]
-        source = cam["source"]
-        fps_cap = cam.get("fps_cap", 15)
-        worker = CameraWorker(
-            cam_id=cam_id,
-            source=source,
-            yolo_cfg=CFG["yolo"],
-            overlay_cfg=CFG["overlay"],
-            fps_cap=fps_cap,
-            zones_cfg=CFG.get("zones", []),
-            api_url="http://localhost:8080/api",
-            clips_dir="C:/Hackathons/HoneyWell/clips"
-        )
-        workers[cam_id] = worker
-        worker.start()
-        print(f"[cv] started worker for {cam_id} (source={source})")
+        _submit(cam)
+
+def add_camera(cam: dict):
+    with _orch_lock:
+        if cam["id"] in camera_cfgs:
+            raise ValueError(f"camera {cam['id']} already exists")
+        _submit(cam)
+
+def remove_camera(cam_id: str):
+    with _orch_lock:
+        camera_cfgs.pop(cam_id, None)
+        camera_state.pop(cam_id, None)
+        w = workers.pop(cam_id, None)
+        _, opened = _waiting.pop(cam_id, (None, None))
+        if governor is not None:
+            governor.unregister(cam_id)
+    if opened is not None:
+        opened.stop()
+    if w is not None:
+        w.stop()
+        w.join(timeout=3.0)
+        print(f"[cv] removed worker for {cam_id}")
+
+def restart_camera(cam_id: str):
+    cam = dict(camera_cfgs[cam_id])
+    remove_camera(cam_id)
+    _submit(cam)
+
+# ---------- config hot reload ----------
+# POST /config/reload (or the file watcher) validates config.yaml and hands
+# the live sections to every worker (CameraWorker.apply_config); cameras:
+# changes add / remove / restart the affected cameras. Anything else is
+# reported as needing a restart.
+watcher: cfgutil.ConfigWatcher = None
+config_state = {"reloads": 0, "last_reload": None, "last_error": None}
+_reload_lock = threading.Lock()
+
+def reload_config(new: dict = None) -> dict:
+    with _reload_lock:
+        try:
+            new = cfgutil.load(CONFIG_PATH) if new is None else new
+        except Exception as e:
+            errors = [f"unreadable config: {e}"]
+        else:
+            errors = cfgutil.validate(new)
+        if errors:
+            config_state["last_error"] = "; ".join(errors)
+            print(f"[Config] rejected: {config_state['last_error']}")
+            raise ValueError(errors)
+
+        changed = cfgutil.changed_sections(CFG, new)
+        restart = [k for k in changed if k not in cfgutil.LIVE_SECTIONS and k != "cameras"]
+        old_cams = {c["id"]: c for c in CFG.get("cameras", [])}
+        new_cams = {c["id"]: c for c in new["cameras"]}
+        added = [cid for cid in new_cams if cid not in old_cams]
+        removed = [cid for cid in old_cams if cid not in new_cams]
+        modified = [cid for cid in new_cams if cid in old_cams and new_cams[cid] != old_cams[cid]]
+
+        CFG.clear()
+        CFG.update(new)  # cameras opened from now on are built from the new config
+        if procs is not None:
+            procs.reload(new)
+            if added or removed or modified:
+                restart.append("cameras")
+        else:
+            with _orch_lock:
+                live = list(workers.values()) + [w for _, w in _waiting.values()]
+            for w in live:
+                w.apply_config(new)
+            for cid in removed + modified:
+                remove_camera(cid)
+            for cid in added + modified:
+                if camera_cfgs.get(cid) == new_cams[cid]:
+                    continue  # added at runtime and now written to the file
+                remove_camera(cid)
+                add_camera(new_cams[cid])
+
+        if "reload" in changed:
+            restart_watcher()
+
+        config_state.update(reloads=config_state["reloads"] + 1, last_reload=iso_utc(time.time()), last_error=None)
+        print(f"[Config] reloaded: changed={changed}" + (f", restart needed for {restart}" if restart else ""))
+        return {"changed": changed, "restart_required": restart,
+                "cameras": {"added": added, "removed": removed, "restarted": modified if procs is None else []}}
+
+def start_watcher():
+    global watcher
+    rcfg = CFG.get("reload") or {}
+    if watcher is None and rcfg.get("watch", False):
+        def on_change():
+            try:
+                reload_config()
+            except ValueError:
+                pass  # logged; the running config stays
+        watcher = cfgutil.ConfigWatcher(CONFIG_PATH, on_change, interval=rcfg.get("interval_seconds", 2.0))
+        watcher.start()
+
+def restart_watcher():
+    """Follow a changed reload: section (watch toggled, new interval)."""
+    global watcher
+    if watcher is not None:
+        watcher.stop()  # may be the calling thread; it exits after this reload
+        watcher = None
+    start_watcher()
+    print(f"[Config] file watcher {'on' if watcher is not None else 'off'}")
 
 def stop_workers():
-    for w in workers.values():
+    if watcher is not None:
+        watcher.stop()
+    if procs is not None:
+        procs.stop()
+        return
+    if _opener is not None:
+        _opener.shutdown(wait=False, cancel_futures=True)
+    with _orch_lock:
+        camera_cfgs.clear()  # opens still in flight discard their worker
+        running = list(workers.values())
+        opened = [w for _, w in _waiting.values()]
+        _waiting.clear()
+    for w in opened:
+        w.stop()
+    for w in running:
         w.stop()
-    for w in workers.values():
+    for w in running:
         try:
             w.join(timeout=2.0)
         except Exception:
             pass
-
-start_workers()
+    if infer_service is not None:
+        infer_service.stop()
+    if event_bus is not None:
+        event_bus.stop()
+    if governor is not None:
+        governor.stop()
+
+@app.on_event("startup")
+def on_startup():
+    start_workers()
+    start_watcher()
 
 @app.get("/health")
 def health():
-    return {"ok": True, "cameras": list(workers.keys())}
+    with _orch_lock:
+        status = {cid: dict(st) for cid, st in camera_state.items()}
+    ready = model_state["state"] == "ready" and all(st["state"] == "ready" for st in status.values())
+    return {"ok": True, "ready": ready, "model": dict(model_state), "cameras": list(workers.keys()), "status": status}
+
+@app.post("/config/reload")
+def config_reload():
+    try:
+        result = reload_config()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={"errors": e.args[0]})
+    return {"ok": True, **result}
+
+# ---------- runtime camera management ----------
+def _no_procs():
+    if procs is not None:
+        raise HTTPException(status_code=501, detail="Camera management needs execution.mode threads")
+
+@app.get("/cameras")
+def list_cameras():
+    with _orch_lock:
+        return {"ok": True, "cameras": [{**cam, **camera_state.get(cid, {})} for cid, cam in camera_cfgs.items()]}
+
+@app.post("/cameras", status_code=202)
+def create_camera(cam: dict = Body(...)):
+    """Body: {"id", "source", optional "fps_cap", "fps_min"}; opens in the background."""
+    _no_procs()
+    if not cam.get("id") or "source" not in cam:
+        raise HTTPException(status_code=400, detail="id and source are required")
+    try:
+        add_camera(cam)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"ok": True, "camera_id": cam["id"], "state": "opening"}
+
+@app.delete("/cameras/{cam_id}")
+def delete_camera(cam_id: str):
+    _no_procs()
+    if cam_id not in camera_cfgs:
+        raise HTTPException(status_code=404, detail="Unknown camera")
+    remove_camera(cam_id)
+    return {"ok": True, "camera_id": cam_id}
+
+@app.post("/cameras/{cam_id}/restart", status_code=202)
+def restart_one(cam_id: str):
+    _no_procs()
+    if cam_id not in camera_cfgs:
+        raise HTTPException(status_code=404, detail="Unknown camera")
+    restart_camera(cam_id)
+    return {"ok": True, "camera_id": cam_id, "state": "opening"}
 
 def mjpeg_generator(cam_id: str):
     w = workers.get(cam_id)
     if not w:
-        raise StopIteration
+        return
+    sub = w.hub.subscribe()
     try:
-        while not w._stop:
-            frame = w.frame_q.get()
-            ret, jpg = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), 80])
-            if not ret:
+        while not w._stopping:
+            buf = sub.get(timeout=1.0)
+            if buf is None:
                 continue
-            buf = jpg.tobytes()
             yield (b"--frame\r\n"
                    b"Content-Type: image/jpeg\r\n"
                    b"Content-Length: " + str(len(buf)).encode() + b"\r\n\r\n" +
@@ -253,6 +379,8 @@ def mjpeg_generator(cam_id: str):
     except Exception as e:
         print(f"[stream {cam_id}] generator exit:", e)
         return
+    finally:
+        w.hub.unsubscribe(sub)
 
 @app.get("/stream/{cam_id}")
 def stream(cam_id: str):
@@ -265,19 +393,115 @@ def stream(cam_id: str):
         background=BackgroundTask(lambda: getattr(gen, "close", lambda: None)())
     )
 
-@app.get("/heatmap/{cam_id}")
-def heatmap_png(cam_id: str, mode: str = "overlay", palette: str = "turbo", alpha: float = 0.65):
+@app.get("/metrics")
+def metrics():
+    return {
+        "ok": True,
+        "inference": infer_service.stats() if infer_service else None,
+        "events": event_bus.stats() if event_bus else None,
+        "heatmap_cache": heatmap_cache.stats(),
+        "processes": procs.stats() if procs else None,
+        "config": config_state,
+        "cameras": {cid: w.metrics() for cid, w in list(workers.items())},
+    }
+
+@app.get("/snapshot/{cam_id}")
+def snapshot(cam_id: str):
     w = workers.get(cam_id)
     if not w:
         raise HTTPException(status_code=404, detail="Unknown camera")
+    jpg = w.hub.snapshot_jpeg()
+    if jpg is None:
+        raise HTTPException(status_code=503, detail="No frame yet")
+    return Response(content=jpg, media_type="image/jpeg", headers={"Cache-Control": "no-store, max-age=0"})
+
+@app.get("/fps")
+def fps_status():
+    if governor is not None:
+        return {"ok": True, "governor": True, **governor.stats()}
+    # in processes mode each worker process runs its own governor
+    gov = procs is not None and bool((CFG.get("governor") or {}).get("enabled", False))
+    return {"ok": True, "governor": gov, "cameras": {
+        cid: {"fps_target": w.fps_target, "fps_actual": round(w.fps_actual, 2), "fps_min": w.fps_min,
+              "fps_max": w.fps_max, "loop_ms": round(w.loop_ms, 1)} for cid, w in list(workers.items())}}
+
+heatmap_cache = HeatmapRenderCache(ttl=(CFG.get("heatmap") or {}).get("cache_ttl_seconds", 1.0))
 
-    base = w.last_frame if (mode == "overlay" and w.last_frame is not None) else None
-    img = w.heatmap.render(base_frame_bgr=base, palette=palette, alpha=float(alpha))
+@app.get("/heatmap/{cam_id}")
+def heatmap_png(cam_id: str, request: Request, mode: str = "overlay", palette: str = "turbo", alpha: float = 0.65):
+    w = workers.get(cam_id)
+    if not w:
+        raise HTTPException(status_code=404, detail="Unknown camera")
 
+    headers = {
+        "Access-Control-Allow-Origin": "*",
+        "Cross-Origin-Resource-Policy": "cross-origin",
+        "Cache-Control": "no-cache",  # revalidate with If-None-Match
+    }
+    key = (cam_id, mode, palette, round(float(alpha), 3))
+    version = w.heatmap.version  # read before rendering, so a newer grid is never cached as this one
+    hit = heatmap_cache.get(key, version)
+    if hit is None:
+        # the gray base is memoized on the frame context, so repeated polls reuse it
+        ctx = w.last_ctx if mode == "overlay" else None
+        base_gray = ctx.gray if ctx is not None else None
+        img = w.heatmap.render(base_gray=base_gray, palette=palette, alpha=float(alpha))
+
+        ok, buf = cv2.imencode(".png", img)
+        if not ok:
+            raise HTTPException(status_code=500, detail="Failed to encode heatmap")
+        png = buf.tobytes()
+        etag = heatmap_cache.put(key, version, png)
+    else:
+        etag, png = hit
+
+    headers["ETag"] = etag
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=png, media_type="image/png", headers=headers)
+
+def parse_ts(v: str) -> float:
+    """Epoch seconds or ISO-8601 (naive = UTC) -> epoch seconds."""
+    try:
+        return float(v)
+    except ValueError:
+        pass
+    try:
+        dt = datetime.fromisoformat(v.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Bad timestamp: {v}")
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+@app.get("/heatmap/{cam_id}/range")
+def heatmap_range(cam_id: str, start: str, end: str, mode: str = "heatmap", palette: str = "turbo",
+                  alpha: float = 0.65, format: str = "png"):
+    w = workers.get(cam_id)
+    if not w:
+        raise HTTPException(status_code=404, detail="Unknown camera")
+    arch = w.heatmap.archive
+    if arch is None:
+        raise HTTPException(status_code=404, detail="Heatmap archive disabled (heatmap.archive.enabled)")
+    t0, t1 = parse_ts(start), parse_ts(end)
+    if t1 <= t0:
+        raise HTTPException(status_code=400, detail="end must be after start")
+
+    grid = arch.sum_range(t0, t1)
+    if format == "json":
+        return {
+            "ok": True, "camera_id": cam_id, "start": iso_utc(t0), "end": iso_utc(t1),
+            "interval_seconds": arch.interval, "shape": list(grid.shape),
+            "total": float(grid.sum()), "max": float(grid.max()) if grid.size else 0.0,
+            "grid": np.round(grid, 2).tolist(),
+        }
+
+    ctx = w.last_ctx if mode == "overlay" else None
+    img = render_grid(grid, w.heatmap.w, w.heatmap.h, blur_ksize=w.heatmap.blur_ksize, palette=palette,
+                      alpha=float(alpha), base_gray=ctx.gray if ctx is not None else None)
     ok, buf = cv2.imencode(".png", img)
     if not ok:
         raise HTTPException(status_code=500, detail="Failed to encode heatmap")
-
     return Response(
         content=buf.tobytes(),
         media_type="image/png",
@@ -290,7 +514,7 @@ def heatmap_png(cam_id: str, mode: str = "overlay", palette: str = "turbo", alph
 
 @app.get("/occupancy")
 def all_occupancy():
-    data = [{"camera_id": cid, "occupancy": w.current_occupancy} for cid, w in workers.items()]
+    data = [{"camera_id": cid, "occupancy": w.current_occupancy} for cid, w in list(workers.items())]
     return {"ok": True, "cameras": data}
 
 @app.get("/occupancy/{cam_id}")
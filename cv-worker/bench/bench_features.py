@@ -0,0 +1,86 @@
+# cv-worker/bench/bench_features.py
+"""
+Per-frame cost of the feature stage (intrusion, loitering, abandoned, fall,
+violence proxy) on synthetic tracks.
+
+  python bench/bench_features.py                  # 10..200 tracks
+  python bench/bench_features.py --sizes 50 500 --frames 100
+  python bench/bench_features.py --dicts          # feed plain track dicts
+
+By default the features get what the tracker emits (a TrackBatch when
+tracking.batch is available); --dicts measures the list-of-dicts path.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import yaml
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+from features.intrusion import IntrusionDetector
+from features.loitering import LoiteringDetector
+from features.abandoned import AbandonedDetector
+from features.fall import FallDetector
+from features.violence_proxy import ViolenceProxy
+from utils.zones import ZoneIndex
+try:
+    from tracking.batch import TrackBatch
+except ImportError:
+    TrackBatch = None
+
+W, H = 640, 480
+
+def make_frames(n, frames, seed=0):
+    rng = np.random.default_rng(seed)
+    pos = rng.uniform([0, 0], [W, H], size=(n, 2))
+    vel = rng.normal(0, 4.0, size=(n, 2))
+    size = rng.uniform([20, 40], [50, 120], size=(n, 2))
+    names = np.where(rng.random(n) < 0.85, "person", "backpack")
+    for _ in range(frames):
+        pos = np.clip(pos + vel, 0, [W, H])
+        boxes = np.concatenate([pos - size / 2, pos + size / 2], axis=1)
+        yield [{
+            "track_id": i + 1,
+            "xyxy": boxes[i].tolist(),
+            "class_name": str(names[i]),
+            "class_id": 0 if names[i] == "person" else 24,
+            "conf": 0.9,
+            "lost": 0,
+        } for i in range(n)]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100, 200])
+    ap.add_argument("--frames", type=int, default=200)
+    ap.add_argument("--dicts", action="store_true", help="feed list-of-dict tracks")
+    args = ap.parse_args()
+
+    zones = yaml.safe_load(open(os.path.join(HERE, "config.yaml"), "r", encoding="utf-8")).get("zones", [])
+    index = ZoneIndex(zones, width=W, height=H)
+    use_batch = TrackBatch is not None and not args.dicts
+    print(f"input: {'TrackBatch' if use_batch else 'list of dicts'}")
+    print(f"{'tracks':>7} | {'ms/frame':>9}")
+    for n in args.sizes:
+        feats = [
+            IntrusionDetector(zones, index=index),
+            LoiteringDetector(zones, index=index),
+            AbandonedDetector(T_seconds=8, owner_dist=180.0),
+            FallDetector(),
+            ViolenceProxy(),
+        ]
+        frames = list(make_frames(n, args.frames))
+        if use_batch:
+            frames = [TrackBatch.from_dicts(f) for f in frames]
+        t0 = time.perf_counter()
+        for k, tracks in enumerate(frames):
+            ts = 1_700_000_000.0 + k / 15.0
+            for f in feats:
+                f.step(tracks, ts, "bench")
+        ms = (time.perf_counter() - t0) / len(frames) * 1000.0
+        print(f"{n:>7} | {ms:>9.3f}")
+
+if __name__ == "__main__":
+    main()
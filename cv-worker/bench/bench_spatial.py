@@ -0,0 +1,64 @@
+# cv-worker/bench/bench_spatial.py
+"""
+Neighbour search scaling: brute-force distance matrix vs utils.spatial.GridIndex.
+
+  python bench/bench_spatial.py                 # 10..500 points
+  python bench/bench_spatial.py --sizes 100 1000 --radius 140
+
+Points are spread over a 1920x1080 frame. "pairs" is the ViolenceProxy query
+(all pairs closer than --radius), "nearest" the AbandonedDetector one (nearest
+person closer than --radius for 10% of the points as bags). Each row also
+checks that both methods return the same answer.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.spatial import GridIndex
+
+W, H = 1920, 1080
+
+def brute_pairs(pts, r):
+    d = np.hypot(pts[:, None, 0] - pts[None, :, 0], pts[:, None, 1] - pts[None, :, 1])
+    i, j = np.nonzero(np.triu(d < r, k=1))
+    return i, j, d[i, j]
+
+def brute_nearest(q, pts, r):
+    d = np.hypot(q[:, None, 0] - pts[None, :, 0], q[:, None, 1] - pts[None, :, 1])
+    j = d.argmin(axis=1)
+    dd = d[np.arange(len(q)), j]
+    return np.where(dd < r, j, -1)
+
+def timeit(fn, reps):
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        out = fn()
+    return (time.perf_counter() - t0) / reps * 1000.0, out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100, 200, 500])
+    ap.add_argument("--radius", type=float, default=140.0)
+    ap.add_argument("--reps", type=int, default=200)
+    args = ap.parse_args()
+    rng = np.random.default_rng(0)
+
+    print(f"{'points':>7} | {'pairs brute':>11} {'grid':>8} | {'nearest brute':>13} {'grid':>8} | same")
+    for n in args.sizes:
+        pts = rng.uniform([0, 0], [W, H], size=(n, 2))
+        q = rng.uniform([0, 0], [W, H], size=(max(1, n // 10), 2))
+
+        pb_ms, (bi, bj, _) = timeit(lambda: brute_pairs(pts, args.radius), args.reps)
+        pg_ms, (gi, gj, _) = timeit(lambda: GridIndex(pts).pairs_within(args.radius), args.reps)
+        nb_ms, bn = timeit(lambda: brute_nearest(q, pts, args.radius), args.reps)
+        ng_ms, (gn, _) = timeit(lambda: GridIndex(pts).nearest(q, args.radius), args.reps)
+
+        same = np.array_equal(bi, gi) and np.array_equal(bj, gj) and np.array_equal(bn, gn)
+        print(f"{n:>7} | {pb_ms:>11.3f} {pg_ms:>8.3f} | {nb_ms:>13.3f} {ng_ms:>8.3f} | {same}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# cv-worker/bench/bench_tracker.py
+"""
+Tracker scaling benchmark on synthetic crowds.
+
+  python bench/bench_tracker.py                 # 10..400 objects
+  python bench/bench_tracker.py --sizes 200 500 --frames 200
+  python bench/bench_tracker.py --detect-every 3   # coast with predict() in between
+
+Objects walk at constant velocity with box jitter, some detections are
+missed, and a few are person/bag pairs that overlap. Reports ms per update()
+and ID switches (a ground-truth object whose track id changes).
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tracking.simple_tracker import CentroidTracker
+from tracking.iou_tracker import IouTracker
+
+W, H = 1280, 720
+
+def make_scene(n, frames, seed=0, miss_rate=0.05):
+    rng = np.random.default_rng(seed)
+    pos = rng.uniform([0, 0], [W, H], size=(n, 2))
+    vel = rng.normal(0, 6.0, size=(n, 2))
+    size = rng.uniform([30, 60], [60, 140], size=(n, 2))
+    cls = np.where(rng.random(n) < 0.8, 0, 24)  # person / backpack
+    for _ in range(frames):
+        pos = pos + vel
+        out = (pos < 0) | (pos > [W, H])
+        vel[out] *= -1  # bounce off the frame edges
+        pos = np.clip(pos, 0, [W, H])
+        jit = rng.normal(0, 1.5, size=(n, 4))
+        boxes = np.concatenate([pos - size / 2, pos + size / 2], axis=1) + jit
+        seen = rng.random(n) >= miss_rate
+        dets, gt = [], []
+        for i in np.flatnonzero(seen).tolist():
+            dets.append({
+                "xyxy": boxes[i].tolist(),
+                "conf": 0.9,
+                "class_id": int(cls[i]),
+                "class_name": "person" if cls[i] == 0 else "backpack",
+            })
+            gt.append(i)
+        yield dets, gt
+
+def run(tracker, n, frames, every=1):
+    assigned = {}
+    switches = 0
+    t_total = 0.0
+    for k, (dets, gt) in enumerate(make_scene(n, frames)):
+        t0 = time.perf_counter()
+        if k % every:
+            tracker.predict()
+            t_total += time.perf_counter() - t0
+            continue
+        tracks = tracker.update(dets)
+        t_total += time.perf_counter() - t0
+        # map each detection back to the matched track sitting on the same box
+        live = [t for t in tracks if t["lost"] == 0]
+        if not live or not dets:
+            continue
+        tb = np.array([t["xyxy"] for t in live], dtype=np.float64)
+        db = np.array([d["xyxy"] for d in dets], dtype=np.float64)
+        for j, g in enumerate(gt):
+            k = int(np.abs(tb - db[j]).sum(axis=1).argmin())
+            if np.abs(tb[k] - db[j]).sum() > 0.01:
+                continue
+            tid = live[k]["track_id"]
+            if g in assigned and assigned[g] != tid:
+                switches += 1
+            assigned[g] = tid
+    return t_total / frames * 1000.0, switches
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100, 200, 400])
+    ap.add_argument("--frames", type=int, default=150)
+    ap.add_argument("--detect-every", type=int, default=1)
+    args = ap.parse_args()
+
+    print(f"{'objects':>8} | {'centroid ms':>11} {'id sw':>6} | {'iou ms':>8} {'id sw':>6}")
+    for n in args.sizes:
+        c_ms, c_sw = run(CentroidTracker(max_lost=15, dist_thr=80.0), n, args.frames, args.detect_every)
+        i_ms, i_sw = run(IouTracker(max_lost=15, dist_thr=80.0), n, args.frames, args.detect_every)
+        print(f"{n:>8} | {c_ms:>11.2f} {c_sw:>6} | {i_ms:>8.2f} {i_sw:>6}")
+
+if __name__ == "__main__":
+    main()
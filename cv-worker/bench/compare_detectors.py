@@ -0,0 +1,131 @@
+# cv-worker/bench/compare_detectors.py
+"""
+Latency / agreement comparison of detector backends on recorded clips.
+
+  python bench/compare_detectors.py --clips clips/a.mp4 clips/b.mp4
+  python bench/compare_detectors.py --clips clips/*.mp4 --backends ultralytics onnx openvino --int8
+  python bench/compare_detectors.py --clips clips/a.mp4 --quantize yolov8n.onnx yolov8n.int8.onnx
+
+Backends and weights come from the yolo: section of config.yaml (the same
+build_detector() the worker uses); --int8 adds the INT8 variant of every
+non-ultralytics backend. The first backend is the reference: for the others
+we report precision / recall / F1 of their detections against it
+(same class, IoU >= --match-iou), plus per-frame latency p50 / p95.
+--quantize SRC DST writes a statically calibrated INT8 ONNX model from the
+sampled frames first.
+"""
+import argparse
+import copy
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+import yaml
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+from detectors import build_detector
+from tracking.iou_tracker import iou_matrix
+
+def load_frames(paths, every, limit):
+    frames = []
+    for p in paths:
+        cap = cv2.VideoCapture(p)
+        k = 0
+        while len(frames) < limit:
+            ok, f = cap.read()
+            if not ok:
+                break
+            if k % every == 0:
+                frames.append(f)
+            k += 1
+        cap.release()
+    return frames
+
+def match(ref, got, thr):
+    """Greedy same-class IoU matching -> (true positives, len(got), len(ref))."""
+    tp = 0
+    for cls in {d["class_id"] for d in ref} | {d["class_id"] for d in got}:
+        a = np.array([d["xyxy"] for d in ref if d["class_id"] == cls], dtype=np.float32).reshape(-1, 4)
+        b = np.array([d["xyxy"] for d in got if d["class_id"] == cls], dtype=np.float32).reshape(-1, 4)
+        if not len(a) or not len(b):
+            continue
+        iou = iou_matrix(a, b)
+        while iou.size and iou.max() >= thr:
+            i, j = np.unravel_index(iou.argmax(), iou.shape)
+            tp += 1
+            iou[i, :] = -1
+            iou[:, j] = -1
+    return tp, len(got), len(ref)
+
+def run(det, frames, warmup=3):
+    for f in frames[:warmup]:
+        det.infer(f)
+    out, ms = [], []
+    for f in frames:
+        t0 = time.perf_counter()
+        out.append(det.infer(f))
+        ms.append((time.perf_counter() - t0) * 1000.0)
+    return out, np.array(ms)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clips", nargs="+", required=True)
+    ap.add_argument("--backends", nargs="+", default=["ultralytics", "onnx", "openvino"])
+    ap.add_argument("--int8", action="store_true", help="also run <backend>.int8_weights")
+    ap.add_argument("--every", type=int, default=5, help="sample every Nth frame")
+    ap.add_argument("--frames", type=int, default=200)
+    ap.add_argument("--match-iou", type=float, default=0.5)
+    ap.add_argument("--quantize", nargs=2, metavar=("SRC", "DST"))
+    args = ap.parse_args()
+
+    ycfg = yaml.safe_load(open(os.path.join(HERE, "config.yaml"), "r", encoding="utf-8"))["yolo"]
+    frames = load_frames(args.clips, args.every, args.frames)
+    if not frames:
+        sys.exit("no frames read from --clips")
+    print(f"{len(frames)} frames from {len(args.clips)} clip(s), {frames[0].shape[1]}x{frames[0].shape[0]}")
+
+    if args.quantize:
+        from detectors.onnx import quantize_int8
+        quantize_int8(args.quantize[0], args.quantize[1], calib_frames=frames[:100], imgsz=ycfg.get("imgsz", 640))
+        print(f"wrote {args.quantize[1]}")
+
+    variants = []
+    for b in args.backends:
+        variants.append((b, False))
+        if args.int8 and b != "ultralytics":
+            variants.append((b, True))
+
+    results = []
+    for backend, int8 in variants:
+        cfg = copy.deepcopy(ycfg)
+        cfg["backend"], cfg["int8"] = backend, int8
+        label = backend + (" int8" if int8 else "")
+        try:
+            det = build_detector(cfg)
+        except Exception as e:
+            print(f"skip {label}: {e}")
+            continue
+        dets, ms = run(det, frames)
+        results.append((label, dets, ms))
+
+    if not results:
+        sys.exit("no backend could be loaded")
+    ref_label, ref, _ = results[0]
+    print(f"reference: {ref_label}")
+    print(f"{'backend':>18} | {'p50 ms':>7} {'p95 ms':>7} | {'dets':>6} {'prec':>6} {'recall':>6} {'F1':>6}")
+    for label, dets, ms in results:
+        tp = n_got = n_ref = 0
+        for r, g in zip(ref, dets):
+            a, b, c = match(r, g, args.match_iou)
+            tp, n_got, n_ref = tp + a, n_got + b, n_ref + c
+        prec = tp / max(1, n_got)
+        rec = tp / max(1, n_ref)
+        f1 = 2 * prec * rec / max(1e-9, prec + rec)
+        print(f"{label:>18} | {np.percentile(ms, 50):>7.1f} {np.percentile(ms, 95):>7.1f} | "
+              f"{n_got:>6} {prec:>6.3f} {rec:>6.3f} {f1:>6.3f}")
+
+if __name__ == "__main__":
+    main()
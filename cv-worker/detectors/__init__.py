@@ -0,0 +1,27 @@
+# cv-worker/detectors/__init__.py
+
+def build_detector(ycfg: dict):
+    """
+    Detector for the `yolo:` config section.
+      backend: ultralytics (default) | onnx | openvino
+      int8: true picks <backend>.int8_weights instead of <backend>.weights
+    Backends are imported lazily so their runtimes stay optional.
+    """
+    backend = (ycfg.get("backend") or "ultralytics").lower()
+    common = dict(conf=ycfg.get("conf", 0.35), iou=ycfg.get("iou", 0.45), classes=ycfg.get("classes"),
+                  imgsz=ycfg.get("imgsz", 640))
+    if backend == "ultralytics":
+        from .yolo import YoloDetector
+        return YoloDetector(weights=ycfg["weights"], **common)
+
+    bcfg = ycfg.get(backend) or {}
+    weights = bcfg.get("int8_weights") if ycfg.get("int8") else bcfg.get("weights")
+    if not weights:
+        raise ValueError(f"yolo.{backend}.{'int8_weights' if ycfg.get('int8') else 'weights'} is not set")
+    if backend == "onnx":
+        from .onnx import OnnxDetector
+        return OnnxDetector(weights=weights, threads=bcfg.get("threads", 0), **common)
+    if backend == "openvino":
+        from .openvino import OpenVinoDetector
+        return OpenVinoDetector(weights=weights, hint=bcfg.get("hint", "LATENCY"), threads=bcfg.get("threads", 0), **common)
+    raise ValueError(f"unknown yolo.backend '{backend}'")
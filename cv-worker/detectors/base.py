@@ -0,0 +1,148 @@
+# cv-worker/detectors/base.py
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.framectx import FrameContext
+
+# COCO-80, the label set of the stock yolov8 weights (used when a model carries no names)
+COCO_NAMES = [
+    "person", "bicycle", "car", "motorcycle", "airplane", "bus", "train", "truck", "boat", "traffic light",
+    "fire hydrant", "stop sign", "parking meter", "bench", "bird", "cat", "dog", "horse", "sheep", "cow",
+    "elephant", "bear", "zebra", "giraffe", "backpack", "umbrella", "handbag", "tie", "suitcase", "frisbee",
+    "skis", "snowboard", "sports ball", "kite", "baseball bat", "baseball glove", "skateboard", "surfboard",
+    "tennis racket", "bottle", "wine glass", "cup", "fork", "knife", "spoon", "bowl", "banana", "apple",
+    "sandwich", "orange", "broccoli", "carrot", "hot dog", "pizza", "donut", "cake", "chair", "couch",
+    "potted plant", "bed", "dining table", "toilet", "tv", "laptop", "mouse", "remote", "keyboard",
+    "cell phone", "microwave", "oven", "toaster", "sink", "refrigerator", "book", "clock", "vase",
+    "scissors", "teddy bear", "hair drier", "toothbrush",
+]
+
+class Detector:
+    """
+    Backend interface shared by every detector.
+      infer(frame)          -> list of {"xyxy", "conf", "class_id", "class_name"}
+      infer_batch(frames)   -> one such list per frame
+    Frames are BGR ndarrays or utils.framectx.FrameContext objects.
+    """
+    backend = "base"
+
+    def infer(self, frame_bgr):
+        return self.infer_batch([frame_bgr])[0]
+
+    def infer_batch(self, frames_bgr) -> List[List[dict]]:
+        raise NotImplementedError
+
+    def warmup(self, width: int = 640, height: int = 480):
+        """One throwaway inference so the first camera frame doesn't pay for lazy init."""
+        self.infer(np.zeros((height, width, 3), dtype=np.uint8))
+
+    @staticmethod
+    def class_filter(names: Dict[int, str], classes) -> Optional[np.ndarray]:
+        """Config class names -> array of model class ids (case-insensitive), None = all."""
+        if not classes:
+            return None
+        name_to_idx = {v.lower(): k for k, v in names.items()}
+        return np.array([name_to_idx[c.lower()] for c in classes if c.lower() in name_to_idx], dtype=np.int64)
+
+
+class LetterboxDetector(Detector):
+    """
+    Base for backends that run a raw YOLOv8 graph themselves: letterbox on
+    the way in (shared through the FrameContext), decode + NMS on the way out.
+    Subclasses implement _run(batch NCHW float32) -> (B, 4 + nc, N) array.
+    """
+
+    def __init__(self, conf: float = 0.35, iou: float = 0.45, classes=None, imgsz: int = 640,
+                 names: Optional[Dict[int, str]] = None, max_det: int = 300):
+        self.conf = float(conf)
+        self.iou = float(iou)
+        self.imgsz = int(imgsz)
+        self.max_det = int(max_det)
+        self.names = names or {i: n for i, n in enumerate(COCO_NAMES)}
+        self._class_filter = self.class_filter(self.names, classes)
+        self.batch_dynamic = True  # subclasses clear this for fixed batch-1 graphs
+
+    def _run(self, x: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def infer_batch(self, frames_bgr):
+        ctxs = [FrameContext.of(f) for f in frames_bgr]
+        boxes = [c.letterbox(self.imgsz) for c in ctxs]
+        x = np.stack([b[0] for b in boxes]).transpose(0, 3, 1, 2).astype(np.float32) * (1.0 / 255.0)
+        if self.batch_dynamic:
+            out = self._run(np.ascontiguousarray(x))
+        else:
+            out = np.concatenate([self._run(np.ascontiguousarray(x[i:i + 1])) for i in range(len(x))])
+        return [self._decode(out[i], r, pad, c.shape) for i, (c, (_, r, pad)) in enumerate(zip(ctxs, boxes))]
+
+    def _decode(self, pred: np.ndarray, ratio: float, pad, shape) -> List[dict]:
+        # pred: (4 + nc, N) -> rows of cx, cy, w, h, class scores
+        p = pred.T
+        scores = p[:, 4:]
+        cls = scores.argmax(axis=1)
+        conf = scores[np.arange(len(p)), cls]
+        keep = conf >= self.conf
+        if self._class_filter is not None:
+            keep &= np.isin(cls, self._class_filter)
+        p, cls, conf = p[keep], cls[keep], conf[keep]
+        if not len(p):
+            return []
+
+        xy, wh = p[:, :2], p[:, 2:4] * 0.5
+        boxes = np.concatenate([xy - wh, xy + wh], axis=1)
+        keep = nms(boxes, conf, self.iou, classes=cls)[: self.max_det]
+        boxes, cls, conf = boxes[keep], cls[keep], conf[keep]
+
+        # letterbox space -> frame pixels
+        boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad[0]) / ratio
+        boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad[1]) / ratio
+        h, w = shape[:2]
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, w)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, h)
+        return [{
+            "xyxy": [float(x1), float(y1), float(x2), float(y2)],
+            "conf": float(cf),
+            "class_id": int(ci),
+            "class_name": self.names.get(int(ci), str(int(ci))),
+        } for (x1, y1, x2, y2), cf, ci in zip(boxes.tolist(), conf.tolist(), cls.tolist())]
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_thr: float, classes: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Greedy NMS on (N,4) xyxy boxes -> kept indices, highest score first.
+    With `classes`, boxes of different classes never suppress each other
+    (boxes are offset per class, as ultralytics does). IoU against each
+    kept box is computed for all remaining candidates at once.
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    b = boxes.astype(np.float32)
+    if classes is not None:
+        b = b + (classes.astype(np.float32) * 7680.0)[:, None]
+    x1, y1, x2, y2 = b[:, 0], b[:, 1], b[:, 2], b[:, 3]
+    area = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while len(order):
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        iw = (np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])).clip(0)
+        ih = (np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])).clip(0)
+        inter = iw * ih
+        iou = inter / np.maximum(area[i] + area[rest] - inter, 1e-9)
+        order = rest[iou <= iou_thr]
+    return np.array(keep, dtype=np.int64)
+
+
+def parse_names(meta) -> Optional[Dict[int, str]]:
+    """Class names from model metadata as written by the ultralytics exporter ("{0: 'person', ...}")."""
+    if not meta:
+        return None
+    import ast
+    try:
+        names = ast.literal_eval(meta) if isinstance(meta, str) else dict(meta)
+        return {int(k): str(v) for k, v in names.items()}
+    except Exception:
+        return None
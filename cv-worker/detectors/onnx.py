@@ -0,0 +1,70 @@
+# cv-worker/detectors/onnx.py
+import os
+
+import numpy as np
+
+from .base import LetterboxDetector, parse_names
+
+class OnnxDetector(LetterboxDetector):
+    """
+    YOLOv8 exported to ONNX, run with ONNX Runtime on CPU (no PyTorch).
+    Export once with:  yolo export model=yolov8n.pt format=onnx dynamic=True
+    An INT8 model from quantize_int8() below loads the same way.
+    """
+    backend = "onnx"
+
+    def __init__(self, weights: str, conf: float = 0.35, iou: float = 0.45, classes=None, imgsz: int = 640,
+                 threads: int = 0):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("yolo.backend 'onnx' needs onnxruntime (pip install onnxruntime)") from e
+        so = ort.SessionOptions()
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            so.intra_op_num_threads = int(threads)
+        self.session = ort.InferenceSession(weights, sess_options=so, providers=["CPUExecutionProvider"])
+        inp = self.session.get_inputs()[0]
+        self._input = inp.name
+        meta = self.session.get_modelmeta().custom_metadata_map or {}
+        shape = inp.shape  # [batch, 3, h, w]; symbolic dims are strings
+        if isinstance(shape[2], int):
+            imgsz = shape[2]
+        super().__init__(conf=conf, iou=iou, classes=classes, imgsz=imgsz, names=parse_names(meta.get("names")))
+        self.batch_dynamic = not isinstance(shape[0], int)
+        self.weights = weights
+        print(f"[ONNX] {os.path.basename(weights)} imgsz={self.imgsz} dynamic_batch={self.batch_dynamic}")
+
+    def _run(self, x):
+        return self.session.run(None, {self._input: x})[0]
+
+
+def quantize_int8(src: str, dst: str, calib_frames=None, imgsz: int = 640):
+    """
+    Write an INT8 copy of an ONNX model.
+      calib_frames given (BGR frames from recorded clips): static QDQ
+      quantization calibrated on them; otherwise dynamic weight-only INT8.
+    """
+    from onnxruntime.quantization import CalibrationDataReader, QuantType, quantize_dynamic, quantize_static
+    from utils.framectx import FrameContext
+
+    if not calib_frames:
+        quantize_dynamic(src, dst, weight_type=QuantType.QInt8)
+        return dst
+
+    import onnxruntime as ort
+    name = ort.InferenceSession(src, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class _Frames(CalibrationDataReader):
+        def __init__(self):
+            self._it = iter(calib_frames)
+
+        def get_next(self):
+            f = next(self._it, None)
+            if f is None:
+                return None
+            img = FrameContext.of(f).letterbox(imgsz)[0]
+            return {name: (img.transpose(2, 0, 1)[None].astype(np.float32) / 255.0)}
+
+    quantize_static(src, dst, _Frames(), activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    return dst
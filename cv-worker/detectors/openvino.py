@@ -0,0 +1,46 @@
+# cv-worker/detectors/openvino.py
+import os
+
+from .base import LetterboxDetector, parse_names
+
+class OpenVinoDetector(LetterboxDetector):
+    """
+    YOLOv8 in OpenVINO IR (or ONNX) compiled for the CPU plugin.
+    Export once with:  yolo export model=yolov8n.pt format=openvino [int8=True]
+    `weights` may be the .xml file or the export directory.
+    """
+    backend = "openvino"
+
+    def __init__(self, weights: str, conf: float = 0.35, iou: float = 0.45, classes=None, imgsz: int = 640,
+                 hint: str = "LATENCY", threads: int = 0):
+        try:
+            import openvino as ov
+        except ImportError as e:
+            raise ImportError("yolo.backend 'openvino' needs openvino (pip install openvino)") from e
+        if os.path.isdir(weights):
+            xml = [f for f in os.listdir(weights) if f.endswith(".xml")]
+            if not xml:
+                raise FileNotFoundError(f"no .xml model in {weights}")
+            weights = os.path.join(weights, xml[0])
+        core = ov.Core()
+        model = core.read_model(weights)
+        names = None
+        try:
+            names = parse_names(model.get_rt_info(["model_info", "names"]).astype(str))
+        except Exception:
+            pass
+        shape = model.inputs[0].get_partial_shape()
+        if shape[2].is_static:
+            imgsz = shape[2].get_length()
+        cfg = {"PERFORMANCE_HINT": hint.upper()}
+        if threads:
+            cfg["INFERENCE_NUM_THREADS"] = int(threads)
+        self.compiled = core.compile_model(model, "CPU", cfg)
+        self._output = self.compiled.output(0)
+        super().__init__(conf=conf, iou=iou, classes=classes, imgsz=imgsz, names=names)
+        self.batch_dynamic = not shape[0].is_static
+        self.weights = weights
+        print(f"[OpenVINO] {os.path.basename(weights)} imgsz={self.imgsz} hint={hint.upper()} dynamic_batch={self.batch_dynamic}")
+
+    def _run(self, x):
+        return self.compiled([x])[self._output]
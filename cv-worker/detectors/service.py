@@ -0,0 +1,112 @@
+# cv-worker/detectors/service.py
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+class InferenceService(threading.Thread):
+    """
+    One detector shared by every camera worker.
+      - submit(cam_id, frame) -> Future resolving to that frame's detections
+        (frame may be a utils.framectx.FrameContext; it is passed through)
+      - only the latest frame per camera is kept; an older pending one is cancelled
+      - frames are run together once max_batch are waiting or the oldest
+        has waited max_wait_ms
+    """
+
+    def __init__(self, detector, max_batch: int = 8, max_wait_ms: float = 10.0):
+        super().__init__(daemon=True)
+        self.det = detector
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._cv = threading.Condition()
+        self._pending: Dict[str, Tuple[float, np.ndarray, Future]] = {}
+        self._stopping = False
+
+        # stats
+        self.batches = 0
+        self.frames = 0
+        self.superseded = 0
+        self.infer_ms_ema = 0.0
+        self.wait_ms_ema = 0.0
+
+    def submit(self, cam_id: str, frame: np.ndarray) -> Future:
+        fut: Future = Future()
+        with self._cv:
+            if self._stopping:
+                fut.cancel()
+                return fut
+            old = self._pending.get(cam_id)
+            if old is not None and old[2].cancel():
+                self.superseded += 1
+            self._pending[cam_id] = (time.time(), frame, fut)
+            self._cv.notify()
+        return fut
+
+    def infer(self, cam_id: str, frame: np.ndarray, timeout=None):
+        return self.submit(cam_id, frame).result(timeout=timeout)
+
+    def stop(self):
+        """Cancel frames still waiting; a batch already running finishes."""
+        with self._cv:
+            self._stopping = True
+            for _, _, fut in self._pending.values():
+                fut.cancel()
+            self._pending.clear()
+            self._cv.notify_all()
+
+    def _take_batch(self):
+        with self._cv:
+            while not self._stopping:
+                if not self._pending:
+                    self._cv.wait(0.5)
+                    continue
+                oldest = min(v[0] for v in self._pending.values())
+                left = oldest + self.max_wait - time.time()
+                if len(self._pending) >= self.max_batch or left <= 0:
+                    break
+                self._cv.wait(left)
+            if self._stopping:
+                return []
+            order = sorted(self._pending.items(), key=lambda kv: kv[1][0])[: self.max_batch]
+            for cam_id, _ in order:
+                del self._pending[cam_id]
+        return [(cam_id, ts, frame, fut) for cam_id, (ts, frame, fut) in order]
+
+    def run(self):
+        while not self._stopping:
+            batch = self._take_batch()
+            batch = [b for b in batch if b[3].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            t0 = time.time()
+            try:
+                results = self.det.infer_batch([b[2] for b in batch])
+            except Exception as e:
+                print("[Inference] batch failed:", e)
+                for b in batch:
+                    b[3].set_exception(e)
+                continue
+            t1 = time.time()
+            for (_, _, _, fut), dets in zip(batch, results):
+                fut.set_result(dets)
+
+            self.batches += 1
+            self.frames += len(batch)
+            waited = sum(t0 - b[1] for b in batch) / len(batch)
+            self.infer_ms_ema = 0.9 * self.infer_ms_ema + 0.1 * (t1 - t0) * 1000.0
+            self.wait_ms_ema = 0.9 * self.wait_ms_ema + 0.1 * waited * 1000.0
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "frames": self.frames,
+            "avg_batch": round(self.frames / max(1, self.batches), 2),
+            "superseded": self.superseded,
+            "pending": len(self._pending),
+            "infer_ms": round(self.infer_ms_ema, 1),
+            "queue_wait_ms": round(self.wait_ms_ema, 1),
+        }
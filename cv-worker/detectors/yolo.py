@@ -2,34 +2,42 @@
 from ultralytics import YOLO
 import numpy as np
 
-class YoloDetector:
+from utils.framectx import FrameContext
+from .base import Detector
+
+class YoloDetector(Detector):
+    """ultralytics backend: YOLO(weights).predict on the RGB view of each frame."""
+    backend = "ultralytics"
+
     def __init__(self, weights: str, conf: float = 0.35, iou: float = 0.45, classes=None, imgsz: int = 640):
         self.model = YOLO(weights)
         self.conf = conf
         self.iou = iou
         self.imgsz = imgsz
-        self._class_filter = None
         # map class names -> indices (case-insensitive)
         names = self.model.names if isinstance(self.model.names, dict) else {i: n for i, n in enumerate(self.model.names)}
-        if classes:
-            name_to_idx = {v.lower(): k for k, v in names.items()}
-            self._class_filter = [name_to_idx[c.lower()] for c in classes if c.lower() in name_to_idx]
+        cf = self.class_filter(names, classes)
+        self._class_filter = cf.tolist() if cf is not None else None
 
-    def infer(self, frame_bgr):
-        # BGR -> RGB for ultralytics
+    def infer_batch(self, frames_bgr):
+        # frames are ndarrays or FrameContexts; RGB for ultralytics (shared
+        # with other stages via the context); one predict call for the batch
         results = self.model.predict(
-            source=frame_bgr[..., ::-1],
+            source=[FrameContext.of(f).rgb for f in frames_bgr],
             conf=self.conf,
             iou=self.iou,
             classes=self._class_filter,
             imgsz=self.imgsz,
             verbose=False
         )
+        out = [self._to_dets(r) for r in (results or [])]
+        out += [[] for _ in range(len(frames_bgr) - len(out))]
+        return out
+
+    @staticmethod
+    def _to_dets(r0):
         dets = []
-        if not results:
-            return dets
-        r0 = results[0]
-        if r0.boxes is None:
+        if r0 is None or r0.boxes is None:
             return dets
         boxes = r0.boxes.xyxy.cpu().numpy()
         confs = r0.boxes.conf.cpu().numpy()
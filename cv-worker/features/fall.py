@@ -1,29 +1,39 @@
+import numpy as np
+from tracking.batch import TrackBatch
+
 class FallDetector:
     def __init__(self, ar_thr=0.55, persist=10):
         self.ar_thr = ar_thr
         self.persist = persist
         self.state = {}  # track_id -> frames low aspect ratio
 
+    def configure(self, ar_thr=None, persist=None):
+        if ar_thr is not None:
+            self.ar_thr = ar_thr
+        if persist is not None:
+            self.persist = persist
+
     def step(self, tracks, ts, camera_id):
         events = []
-        for t in tracks:
-            if t["class_name"] != "person": continue
-            x1,y1,x2,y2 = t["xyxy"]
-            h = (y2 - y1); w = (x2 - x1)
-            ar = h / max(1.0, w)
-            tid = t["track_id"]
-            if ar < self.ar_thr:
-                c = self.state.get(tid, 0) + 1
-                self.state[tid] = c
-                if c == self.persist:
-                    events.append({
-                        "ts_utc": ts, "camera_id": camera_id,
-                        "event_type": "fall", "severity": "high",
-                        "zone": None,
-                        "tracks": [{"track_id": tid, "klass": "person"}],
-                        "metrics": {"aspect_ratio": round(ar,2), "frames": c},
-                        "explanation": f"Person #{tid} prone-like posture {c} frames"
-                    })
-            else:
-                self.state.pop(tid, None)
+        tb = TrackBatch.from_dicts(tracks)
+        p = tb.of_class("person")
+        if not len(p):
+            return events
+        b = tb.boxes[p].astype(np.float64)
+        ar = (b[:, 3] - b[:, 1]) / np.maximum(1.0, b[:, 2] - b[:, 0])
+        low = ar < self.ar_thr
+        for tid in tb.ids[p][~low].tolist():
+            self.state.pop(tid, None)
+        for tid, r in zip(tb.ids[p][low].tolist(), ar[low].tolist()):
+            c = self.state.get(tid, 0) + 1
+            self.state[tid] = c
+            if c == self.persist:
+                events.append({
+                    "ts_utc": ts, "camera_id": camera_id,
+                    "event_type": "fall", "severity": "high",
+                    "zone": None,
+                    "tracks": [{"track_id": tid, "klass": "person"}],
+                    "metrics": {"aspect_ratio": round(r,2), "frames": c},
+                    "explanation": f"Person #{tid} prone-like posture {c} frames"
+                })
         return events
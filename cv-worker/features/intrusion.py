@@ -1,33 +1,52 @@
-from utils.geometry import bbox_center, point_in_poly
+from tracking.batch import TrackBatch
+from utils.zones import ZoneIndex
 
 class IntrusionDetector:
-    def __init__(self, zones_cfg, persist_frames=8):
-        self.restricted = [z for z in zones_cfg or [] if z.get("type") == "restricted"]
+    def __init__(self, zones_cfg, persist_frames=8, index: ZoneIndex = None):
+        self.index = index or ZoneIndex(zones_cfg)
+        self.restricted = [(i, z) for i, z in enumerate(self.index.zones) if z.get("type") == "restricted"]
         self.persist = persist_frames
         self.state = {}  # (zone, track_id) -> frames inside
 
+    def configure(self, persist_frames=None):
+        if persist_frames is not None:
+            self.persist = int(persist_frames)
+
+    def set_zones(self, index: ZoneIndex):
+        """Swap in a new zone index; counts survive for restricted zones that still exist."""
+        self.index = index
+        self.restricted = [(i, z) for i, z in enumerate(index.zones) if z.get("type") == "restricted"]
+        names = {z["name"] for _, z in self.restricted}
+        self.state = {k: v for k, v in self.state.items() if k[0] in names}
+
     def step(self, tracks, ts, camera_id):
         events = []
-        for t in tracks:
-            if t["class_name"] != "person":
-                continue
-            cx, cy = bbox_center(t["xyxy"])
-            for z in self.restricted:
-                key = (z["name"], t["track_id"])
-                if point_in_poly(cx, cy, z["polygon"]):
-                    c = self.state.get(key, 0) + 1
-                    self.state[key] = c
-                    if c == self.persist:
-                        events.append({
-                            "ts_utc": ts,
-                            "camera_id": camera_id,
-                            "event_type": "intrusion",
-                            "severity": "high",
-                            "zone": z["name"],
-                            "tracks": [{"track_id": t["track_id"], "klass": "person"}],
-                            "metrics": {"frames_persisted": c},
-                            "explanation": f"Person #{t['track_id']} persisted {c} frames in restricted zone {z['name']}"
-                        })
-                else:
-                    self.state.pop(key, None)
+        tb = TrackBatch.from_dicts(tracks)
+        p = tb.of_class("person")
+        if not len(p) or not self.restricted:
+            return events
+        ids = tb.ids[p]
+        inside = self.index.membership(tb.centers[p])
+        present = set(ids.tolist())
+        for i, z in self.restricted:
+            hit = ids[inside[:, i]].tolist()
+            # present but outside: reset that pair's count
+            hit_set = set(hit)
+            for key in [k for k in self.state if k[0] == z["name"] and k[1] in present and k[1] not in hit_set]:
+                del self.state[key]
+            for tid in hit:
+                key = (z["name"], tid)
+                c = self.state.get(key, 0) + 1
+                self.state[key] = c
+                if c == self.persist:
+                    events.append({
+                        "ts_utc": ts,
+                        "camera_id": camera_id,
+                        "event_type": "intrusion",
+                        "severity": "high",
+                        "zone": z["name"],
+                        "tracks": [{"track_id": tid, "klass": "person"}],
+                        "metrics": {"frames_persisted": c},
+                        "explanation": f"Person #{tid} persisted {c} frames in restricted zone {z['name']}"
+                    })
         return events
@@ -1,42 +1,56 @@
-from utils.geometry import bbox_center, point_in_poly
+from tracking.batch import TrackBatch
+from utils.zones import ZoneIndex
 from datetime import datetime, timezone
 
 def to_iso(ts: float) -> str:
     return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat(timespec="milliseconds").replace("+00:00","Z")
 
 class LoiteringDetector:
-    def __init__(self, zones_cfg):
-        self.general = [z for z in (zones_cfg or []) if z.get("type","general") == "general"]
+    def __init__(self, zones_cfg, index: ZoneIndex = None):
+        self.index = index or ZoneIndex(zones_cfg)
+        self.general = [(i, z) for i, z in enumerate(self.index.zones) if z.get("type","general") == "general"]
         self.dwell = {}  # (zone_name, track_id) -> first_seen_ts (float seconds)
 
+    def set_zones(self, index: ZoneIndex):
+        """Swap in a new zone index (and loiter_seconds); dwell survives for general zones that still exist."""
+        self.index = index
+        self.general = [(i, z) for i, z in enumerate(index.zones) if z.get("type","general") == "general"]
+        names = {z["name"] for _, z in self.general}
+        self.dwell = {k: v for k, v in self.dwell.items() if k[0] in names}
+
     def step(self, tracks, ts, camera_id):
         # ts is float seconds (epoch)
         events = []
         now = ts
-        for t in tracks:
-            if t["class_name"] != "person":
-                continue
-            cx, cy = bbox_center(t["xyxy"])
-            for z in self.general:
-                key = (z["name"], t["track_id"])
-                if point_in_poly(cx, cy, z["polygon"]):
-                    if key not in self.dwell:
-                        self.dwell[key] = now
-                    dwell_s = now - self.dwell[key]
-                    thr = float(z.get("loiter_seconds", 30))
-                    # fire once near threshold
-                    if dwell_s >= thr and (dwell_s - thr) < 1.0:
-                        events.append({
-                            "ts_utc": to_iso(now),
-                            "camera_id": camera_id,
-                            "event_type": "loitering",
-                            "severity": "med",
-                            "zone": z["name"],
-                            "tracks": [{"track_id": t["track_id"], "klass":"person"}],
-                            "metrics": {"dwell_sec": round(dwell_s,2)},
-                            "explanation": f"Person #{t['track_id']} loitering {round(dwell_s)}s in {z['name']}"
-                        })
-                else:
-                    # left this zone: reset that pair’s dwell
-                    self.dwell.pop(key, None)
+        tb = TrackBatch.from_dicts(tracks)
+        p = tb.of_class("person")
+        if not len(p) or not self.general:
+            return events
+        ids = tb.ids[p]
+        inside = self.index.membership(tb.centers[p])
+        present = set(ids.tolist())
+        for i, z in self.general:
+            hit = ids[inside[:, i]].tolist()
+            # left this zone: reset that pair’s dwell
+            hit_set = set(hit)
+            for key in [k for k in self.dwell if k[0] == z["name"] and k[1] in present and k[1] not in hit_set]:
+                del self.dwell[key]
+            thr = float(z.get("loiter_seconds", 30))
+            for tid in hit:
+                key = (z["name"], tid)
+                if key not in self.dwell:
+                    self.dwell[key] = now
+                dwell_s = now - self.dwell[key]
+                # fire once near threshold
+                if dwell_s >= thr and (dwell_s - thr) < 1.0:
+                    events.append({
+                        "ts_utc": to_iso(now),
+                        "camera_id": camera_id,
+                        "event_type": "loitering",
+                        "severity": "med",
+                        "zone": z["name"],
+                        "tracks": [{"track_id": tid, "klass":"person"}],
+                        "metrics": {"dwell_sec": round(dwell_s,2)},
+                        "explanation": f"Person #{tid} loitering {round(dwell_s)}s in {z['name']}"
+                    })
         return events
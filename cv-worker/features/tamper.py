@@ -2,7 +2,24 @@
 import cv2, numpy as np, time
 from datetime import datetime
 
+from utils.framectx import FrameContext
+
+def phash64(gray_small) -> int:
+    """64-bit perceptual hash: sign of the 8x8 low-frequency DCT block vs its median."""
+    g = cv2.resize(gray_small, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(g)[:8, :8].flatten()
+    bits = low > np.median(low[1:])  # DC term left out of the median
+    return int(np.packbits(bits).view(">u8")[0])
+
 class TamperDetector:
+    """
+    Blur / freeze / covered-lens checks. Tamper unfolds over seconds, so the
+    checks run at a reduced rate (every N frames, or every T ms of frame ts)
+    on a small downscaled copy of the frame. warmup_frames and persist_frames
+    count evaluations, and all timing uses the frame ts, so replayed video
+    gives the same result as live.
+    """
+
     def __init__(
         self,
         warmup_frames=60,
@@ -13,6 +30,10 @@ class TamperDetector:
         freeze_seconds=60,
         hist_flat_thr=0.990,
         ema_alpha=0.05,              # smoothing for baseline
+        every_n_frames=1,            # evaluate every Nth frame ...
+        every_ms=0,                  # ... or, if > 0, at most once per T ms of frame ts
+        eval_width=160,              # evaluation image width (px)
+        freeze_hash_bits=2,          # max phash Hamming distance still counted as "same frame"
     ):
         # thresholds
         self.warmup_frames   = int(warmup_frames)
@@ -23,25 +44,82 @@ class TamperDetector:
         self.freeze_seconds  = float(freeze_seconds)
         self.hist_flat_thr   = float(hist_flat_thr)
         self.ema_alpha       = float(ema_alpha)
+        self.every_n_frames  = max(1, int(every_n_frames))
+        self.every_ms        = float(every_ms)
+        self.eval_width      = int(eval_width)
+        self.freeze_hash_bits= int(freeze_hash_bits)
 
         # state
-        self._frame_count = 0
+        self._frame_count = 0   # evaluations
+        self._seen_frames = 0
+        self._last_eval_ts = None
         self._lap_baseline = None
         self._below_cnt = 0
-        self._last_alert_ts = 0.0
+        self._last_alert_ts = None
 
         self._last_hash = None
         self._freeze_since = None
 
+        # stats
+        self.eval_ms = 0.0
+
+    def configure(self, **params):
+        """Update thresholds in place (constructor names); the baseline is kept unless eval_width changes."""
+        casts = {"warmup_frames": int, "persist_frames": int, "every_n_frames": lambda v: max(1, int(v)),
+                 "eval_width": int, "freeze_hash_bits": int}
+        old_width = self.eval_width
+        for k, v in params.items():
+            if not hasattr(self, k):
+                raise ValueError(f"unknown tamper setting: {k}")
+            setattr(self, k, casts.get(k, float)(v))
+        if self.eval_width != old_width:
+            # blur / hash values are not comparable across eval sizes
+            self._lap_baseline = None
+            self._below_cnt = 0
+            self._last_hash = None
+            self._freeze_since = None
+
     def _iso(self, ts: float) -> str:
         return datetime.utcfromtimestamp(ts).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
 
+    def _due(self, ts) -> bool:
+        self._seen_frames += 1
+        if self.every_ms > 0:
+            if self._last_eval_ts is not None and (ts - self._last_eval_ts) * 1000.0 < self.every_ms:
+                return False
+        elif (self._seen_frames - 1) % self.every_n_frames:
+            return False
+        self._last_eval_ts = ts
+        return True
+
+    def _small_gray(self, frame):
+        if isinstance(frame, FrameContext):
+            return frame.small_gray(self.eval_width)
+        h, w = frame.shape[:2]
+        if self.eval_width and w > self.eval_width:
+            sh = max(1, int(round(h * self.eval_width / w)))
+            frame = cv2.resize(frame, (self.eval_width, sh), interpolation=cv2.INTER_AREA)
+        return frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    def _can_alert(self, ts) -> bool:
+        return self._last_alert_ts is None or (ts - self._last_alert_ts) >= self.cooldown_seconds
+
+    def stats(self):
+        return {
+            "frames": self._seen_frames,
+            "evaluations": self._frame_count,
+            "eval_ms_avg": round(self.eval_ms, 3),
+        }
+
     def step_frame(self, frame, ts, camera_id):
         events = []
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if not self._due(ts):
+            return events
+        t0 = time.perf_counter()
+        gray = self._small_gray(frame)
 
         # --- Laplacian variance (sharpness proxy) ---
-        lap_var = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+        lap_var = float(cv2.Laplacian(gray, cv2.CV_32F).var())
         self._frame_count += 1
 
         # Build/Update EMA baseline
@@ -65,8 +143,7 @@ class TamperDetector:
             else:
                 self._below_cnt = 0
 
-            can_alert = (time.time() - self._last_alert_ts) >= self.cooldown_seconds
-            if self._below_cnt >= self.persist_frames and can_alert:
+            if self._below_cnt >= self.persist_frames and self._can_alert(ts):
                 events.append({
                     "ts_utc": self._iso(ts),
                     "camera_id": camera_id,
@@ -82,20 +159,20 @@ class TamperDetector:
                         f"Sharpness drop: var={lap_var:.1f} "
                         f"(baseline {self._lap_baseline:.1f}, "
                         f"ratio {lap_var/max(1e-3,self._lap_baseline):.2f}); "
-                        f"persist {self._below_cnt} frames"
+                        f"persist {self._below_cnt} checks"
                     )
                 })
                 self._below_cnt = 0
-                self._last_alert_ts = time.time()
+                self._last_alert_ts = ts
 
         # --- Freeze detection (debounced) ---
-        # Simple hash = mean intensity bucketed by 1
-        h = int(gray.mean())
-        if self._last_hash is not None and h == self._last_hash:
+        # perceptual hash of the small image; near-identical hashes = same picture
+        h = phash64(gray)
+        if self._last_hash is not None and bin(h ^ self._last_hash).count("1") <= self.freeze_hash_bits:
             if self._freeze_since is None:
                 self._freeze_since = ts
             elif (ts - self._freeze_since) >= self.freeze_seconds:
-                if (time.time() - self._last_alert_ts) >= self.cooldown_seconds:
+                if self._can_alert(ts):
                     events.append({
                         "ts_utc": self._iso(ts),
                         "camera_id": camera_id,
@@ -104,7 +181,7 @@ class TamperDetector:
                         "metrics": {"frozen_sec": round(ts - self._freeze_since, 2)},
                         "explanation": f"Frozen frame for {round(ts - self._freeze_since,1)}s"
                     })
-                    self._last_alert_ts = time.time()
+                    self._last_alert_ts = ts
                 self._freeze_since = ts + 9999  # avoid refire immediately
         else:
             self._freeze_since = None
@@ -114,7 +191,7 @@ class TamperDetector:
         hist = cv2.calcHist([gray],[0],None,[16],[0,256]).flatten()
         hist = hist / (hist.sum() + 1e-6)
         if hist.max() >= self.hist_flat_thr:
-            if (time.time() - self._last_alert_ts) >= self.cooldown_seconds:
+            if self._can_alert(ts):
                 events.append({
                     "ts_utc": self._iso(ts),
                     "camera_id": camera_id,
@@ -123,6 +200,8 @@ class TamperDetector:
                     "metrics": {"hist_max_bin": float(hist.max())},
                     "explanation": f"Histogram dominance (covered/near-dark); max bin={hist.max():.3f}"
                 })
-                self._last_alert_ts = time.time()
+                self._last_alert_ts = ts
 
+        ms = (time.perf_counter() - t0) * 1000.0
+        self.eval_ms = ms if self._frame_count == 1 else 0.9 * self.eval_ms + 0.1 * ms
         return events
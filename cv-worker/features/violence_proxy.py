@@ -1,44 +1,68 @@
-import math
-
-def _center(b): x1,y1,x2,y2=b; return ((x1+x2)/2,(y1+y2)/2)
+import numpy as np
+from tracking.batch import TrackBatch
 
 class ViolenceProxy:
     def __init__(self, dist_thr=140.0, speed_thr=40.0, persist=6):
         self.dist_thr = dist_thr
         self.speed_thr = speed_thr
         self.persist = persist
-        self.prev_centers = {}  # track_id -> (x,y)
+        self.prev_ids = np.zeros(0, dtype=np.int64)       # sorted track ids of last frame
+        self.prev_centers = np.zeros((0, 2))               # matching centres
         self.state = {}         # (a,b) -> frames
 
+    def configure(self, dist_thr=None, speed_thr=None, persist=None):
+        if dist_thr is not None:
+            self.dist_thr = dist_thr
+        if speed_thr is not None:
+            self.speed_thr = speed_thr
+        if persist is not None:
+            self.persist = persist
+
+    def _speeds(self, ids, centers):
+        speeds = np.zeros(len(ids))
+        if len(self.prev_ids):
+            pos = np.clip(np.searchsorted(self.prev_ids, ids), 0, len(self.prev_ids) - 1)
+            found = self.prev_ids[pos] == ids
+            delta = centers[found] - self.prev_centers[pos[found]]
+            speeds[found] = np.hypot(delta[:, 0], delta[:, 1])
+        return speeds
+
     def step(self, tracks, ts, camera_id):
         events = []
-        persons = [t for t in tracks if t["class_name"] == "person"]
-        centers = {t["track_id"]: _center(t["xyxy"]) for t in persons}
-        speeds = {tid: math.hypot(centers[tid][0]-self.prev_centers.get(tid, centers[tid])[0],
-                                  centers[tid][1]-self.prev_centers.get(tid, centers[tid])[1])
-                  for tid in centers}
-
-        for i in range(len(persons)):
-            for j in range(i+1, len(persons)):
-                a = persons[i]["track_id"]; b = persons[j]["track_id"]
-                ax,ay = centers[a]; bx,by = centers[b]
-                d = math.hypot(ax-bx, ay-by)
-                ssum = speeds.get(a,0.0) + speeds.get(b,0.0)
-                key = (min(a,b), max(a,b))
-                if d < self.dist_thr and ssum > self.speed_thr:
-                    c = self.state.get(key, 0) + 1
-                    self.state[key] = c
-                    if c == self.persist:
-                        events.append({
-                            "ts_utc": ts, "camera_id": camera_id,
-                            "event_type": "violence_proxy", "severity": "med",
-                            "zone": None,
-                            "tracks": [{"track_id": a, "klass":"person"},{"track_id": b, "klass":"person"}],
-                            "metrics": {"pair_distance_px": round(d,1), "speed_sum": round(ssum,1), "frames": c},
-                            "explanation": f"Close & high-motion interaction between #{a} and #{b}"
-                        })
-                else:
-                    self.state.pop(key, None)
-
-        self.prev_centers = centers
+        tb = TrackBatch.from_dicts(tracks)
+        p = tb.of_class("person")
+        ids = tb.ids[p]
+        centers = tb.centers[p].astype(np.float64)
+        speeds = self._speeds(ids, centers)
+
+        # candidate pairs from the frame's neighbour grid, already in i < j order
+        ii, jj, d = tb.grid("person").pairs_within(self.dist_thr)
+        ssum = speeds[ii] + speeds[jj]
+        hit = ssum > self.speed_thr
+        ii, jj, d, ssum = ii[hit], jj[hit], d[hit], ssum[hit]
+
+        # pairs of present persons that no longer qualify reset
+        idl = ids.tolist()
+        present = set(idl)
+        hot = {(min(idl[i], idl[j]), max(idl[i], idl[j])) for i, j in zip(ii.tolist(), jj.tolist())}
+        for key in [k for k in self.state if k[0] in present and k[1] in present and k not in hot]:
+            del self.state[key]
+
+        for k, (i, j) in enumerate(zip(ii.tolist(), jj.tolist())):
+            a = idl[i]; b = idl[j]
+            key = (min(a,b), max(a,b))
+            c = self.state.get(key, 0) + 1
+            self.state[key] = c
+            if c == self.persist:
+                events.append({
+                    "ts_utc": ts, "camera_id": camera_id,
+                    "event_type": "violence_proxy", "severity": "med",
+                    "zone": None,
+                    "tracks": [{"track_id": a, "klass":"person"},{"track_id": b, "klass":"person"}],
+                    "metrics": {"pair_distance_px": round(float(d[k]),1), "speed_sum": round(float(ssum[k]),1), "frames": c},
+                    "explanation": f"Close & high-motion interaction between #{a} and #{b}"
+                })
+
+        order = np.argsort(ids)
+        self.prev_ids, self.prev_centers = ids[order], centers[order]
         return events
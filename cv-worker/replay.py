@@ -0,0 +1,233 @@
+# cv-worker/replay.py
+"""
+Offline replay: the live worker's detector / tracker / feature stack over
+recorded files, as fast as the CPU allows (no fps_cap pacing, no grabber).
+
+  python replay.py clips/a.mp4 clips/b.mp4 --out events.jsonl
+  python replay.py footage/*.mp4 --out events.jsonl --jobs 4 --t0 2025-03-01T10:00:00Z
+  python replay.py a.mp4 --camera cam01 --every-k 1 --no-motion-gate --summary perf.json
+
+Frame time comes from the container PTS (CAP_PROP_POS_MSEC) plus --t0, not
+the wall clock, so dwell / persistence / cooldown logic runs on video time.
+Each event is one JSONL line with "source", "pts_sec" and "frame" added;
+instead of an encoded clip, artifacts.clip points into the source file
+(start/end seconds, same pre-roll as the live worker). Frames are sent to
+the detector in batches of --batch; tracking and features still step one
+frame at a time. A per-file summary (frames, detector runs, wall time,
+fps, x realtime, events by type) is printed at the end and can be written
+as JSON with --summary, e.g. as a performance-regression baseline.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+
+import cv2
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+from detectors import build_detector
+from utils import config as cfgutil
+from utils.framectx import FrameContext, FrameCtxStats
+from utils.zones import ZoneIndex
+from worker import iso_utc, make_features, make_motion_gate, make_tamper, make_tracker
+
+def iter_frames(path: str):
+    """(frame number, pts seconds, frame) in decode order."""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise RuntimeError(f"could not open {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    step = 1.0 / fps if fps and fps > 0 else 1.0 / 25.0
+    n, prev = 0, None
+    try:
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            pts = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            if prev is not None and pts <= prev:  # container without usable PTS
+                pts = prev + step
+            prev = pts
+            n += 1
+            yield n, pts, frame
+    finally:
+        cap.release()
+
+
+class Replay:
+    """One detector, reused for every file; per-file tracker / feature state."""
+
+    def __init__(self, cfg: dict, detector, every_k=None, motion_gate=None, batch: int = 8, pre_seconds: float = 7.0):
+        self.cfg = cfg
+        self.det = detector
+        dcfg = dict(cfg.get("detection") or {})
+        if every_k is not None:
+            dcfg["every_k"] = every_k
+        if motion_gate is not None:
+            dcfg["motion_gate"] = motion_gate
+        self.dcfg = dcfg
+        self.batch = max(1, int(batch))
+        self.pre_seconds = float(pre_seconds)
+
+    def run(self, path: str, cam_id: str, t0: float = 0.0):
+        """Replay one file -> (events, summary)."""
+        cfg = self.cfg
+        cap = cv2.VideoCapture(path)
+        w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 640
+        h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 480
+        cap.release()
+        zones_cfg = cfg.get("zones") or []
+        features = make_features(zones_cfg, ZoneIndex(zones_cfg, width=w, height=h), cfg.get("features") or {})
+        tracker = make_tracker(cfg.get("tracker") or {})
+        tamper = make_tamper(cfg.get("tamper") or {})
+        motion = make_motion_gate(self.dcfg)
+        every_k = max(1, int(self.dcfg.get("every_k", 1)))
+        max_skip = float(self.dcfg.get("max_skip_seconds", 2.0))
+        stats = FrameCtxStats()
+
+        events = []
+        pending = []  # (seq, pts, ctx, detect?, moving?)
+        counts = Counter()
+        last_detect, since_detect = None, 0
+        last_pts = 0.0
+
+        def flush():
+            todo = [c for _, _, c, d, _ in pending if d]
+            dets = iter(self.det.infer_batch(todo) if todo else [])
+            for seq, pts, ctx, detect, moving in pending:
+                ts = t0 + pts
+                batch = list(tamper.step_frame(ctx, ts, cam_id))
+                if detect:
+                    tracks = tracker.update(next(dets))
+                else:
+                    tracks = tracker.predict() if moving else tracker.hold()
+                for f in features:
+                    batch.extend(f.step(tracks, ts, cam_id))
+                if not batch:
+                    continue
+                clip = {"source": path, "start_sec": round(max(0.0, pts - self.pre_seconds), 3), "end_sec": round(pts, 3)}
+                for ev in batch:
+                    ev.setdefault("artifacts", {})["clip"] = clip
+                    ev["ts_utc"] = iso_utc(ev.get("ts_utc", ts))
+                    ev.update(source=path, pts_sec=round(pts, 3), frame=seq)
+                    counts[ev["event_type"]] += 1
+                    events.append(ev)
+            pending.clear()
+
+        wall0 = time.perf_counter()
+        n = inferred = 0
+        for seq, pts, frame in iter_frames(path):
+            n, last_pts = seq, pts
+            ctx = FrameContext(frame, t0 + pts, seq, stats=stats)
+            # same rules as CameraWorker._skip_reason, on video time
+            moving = motion.moving(ctx) if motion else True
+            detect = (last_detect is None or pts - last_detect >= max_skip
+                      or (moving and since_detect + 1 >= every_k))
+            if detect:
+                last_detect, since_detect = pts, 0
+                inferred += 1
+            else:
+                since_detect += 1
+            pending.append((seq, pts, ctx, detect, moving))
+            if len(pending) >= self.batch:
+                flush()
+        flush()
+        wall = time.perf_counter() - wall0
+
+        return events, {
+            "source": path,
+            "camera_id": cam_id,
+            "frames": n,
+            "inferred": inferred,
+            "video_seconds": round(last_pts, 2),
+            "wall_seconds": round(wall, 2),
+            "fps": round(n / wall, 1) if wall > 0 else 0.0,
+            "x_realtime": round(last_pts / wall, 2) if wall > 0 else 0.0,
+            "events": dict(counts),
+        }
+
+
+# ---------- --jobs > 1: one detector per worker process ----------
+_replay = None
+
+def _init_job(cfg, kw):
+    global _replay
+    _replay = Replay(cfg, build_detector(cfg["yolo"]), **kw)
+
+def _run_job(args):
+    return _replay.run(*args)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay recorded video through the analysis stack.")
+    ap.add_argument("videos", nargs="+")
+    ap.add_argument("--out", default="-", help="events JSONL (default stdout)")
+    ap.add_argument("--summary", help="also write the per-file summary as JSON")
+    ap.add_argument("--config", default=os.path.join(HERE, "config.yaml"))
+    ap.add_argument("--camera", help="camera id for every file (default: file name)")
+    ap.add_argument("--t0", default="0", help="epoch seconds or ISO-8601 of PTS 0 (default 1970-01-01)")
+    ap.add_argument("--batch", type=int, default=8, help="frames per detector call")
+    ap.add_argument("--every-k", type=int, help="override detection.every_k")
+    ap.add_argument("--no-motion-gate", action="store_true", help="detect regardless of motion")
+    ap.add_argument("--jobs", type=int, default=1, help="files replayed in parallel (one model each)")
+    args = ap.parse_args()
+
+    cfg = cfgutil.load(args.config)
+    errors = cfgutil.validate(cfg)
+    if errors:
+        sys.exit("config: " + "; ".join(errors))
+    try:
+        t0 = float(args.t0)
+    except ValueError:
+        from datetime import datetime, timezone
+        dt = datetime.fromisoformat(args.t0.replace("Z", "+00:00"))
+        t0 = (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+
+    kw = {"every_k": args.every_k, "motion_gate": False if args.no_motion_gate else None, "batch": args.batch}
+    jobs = [(p, args.camera or os.path.splitext(os.path.basename(p))[0], t0) for p in args.videos]
+
+    wall0 = time.perf_counter()
+    if args.jobs > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs, mp_context=mp.get_context("spawn"),
+                                 initializer=_init_job, initargs=(cfg, kw)) as pool:
+            results = list(pool.map(_run_job, jobs))
+    else:
+        _init_job(cfg, kw)
+        results = [_run_job(j) for j in jobs]
+    wall = time.perf_counter() - wall0
+
+    out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+    try:
+        for events, _ in results:
+            for ev in events:
+                out.write(json.dumps(ev) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    summaries = [s for _, s in results]
+    frames = sum(s["frames"] for s in summaries)
+    video = sum(s["video_seconds"] for s in summaries)
+    log = sys.stderr
+    print(f"{'file':>28} | {'frames':>7} {'det':>6} | {'wall s':>7} {'fps':>7} {'x rt':>6} | events", file=log)
+    for s in summaries:
+        ev = ", ".join(f"{k}={v}" for k, v in sorted(s["events"].items())) or "-"
+        print(f"{os.path.basename(s['source'])[-28:]:>28} | {s['frames']:>7} {s['inferred']:>6} | "
+              f"{s['wall_seconds']:>7.1f} {s['fps']:>7.1f} {s['x_realtime']:>6.1f} | {ev}", file=log)
+    total = {"files": len(summaries), "frames": frames, "video_seconds": round(video, 2), "wall_seconds": round(wall, 2),
+             "fps": round(frames / wall, 1) if wall > 0 else 0.0,
+             "x_realtime": round(video / wall, 2) if wall > 0 else 0.0,
+             "events": sum(sum(s["events"].values()) for s in summaries)}
+    print(f"total: {total['frames']} frames in {total['wall_seconds']} s = {total['fps']} fps "
+          f"({total['x_realtime']}x realtime), {total['events']} events", file=log)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump({"total": total, "files": summaries}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
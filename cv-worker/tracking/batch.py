@@ -0,0 +1,86 @@
+# cv-worker/tracking/batch.py
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from utils.spatial import DEFAULT_CELL, GridIndex
+
+class TrackBatch(Sequence):
+    """
+    Columnar view of one frame's tracks, as emitted by the trackers.
+      ids (N,) int64, boxes (N,4) float32 xyxy, centers (N,2), class_ids (N,),
+      confs (N,), lost (N,), class_names list[str]
+    of_class("person") gives cached row indices per class so features don't
+    each filter the list again; grid("person") is the matching neighbour index
+    (utils.spatial.GridIndex over those centres), also built once per frame.
+    It is also a Sequence of the old track dicts ({"track_id","xyxy",
+    "class_name","class_id","conf","lost"}), built lazily on first access, so
+    code that iterates tracks as dicts keeps working.
+    """
+
+    def __init__(self, ids, boxes, class_ids, confs, lost, class_names: List[str]):
+        self.ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.class_ids = np.asarray(class_ids, dtype=np.int32).reshape(-1)
+        self.confs = np.asarray(confs, dtype=np.float32).reshape(-1)
+        self.lost = np.asarray(lost, dtype=np.int32).reshape(-1)
+        self.class_names = list(class_names)
+        self.centers = (self.boxes[:, :2] + self.boxes[:, 2:]) * 0.5
+        self._by_class: Dict[tuple, np.ndarray] = {}
+        self._grids: Dict[tuple, GridIndex] = {}
+        self._dicts: Optional[List[dict]] = None
+
+    @classmethod
+    def from_dicts(cls, tracks) -> "TrackBatch":
+        if isinstance(tracks, TrackBatch):
+            return tracks
+        tracks = list(tracks or [])
+        return cls(
+            ids=[t["track_id"] for t in tracks],
+            boxes=[t["xyxy"] for t in tracks],
+            class_ids=[t.get("class_id", -1) for t in tracks],
+            confs=[t.get("conf", 0.0) for t in tracks],
+            lost=[t.get("lost", 0) for t in tracks],
+            class_names=[t["class_name"] for t in tracks],
+        )
+
+    def of_class(self, *names: str) -> np.ndarray:
+        """Row indices of tracks whose class_name is one of `names` (cached)."""
+        idx = self._by_class.get(names)
+        if idx is None:
+            wanted = set(names)
+            idx = np.array([i for i, n in enumerate(self.class_names) if n in wanted], dtype=np.int64)
+            self._by_class[names] = idx
+        return idx
+
+    def grid(self, *names: str, cell: float = DEFAULT_CELL) -> GridIndex:
+        """GridIndex over the centres of of_class(*names); point k is row of_class(...)[k]."""
+        key = (names, cell)
+        g = self._grids.get(key)
+        if g is None:
+            g = GridIndex(self.centers[self.of_class(*names)], cell=cell)
+            self._grids[key] = g
+        return g
+
+    # ------------------ dict-view adapter ------------------
+    def _as_dicts(self) -> List[dict]:
+        if self._dicts is None:
+            self._dicts = [{
+                "track_id": tid,
+                "xyxy": box,
+                "class_name": name,
+                "class_id": ci,
+                "conf": cf,
+                "lost": lost
+            } for tid, box, name, ci, cf, lost in zip(self.ids.tolist(), self.boxes.tolist(), self.class_names,
+                                                      self.class_ids.tolist(), self.confs.tolist(), self.lost.tolist())]
+        return self._dicts
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        return self._as_dicts()[i]
+
+    def __iter__(self):
+        return iter(self._as_dicts())
@@ -0,0 +1,148 @@
+# cv-worker/tracking/iou_tracker.py
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from .batch import TrackBatch
+
+_INVALID = 1e6
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of (N,4) and (M,4) xyxy boxes -> (N,M)."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    ix1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    iy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    ix2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    iy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+class IouTracker:
+    """
+    Drop-in replacement for CentroidTracker with the same update() contract.
+      - cost = iou_weight * (1 - IoU) + (1 - iou_weight) * centroid_dist / dist_thr,
+        built as one NumPy matrix; pairs of different classes, or with no overlap
+        and centroids farther than dist_thr, are not allowed to match
+      - optimal assignment (Hungarian) instead of greedy nearest neighbour
+      - constant-velocity motion model: unmatched tracks coast along their
+        velocity, and matching is done against the predicted boxes
+    """
+
+    def __init__(self, max_lost=15, dist_thr=80.0, iou_weight=0.6, vel_alpha=0.5, class_gated=True):
+        self.next_id = 1
+        self.max_lost = int(max_lost)
+        self.dist_thr = float(dist_thr)
+        self.iou_weight = float(iou_weight)
+        self.vel_alpha = float(vel_alpha)
+        self.class_gated = bool(class_gated)
+
+        # track state, one row per live track
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.boxes = np.zeros((0, 4), dtype=np.float32)   # last predicted/observed box
+        self.vel = np.zeros((0, 2), dtype=np.float32)     # centre px per frame
+        self.lost = np.zeros(0, dtype=np.int32)
+        self.since = np.zeros(0, dtype=np.int32)          # frames since last observed (incl. predict())
+        self.cls = np.zeros(0, dtype=np.int32)
+        self.conf = np.zeros(0, dtype=np.float32)
+        self.names = []  # class_name per row
+
+    def _cost(self, det_boxes: np.ndarray, det_cls: np.ndarray) -> np.ndarray:
+        iou = iou_matrix(self.boxes, det_boxes)
+        tc = (self.boxes[:, :2] + self.boxes[:, 2:]) * 0.5
+        dc = (det_boxes[:, :2] + det_boxes[:, 2:]) * 0.5
+        dist = np.hypot(tc[:, None, 0] - dc[None, :, 0], tc[:, None, 1] - dc[None, :, 1])
+        cost = self.iou_weight * (1.0 - iou) + (1.0 - self.iou_weight) * np.minimum(dist / self.dist_thr, 1.0)
+        invalid = (iou <= 0.0) & (dist > self.dist_thr)
+        if self.class_gated:
+            invalid |= self.cls[:, None] != det_cls[None, :]
+        cost[invalid] = _INVALID
+        return cost
+
+    def update(self, detections):
+        # detections: list of dicts with "xyxy", "class_name", "conf" (and "class_id")
+        m = len(detections)
+        det_boxes = np.array([d["xyxy"] for d in detections], dtype=np.float32).reshape(m, 4)
+        det_conf = np.array([d["conf"] for d in detections], dtype=np.float32)
+        det_names = [d["class_name"] for d in detections]
+        det_cls = np.array([d.get("class_id", -1) for d in detections], dtype=np.int32)
+
+        # predict: every track moves one frame along its velocity
+        if len(self.ids):
+            self.boxes = self.boxes + np.tile(self.vel, 2)
+
+        rows = cols = np.zeros(0, dtype=np.int64)
+        if len(self.ids) and m:
+            cost = self._cost(det_boxes, det_cls)
+            rows, cols = linear_sum_assignment(cost)
+            ok = cost[rows, cols] < _INVALID
+            rows, cols = rows[ok], cols[ok]
+
+        # update matched: blend velocity from the observed centre shift
+        if len(rows):
+            # predicted = last observed + (since+1)*vel, so this is the mean
+            # per-frame shift since the last observation
+            pred_c = (self.boxes[rows, :2] + self.boxes[rows, 2:]) * 0.5
+            new_c = (det_boxes[cols, :2] + det_boxes[cols, 2:]) * 0.5
+            step = self.vel[rows] + (new_c - pred_c) / (self.since[rows, None] + 1.0)
+            self.vel[rows] = self.vel_alpha * step + (1.0 - self.vel_alpha) * self.vel[rows]
+            self.boxes[rows] = det_boxes[cols]
+            self.conf[rows] = det_conf[cols]
+            self.cls[rows] = det_cls[cols]
+            for r, c in zip(rows.tolist(), cols.tolist()):
+                self.names[r] = det_names[c]
+
+        # unmatched tracks coast; drop the ones lost too long
+        matched = np.zeros(len(self.ids), dtype=bool)
+        matched[rows] = True
+        self.lost[matched] = 0
+        self.lost[~matched] += 1
+        self.since[matched] = 0
+        self.since[~matched] += 1
+        keep = self.lost <= self.max_lost
+        if not keep.all():
+            self.ids, self.boxes, self.vel = self.ids[keep], self.boxes[keep], self.vel[keep]
+            self.lost, self.cls, self.conf = self.lost[keep], self.cls[keep], self.conf[keep]
+            self.since = self.since[keep]
+            self.names = [n for n, k in zip(self.names, keep.tolist()) if k]
+
+        # new tracks for unmatched detections
+        new = np.ones(m, dtype=bool)
+        new[cols] = False
+        if new.any():
+            k = int(new.sum())
+            self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + k, dtype=np.int64)])
+            self.next_id += k
+            self.boxes = np.concatenate([self.boxes, det_boxes[new]])
+            self.vel = np.concatenate([self.vel, np.zeros((k, 2), dtype=np.float32)])
+            self.lost = np.concatenate([self.lost, np.zeros(k, dtype=np.int32)])
+            self.since = np.concatenate([self.since, np.zeros(k, dtype=np.int32)])
+            self.cls = np.concatenate([self.cls, det_cls[new]])
+            self.conf = np.concatenate([self.conf, det_conf[new]])
+            self.names += [det_names[j] for j in np.flatnonzero(new).tolist()]
+
+        return self._output()
+
+    def predict(self) -> TrackBatch:
+        """
+        Advance every track one frame along its velocity without a detection
+        step (frames where detection was skipped). lost is not incremented,
+        so coasting tracks are not aged out.
+        """
+        if len(self.ids):
+            self.boxes = self.boxes + np.tile(self.vel, 2)
+            self.since += 1
+        return self._output()
+
+    def hold(self) -> TrackBatch:
+        """
+        The tracks as they are, for frames the motion gate found static:
+        nothing moved, so nothing is advanced along its velocity.
+        """
+        return self._output()
+
+    def _output(self) -> TrackBatch:
+        # copies: the state arrays are updated in place on the next frame
+        return TrackBatch(self.ids.copy(), self.boxes.copy(), self.cls.copy(),
+                          self.conf.copy(), self.lost.copy(), list(self.names))
@@ -2,6 +2,8 @@
 import math
 import itertools
 
+from .batch import TrackBatch
+
 class CentroidTracker:
     def __init__(self, max_lost=15, dist_thr=80.0):
         self.next_id = 1
@@ -47,6 +49,7 @@ class CentroidTracker:
             d = detections[j]
             self.tracks[tid]["bbox"] = d["xyxy"]
             self.tracks[tid]["class_name"] = d["class_name"]
+            self.tracks[tid]["class_id"] = d.get("class_id", -1)
             self.tracks[tid]["conf"] = d["conf"]
             self.tracks[tid]["lost"] = 0
 
@@ -57,6 +60,7 @@ class CentroidTracker:
             self.tracks[self.next_id] = {
                 "bbox": d["xyxy"],
                 "class_name": d["class_name"],
+                "class_id": d.get("class_id", -1),
                 "conf": d["conf"],
                 "lost": 0
             }
@@ -72,15 +76,26 @@ class CentroidTracker:
                 to_del.append(tid)
         for tid in to_del:
             del self.tracks[tid]
+        return self._output()
+
+    def predict(self):
+        # no motion model: between detections the tracks stay where they were
+        return self._output()
+
+    hold = predict
 
-        # Return a list of tracks with IDs
+    def _output(self):
+        # Return the tracks with IDs (a TrackBatch; iterates as the old dicts)
         out = []
         for tid, data in self.tracks.items():
             out.append({
                 "track_id": tid,
                 "xyxy": data["bbox"],
                 "class_name": data["class_name"],
+                "class_id": data["class_id"],
                 "conf": data["conf"],
                 "lost": data["lost"]
             })
-        return out
+        batch = TrackBatch.from_dicts(out)
+        batch._dicts = out
+        return batch
@@ -1,6 +1,8 @@
 # cv-worker/utils/bus.py
-import requests, time, json
+import requests, time, json, os, queue, threading
 from datetime import datetime
+from pathlib import Path
+from requests.adapters import HTTPAdapter
 
 def _to_iso(ts):
     if ts is None:
@@ -10,27 +12,236 @@ def _to_iso(ts):
     # assume already a string
     return ts
 
-class EventBus:
-    def __init__(self, api_url="http://localhost:8080"):
+class EventBus(threading.Thread):
+    """
+    Background event sender shared by all camera workers.
+      - post_event() only enqueues; it never blocks the camera loop
+      - events go out in batches (batch_size or max_age_ms, whichever first)
+        to POST {api}/events/batch over one pooled session
+      - when the API is unreachable batches are appended to JSONL segments in
+        spool_dir and replayed oldest-first with exponential backoff
+    """
+
+    def __init__(self, api_url="http://localhost:8080", batch_size=20, max_age_ms=250, spool_dir="spool", max_queue=2000, timeout=2.5, max_backoff=60.0):
+        super().__init__(daemon=True)
         self.api_url = api_url.rstrip("/")
+        self.batch_size = max(1, int(batch_size))
+        self.max_age = max(0.0, float(max_age_ms)) / 1000.0
+        self.timeout = float(timeout)
+        self.max_backoff = float(max_backoff)
+        self.q: "queue.Queue[dict]" = queue.Queue(maxsize=int(max_queue))
+        self.spool_dir = Path(spool_dir)
+        os.makedirs(self.spool_dir, exist_ok=True)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._batch_supported = True
+
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._spool_lock = threading.Lock()
+        self._open_path = None
+        self._open_since = 0.0
+        self._open_lines = 0
+        self._stopping = False
 
+        # stats
+        self.sent = 0
+        self.batches = 0
+        self.failures = 0
+        self.dropped = 0
+        self.spooled = 0
+        self.replayed = 0
+        self.batch_ms_ema = 0.0
+
+    # ------------------ producer side ------------------
     def post_event(self, ev: dict):
         # normalize timestamp
         if "ts_utc" in ev:
             ev["ts_utc"] = _to_iso(ev["ts_utc"])
         else:
             ev["ts_utc"] = _to_iso(time.time())
+        try:
+            self.q.put_nowait(ev)
+        except queue.Full:
+            # sender is far behind; keep the event on disk instead of losing it
+            self._spool([ev])
 
-        url = f"{self.api_url}/events"
+    # ------------------ spool ------------------
+    def _spool(self, events):
+        # append to the open segment; rotate by age/size so replay can take sealed ones
+        with self._spool_lock:
+            now = time.time()
+            if self._open_path is None or now - self._open_since > 10.0 or self._open_lines >= 500:
+                self._open_path = self.spool_dir / f"{int(now * 1000):015d}.jsonl"
+                self._open_since, self._open_lines = now, 0
+            try:
+                with open(self._open_path, "a", encoding="utf-8") as fh:
+                    for ev in events:
+                        fh.write(json.dumps(ev, default=str) + "\n")
+                    fh.flush()
+                    os.fsync(fh.fileno())
+                self._open_lines += len(events)
+                self.spooled += len(events)
+            except Exception as e:
+                self.dropped += len(events)
+                print("[EventBus] spool write failed, dropping", len(events), "events:", e)
+
+    def _spool_files(self):
+        return sorted(self.spool_dir.glob("*.jsonl"))
+
+    def spool_pending(self) -> int:
+        n = 0
+        for p in self._spool_files():
+            try:
+                with open(p, "r", encoding="utf-8") as fh:
+                    n += sum(1 for ln in fh if ln.strip())
+            except OSError:
+                pass
+        return n
+
+    # ------------------ sending ------------------
+    def _send(self, events) -> bool:
+        """True when the API took the batch (or rejected it for good)."""
+        if not self._batch_supported:
+            return self._send_each(events)
+        t0 = time.time()
         try:
-            r = requests.post(url, json=ev, timeout=2.5)
-            print(f"[EventBus] POST {r.status_code} -> {url}")
+            r = self.session.post(f"{self.api_url}/events/batch", json={"events": events}, timeout=self.timeout)
+        except requests.RequestException as e:
+            self.failures += 1
+            print("[EventBus] POST failed:", e)
+            return False
+        if r.status_code == 404:
+            print("[EventBus] /events/batch not available, falling back to single POSTs")
+            self._batch_supported = False
+            return self._send_each(events)
+        if r.status_code >= 500:
+            self.failures += 1
+            print("[BUS] API error", r.status_code, r.text[:300])
+            return False
+        if r.status_code >= 300:
+            # bad request: retrying will not help
+            self.dropped += len(events)
+            print("[BUS] API rejected batch", r.status_code, r.text[:300])
+            return True
+
+        self.sent += len(events)
+        self.batches += 1
+        self.batch_ms_ema = 0.8 * self.batch_ms_ema + 0.2 * (time.time() - t0) * 1000.0
+        return True
+
+    def _send_each(self, events) -> bool:
+        # older API without /events/batch; on failure `events` keeps only the undelivered tail
+        t0 = time.time()
+        for i, ev in enumerate(events):
+            try:
+                r = self.session.post(f"{self.api_url}/events", json=ev, timeout=self.timeout)
+            except requests.RequestException as e:
+                r = None
+                print("[EventBus] POST failed:", e)
+            if r is None or r.status_code >= 500:
+                self.failures += 1
+                del events[:i]
+                return False
             if r.status_code >= 300:
-                print("[BUS] API error", r.status_code, r.text)
-                print("[EventBus] body:",r.text[:500])
-        except Exception as e:
-            print("[BUS] POST failed, printing event locally. Err:", e)
+                self.dropped += 1
+                print("[BUS] API error", r.status_code, r.text[:300])
+            else:
+                self.sent += 1
+        self.batches += 1
+        self.batch_ms_ema = 0.8 * self.batch_ms_ema + 0.2 * (time.time() - t0) * 1000.0
+        return True
+
+    def _deliver(self, events):
+        if time.time() < self._retry_at or self._spool_files():
+            # API is down or older events are still waiting: keep ordering
+            self._spool(events)
+            return
+        if not self._send(events):
+            self._spool(events)
+            self._fail()
+
+    def _fail(self):
+        self._backoff = min(self.max_backoff, max(1.0, self._backoff * 2))
+        self._retry_at = time.time() + self._backoff
+
+    def _replay(self):
+        files = self._spool_files()
+        if not files or time.time() < self._retry_at:
+            return
+        path = files[0]
+        with self._spool_lock:
+            if path == self._open_path:
+                self._open_path = None  # seal it; new events start a fresh segment
             try:
-                print(json.dumps(ev, indent=2)[:800])
-            except Exception:
-                print(str(ev)[:800])
+                with open(path, "r", encoding="utf-8") as fh:
+                    events = [json.loads(ln) for ln in fh if ln.strip()]
+            except (OSError, ValueError) as e:
+                print("[EventBus] unreadable spool file", path.name, e)
+                path.rename(path.with_suffix(".bad"))
+                return
+        for i in range(0, len(events), self.batch_size):
+            chunk = events[i:i + self.batch_size]
+            if not self._send(chunk):
+                # rewrite what is left so delivered events are not sent twice
+                rest = chunk + events[i + self.batch_size:]
+                with self._spool_lock:
+                    with open(path, "w", encoding="utf-8") as fh:
+                        for ev in rest:
+                            fh.write(json.dumps(ev, default=str) + "\n")
+                self._fail()
+                return
+            self.replayed += len(chunk)
+        self._backoff = 0.0
+        with self._spool_lock:
+            path.unlink(missing_ok=True)
+
+    def run(self):
+        while not self._stopping:
+            try:
+                first = self.q.get(timeout=0.5)
+            except queue.Empty:
+                self._replay()
+                continue
+            batch = [first]
+            deadline = time.time() + self.max_age
+            while len(batch) < self.batch_size:
+                left = deadline - time.time()
+                if left <= 0:
+                    break
+                try:
+                    batch.append(self.q.get(timeout=left))
+                except queue.Empty:
+                    break
+            self._deliver(batch)
+            self._replay()
+
+    def stop(self, flush_timeout=2.0):
+        # hand whatever is still queued to the spool so it survives the restart
+        self._stopping = True
+        self.join(timeout=flush_timeout)
+        pending = []
+        while True:
+            try:
+                pending.append(self.q.get_nowait())
+            except queue.Empty:
+                break
+        if pending:
+            self._spool(pending)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.q.qsize(),
+            "sent": self.sent,
+            "batches": self.batches,
+            "batch_ms": round(self.batch_ms_ema, 1),
+            "failures": self.failures,
+            "dropped": self.dropped,
+            "spooled": self.spooled,
+            "replayed": self.replayed,
+            "spool_files": len(self._spool_files()),
+            "backoff_s": round(max(0.0, self._retry_at - time.time()), 1),
+        }
@@ -0,0 +1,85 @@
+# cv-worker/utils/capture.py
+import threading
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+import cv2
+
+SlotT = Tuple[int, float, np.ndarray]  # (seq, capture_ts, frame_bgr)
+
+class FrameGrabber(threading.Thread):
+    """
+    Dedicated grab thread for one capture source.
+    Keeps only the newest decoded frame in a lock-protected slot so the backend
+    buffer never fills up; consumers always get the freshest frame and can tell
+    how many they skipped from the sequence numbers.
+    """
+
+    def __init__(self, cap: "cv2.VideoCapture", name: str = "cam", realtime: bool = False):
+        super().__init__(daemon=True, name=f"grab-{name}")
+        self.cap = cap
+        self.name = name
+        self._cv = threading.Condition()
+        self._slot: Optional[SlotT] = None
+        self._seq = 0
+        self._stopping = False
+        self.read_failures = 0
+
+        # files decode faster than real time; pace them at their native fps
+        self._period = 0.0
+        if realtime:
+            fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+            self._period = 1.0 / fps if fps > 0 else 0.0
+
+    def run(self):
+        next_t = time.time()
+        try:
+            while not self._stopping:
+                ok, frame = self.cap.read()
+                if not ok:
+                    self.read_failures += 1
+                    time.sleep(0.05); continue
+                ts = time.time()
+                with self._cv:
+                    self._seq += 1
+                    self._slot = (self._seq, ts, frame)
+                    self._cv.notify_all()
+                if self._period:
+                    next_t = max(next_t + self._period, ts - self._period)
+                    time.sleep(max(0.0, next_t - time.time()))
+        finally:
+            # only this thread touches cap once it runs; a read() on a stalled
+            # RTSP source can outlast stop()'s join
+            self._release()
+
+    def _release(self):
+        try:
+            if self.cap and self.cap.isOpened():
+                self.cap.release()
+        except Exception:
+            pass
+
+    def latest(self, after_seq: int = 0, timeout: float = 1.0) -> Optional[SlotT]:
+        """Newest frame with seq > after_seq, waiting up to `timeout` seconds."""
+        deadline = time.time() + timeout
+        with self._cv:
+            while not self._stopping and (self._slot is None or self._slot[0] <= after_seq):
+                left = deadline - time.time()
+                if left <= 0:
+                    return None
+                self._cv.wait(left)
+            return self._slot if not self._stopping else None
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def stop(self):
+        with self._cv:
+            self._stopping = True
+            self._cv.notify_all()
+        if self.ident is None:
+            self._release()  # never started, so run() will not release it
+        elif self.is_alive() and self is not threading.current_thread():
+            self.join(timeout=1.0)
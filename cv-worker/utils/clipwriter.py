@@ -1,11 +1,11 @@
 # cv-worker/utils/clipwriter.py
+import itertools
 import os
-import shutil
 import subprocess
-import tempfile
 import threading
 import queue
-from datetime import datetime
+import time
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import List, Tuple, Optional, Callable
 
@@ -24,16 +24,41 @@ except Exception as e:
 
 FrameT = Tuple[float, np.ndarray]  # (ts_float, frame_bgr)
 
+class ClipCache:
+    """
+    Content-addressed clip names keyed by (camera, [t0, t1]).
+    A window that overlaps a recent clip of the same camera and ends within
+    `horizon` seconds of it reuses that clip instead of encoding again.
+    """
+    def __init__(self, horizon: float = 1.0):
+        self.horizon = float(horizon)
+        self.entries: List[Tuple[str, float, float, str]] = []  # (camera_id, t0, t1, name)
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, camera_id: str, t0: float, t1: float) -> Optional[str]:
+        self.entries = [e for e in self.entries if t1 - e[2] <= self.horizon]
+        for cam, a, b, name in self.entries:
+            if cam == camera_id and a <= t1 and t0 <= b and abs(t1 - b) <= self.horizon:
+                self.hits += 1
+                return name
+        self.misses += 1
+        return None
+
+    def add(self, camera_id: str, t0: float, t1: float, name: str):
+        self.entries.append((camera_id, t0, t1, name))
+
 class ClipWriter(threading.Thread):
     """
-    Robust clip writer (Windows-friendly):
+    Background clip writer (Windows-friendly):
       1) Normalize frames to (width,height) BGR uint8
-      2) Write PNG sequence to a temp folder
+      2) Stream raw bgr24 frames into ffmpeg's stdin (no PNG round-trip)
       3) ffmpeg -> H.264 (yuv420p, faststart) MP4
          IMPORTANT: we force muxer with -f mp4 so writing to *.mp4.tmp works.
       4) Atomic move to final path
+    enqueue() returns the final name immediately; run() does the encoding.
     """
-    def __init__(self, out_dir="C:/Hackathons/HoneyWell/clips", fps=15, width=640, height=480):
+    def __init__(self, out_dir="C:/Hackathons/HoneyWell/clips", fps=15, width=640, height=480, reuse_horizon=1.0):
         super().__init__(daemon=True)
         self.q: "queue.Queue[dict]" = queue.Queue(maxsize=256)
         self.out_dir = os.path.normpath(out_dir)
@@ -41,13 +66,59 @@ class ClipWriter(threading.Thread):
         self.width = int(width)
         self.height = int(height)
         os.makedirs(self.out_dir, exist_ok=True)
+        self.cache = ClipCache(horizon=reuse_horizon)
+
+        # stats
+        self.jobs_done = 0
+        self.jobs_failed = 0
+        self.jobs_dropped = 0
+        self.encode_ms_last = 0.0
+        self.encode_ms_total = 0.0
         print(f"[ClipWriter] ffmpeg: {FFMPEG_EXE}")
-        
 
-    def make_name(self, camera_id: str, event_id: str) -> str:
-        ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S_%f")
+
+    def make_name(self, camera_id: str, event_id: Optional[str] = None, ts: Optional[float] = None) -> str:
+        when = datetime.utcnow() if ts is None else datetime.fromtimestamp(ts, timezone.utc)
         safe = lambda s: "".join(ch for ch in str(s) if ch.isalnum() or ch in ("-", "_"))
-        return f"{ts}_{safe(camera_id)}_{safe(event_id)}.mp4"
+        name = f"{when.strftime('%Y%m%d_%H%M%S_%f')}_{safe(camera_id)}"
+        return f"{name}_{safe(event_id)}.mp4" if event_id else f"{name}.mp4"
+
+    def reserve(self, camera_id: str, t0: float, t1: float) -> Tuple[str, bool]:
+        """Name for the clip covering [t0, t1]; is_new is False when an existing clip is reused.
+        Reused clips serve events of any type, so the name is camera + start time only."""
+        name = self.cache.lookup(camera_id, t0, t1)
+        if name:
+            return name, False
+        name = self.make_name(camera_id, ts=t0)
+        self.cache.add(camera_id, t0, t1, name)
+        return name, True
+
+    def _normalize(self, f) -> Optional[np.ndarray]:
+        if f is None:
+            return None
+        if not isinstance(f, np.ndarray):
+            raise RuntimeError("Frame is not a numpy array")
+        if f.dtype != np.uint8:
+            f = f.astype(np.uint8)
+        h, w = f.shape[:2]
+        if (w, h) != (self.width, self.height):
+            f = cv2.resize(f, (self.width, self.height), interpolation=cv2.INTER_LINEAR)
+        return np.ascontiguousarray(f)
+
+    def _input_fps(self, frames, post_frames, n) -> float:
+        # the analysis rate may be below self.fps (FPS governor); derive the
+        # real rate from the first/last timestamps so clips play in real time
+        def ts(s, i):
+            # RingWindow keeps (seq, ts) entries; read them without decoding a frame
+            return s.entries[i][1] if hasattr(s, "entries") else s[i][0]
+        seq = [s for s in (frames, post_frames) if s]
+        try:
+            t0, t1 = ts(seq[0], 0), ts(seq[-1], -1)
+        except Exception:
+            return float(self.fps)
+        if n < 2 or t1 <= t0:
+            return float(self.fps)
+        return min(float(self.fps), max(1.0, (n - 1) / (t1 - t0)))
 
     # ------------------ synchronous writer ------------------
     def write_sync(
@@ -61,126 +132,173 @@ class ClipWriter(threading.Thread):
         if not name:
             name = self.make_name(camera_id, event_id)
         out_path = Path(self.out_dir) / name
-        all_frames = (frames or []) + (post_frames or [])
-        if not all_frames:
+        # frames may be a RingWindow; iterate lazily, one frame at a time, so
+        # ring slots are read just before they are piped (and JPEGs decoded then)
+        n = len(frames or []) + len(post_frames or [])
+        if not n:
             raise RuntimeError("No frames to write")
+        in_fps = self._input_fps(frames, post_frames, n)
+        all_frames = itertools.chain(frames or [], post_frames or [])
 
-        # 1) PNG sequence in temp dir
-        tmpdir = Path(tempfile.mkdtemp(prefix="clip_"))
+        # ffmpeg: rawvideo on stdin -> H.264 yuv420p + faststart
+        tmp_mp4 = (out_path.as_posix() + ".tmp")
+        cmd = [
+            FFMPEG_EXE,
+            "-y",
+            "-loglevel", "error",
+            "-f", "rawvideo",
+            "-pix_fmt", "bgr24",
+            "-s", f"{self.width}x{self.height}",
+            "-framerate", f"{in_fps:.3f}",
+            "-i", "-",
+            "-an",
+            "-vcodec", "libx264",
+            "-pix_fmt", "yuv420p",
+            "-preset", "ultrafast",
+            "-movflags", "+faststart",
+            "-r", str(self.fps),
+            "-f", "mp4",
+            tmp_mp4
+        ]
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        count = 0
         try:
-            count = 0
             for _, f in all_frames:
+                f = self._normalize(f)
                 if f is None:
                     continue
-                if not isinstance(f, np.ndarray):
-                    raise RuntimeError("Frame is not a numpy array")
-                if f.dtype != np.uint8:
-                    f = f.astype(np.uint8)
-                h, w = f.shape[:2]
-                if (w, h) != (self.width, self.height):
-                    f = cv2.resize(f, (self.width, self.height), interpolation=cv2.INTER_LINEAR)
-                png_path = tmpdir / f"{count:06d}.png"
-                if not cv2.imwrite(str(png_path), f):
-                    raise RuntimeError(f"Failed to write PNG {png_path}")
+                proc.stdin.write(memoryview(f).cast("B"))
                 count += 1
-            if count == 0:
-                raise RuntimeError("No valid frames after normalization")
-
-            # 2) ffmpeg: image2 -> H.264 yuv420p + faststart
-            input_pattern = (tmpdir / "%06d.png").as_posix()
-            tmp_mp4 = (out_path.as_posix() + ".tmp")
-
-            cmd = [
-                FFMPEG_EXE,
-                "-y",
-                "-f", "image2",
-                "-framerate", str(self.fps),
-                "-i", input_pattern,
-                "-an",
-                "-vcodec", "libx264",
-                "-pix_fmt", "yuv420p",
-                "-preset", "ultrafast",
-                "-movflags", "+faststart",
-                "-r", str(self.fps),
-                "-f", "mp4",
-                tmp_mp4
-            ]
-            print("[ClipWriter] encode cmd:", " ".join(cmd))
+        except BrokenPipeError:
+            pass
+        finally:
+            try:
+                proc.stdin.close()
+            except Exception:
+                pass
+            stderr = proc.stderr.read().decode("utf-8", "replace")
+            proc.wait()
+
+        if count == 0:
+            Path(tmp_mp4).unlink(missing_ok=True)
+            raise RuntimeError("No valid frames after normalization")
+        if proc.returncode != 0:
+            Path(tmp_mp4).unlink(missing_ok=True)
+            raise RuntimeError(
+                "ffmpeg failed.\n"
+                f"  returncode: {proc.returncode}\n"
+                f"  frames piped: {count}\n"
+                f"  stderr head: {stderr[:600]}"
+            )
+
+        # Atomic move to final .mp4
+        if out_path.exists():
+            out_path.unlink()
+        Path(tmp_mp4).replace(out_path)
+
+        sz = out_path.stat().st_size
+        print("[ClipWriter] wrote", str(out_path), "frames", count, "size", sz, "bytes")
+        if sz < 1024:
+            print(f"[ClipWriter] warning: suspiciously small clip {name} ({sz} bytes)")
+        return name
+
+    # ------------------ stream-copy from recorded segments ------------------
+    def cut_sync(self, camera_id: str, event_id: str, recorder, t0: float, t1: float, name: Optional[str] = None, timeout: float = 10.0) -> str:
+        if not name:
+            name = self.make_name(camera_id, event_id)
+        out_path = Path(self.out_dir) / name
+        segs = recorder.segments_for(t0, t1, timeout=timeout)
+        if not segs:
+            raise RuntimeError(f"No recorded segments cover [{t0:.2f}, {t1:.2f}]")
+
+        list_path = out_path.as_posix() + ".txt"
+        tmp_mp4 = out_path.as_posix() + ".tmp"
+        with open(list_path, "w", encoding="utf-8") as fh:
+            for p in segs:
+                fh.write(f"file '{p.resolve().as_posix()}'\n")
+        cmd = [
+            FFMPEG_EXE, "-y", "-loglevel", "error",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-c", "copy", "-movflags", "+faststart",
+            "-f", "mp4", tmp_mp4
+        ]
+        try:
             proc = subprocess.run(cmd, capture_output=True, text=True)
-            if proc.returncode != 0:
-                sample_list = "\n".join([p.name for p in sorted(tmpdir.glob('*.png'))[:5]])
-                raise RuntimeError(
-                    "ffmpeg failed.\n"
-                    f"  returncode: {proc.returncode}\n"
-                    f"  stderr head: {proc.stderr[:600]}\n"
-                    f"  tmpdir: {tmpdir}\n"
-                    f"  first files:\n{sample_list}"
-                )
-
-            # 3) Atomic move to final .mp4
-            if out_path.exists():
-                out_path.unlink()
-            Path(tmp_mp4).replace(out_path)
-
-            sz = out_path.stat().st_size
-            print("[ClipWriter] wrote", str(out_path), "size", sz, "bytes")
-            if sz < 100 * 1024:
-                raise RuntimeError(f"Encoded file too small: {sz} bytes")
         finally:
-            shutil.rmtree(tmpdir, ignore_errors=True)
+            Path(list_path).unlink(missing_ok=True)
+        if proc.returncode != 0:
+            Path(tmp_mp4).unlink(missing_ok=True)
+            raise RuntimeError(f"ffmpeg concat failed: {proc.stderr[:400]}")
 
+        if out_path.exists():
+            out_path.unlink()
+        Path(tmp_mp4).replace(out_path)
+        print("[ClipWriter] cut", str(out_path), "from", len(segs), "segments, size", out_path.stat().st_size, "bytes")
         return name
 
-    # ------------------ optional queue API ------------------
-    def enqueue(self, camera_id: str, event_id: str, frames: List[FrameT], post_frames: Optional[List[FrameT]] = None, name: Optional[str] = None,on_done: Optional[Callable[[str, str], None]] = None) -> str:
+    # ------------------ queue API ------------------
+    def enqueue(self, camera_id: str, event_id: str, frames: List[FrameT], post_frames: Optional[List[FrameT]] = None, name: Optional[str] = None,on_done: Optional[Callable[[str, str], None]] = None) -> Optional[str]:
+        """Never blocks the caller; returns None if the queue is full and the clip is dropped."""
         if not name:
             name = self.make_name(camera_id, event_id)
-        self.q.put({"camera_id": camera_id, "event_id": event_id, "frames": frames, "post_frames": post_frames or [], "name": name,"on_done": on_done})
+        try:
+            self.q.put_nowait({"camera_id": camera_id, "event_id": event_id, "frames": frames, "post_frames": post_frames or [], "name": name,"on_done": on_done})
+        except queue.Full:
+            self.jobs_dropped += 1
+            print(f"[ClipWriter] queue full, dropping clip {name}")
+            return None
+        return name
+
+    def enqueue_cut(self, camera_id: str, event_id: str, recorder, t0: float, t1: float, name: Optional[str] = None, on_done: Optional[Callable[[str, str], None]] = None) -> Optional[str]:
+        """Like enqueue(), but the clip is remuxed from a SegmentRecorder's segments."""
+        if not name:
+            name = self.make_name(camera_id, event_id)
+        try:
+            self.q.put_nowait({"kind": "cut", "camera_id": camera_id, "event_id": event_id, "recorder": recorder, "t0": t0, "t1": t1, "name": name, "on_done": on_done})
+        except queue.Full:
+            self.jobs_dropped += 1
+            print(f"[ClipWriter] queue full, dropping clip {name}")
+            return None
         return name
 
     def run(self):
         while True:
             job = self.q.get()
+            if job is None:
+                break
+            t0 = time.time()
             try:
-                self.write_sync(job["camera_id"], job["event_id"], job.get("frames", []), job.get("post_frames", []), name=job.get("name"))
+                if job.get("kind") == "cut":
+                    rec = job["recorder"]
+                    name = self.cut_sync(job["camera_id"], job["event_id"], rec, job["t0"], job["t1"], name=job.get("name"), timeout=2.0 * rec.seg_seconds + 1.0)
+                else:
+                    name = self.write_sync(job["camera_id"], job["event_id"], job.get("frames", []), job.get("post_frames", []), name=job.get("name"))
+                self.jobs_done += 1
+                if job.get("on_done"):
+                    job["on_done"](name, str(Path(self.out_dir) / name))
             except Exception as e:
+                self.jobs_failed += 1
                 print("[ClipWriter] error:", e)
+            finally:
+                self.encode_ms_last = (time.time() - t0) * 1000.0
+                self.encode_ms_total += self.encode_ms_last
 
-    # (helper unused in this sync flow)
-    def _encode_job(self, job: dict) -> str:
-        name = job["name"]
-        out_path = Path(self.out_dir) / name
-        frames = (job.get("frames") or []) + (job.get("post_frames") or [])
-        if not frames:
-            raise RuntimeError("No frames to write")
-
-        tmpdir = Path(tempfile.mkdtemp(prefix="clip_"))
+    def stop(self):
+        """Finish the queued clips, then end the thread."""
         try:
-            for i, (_, f) in enumerate(frames):
-                if f is None: continue
-                if f.dtype != np.uint8:
-                    f = f.astype(np.uint8)
-                h, w = f.shape[:2]
-                if (w, h) != (self.width, self.height):
-                    f = cv2.resize(f, (self.width, self.height), interpolation=cv2.INTER_LINEAR)
-                cv2.imwrite(str(tmpdir / f"{i:06d}.png"), f)
-
-            input_pattern = (tmpdir / "%06d.png").as_posix()
-            tmp_mp4 = (out_path.as_posix() + ".tmp")
-
-            cmd = [
-                FFMPEG_EXE, "-y",
-                "-f", "image2", "-framerate", str(self.fps), "-i", input_pattern,
-                "-an", "-vcodec", "libx264", "-pix_fmt", "yuv420p",
-                "-preset", "ultrafast", "-movflags", "+faststart",
-                "-r", str(self.fps), "-f", "mp4", tmp_mp4
-            ]
-            proc = subprocess.run(cmd, capture_output=True, text=True)
-            if proc.returncode != 0:
-                raise RuntimeError(f"ffmpeg failed: {proc.stderr[:400]}")
+            self.q.put(None, timeout=1.0)
+        except queue.Full:
+            print("[ClipWriter] queue full on stop; writer keeps draining")
 
-            if out_path.exists(): out_path.unlink()
-            Path(tmp_mp4).replace(out_path)
-            return str(out_path)
-        finally:
-            shutil.rmtree(tmpdir, ignore_errors=True)
+    def stats(self) -> dict:
+        finished = self.jobs_done + self.jobs_failed
+        return {
+            "queue_depth": self.q.qsize(),
+            "done": self.jobs_done,
+            "failed": self.jobs_failed,
+            "dropped": self.jobs_dropped,
+            "encode_ms_last": round(self.encode_ms_last, 1),
+            "encode_ms_avg": round(self.encode_ms_total / max(1, finished), 1),
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+        }
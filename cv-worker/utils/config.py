@@ -0,0 +1,154 @@
+# cv-worker/utils/config.py
+import os
+import threading
+import time
+from typing import Callable, List
+
+import yaml
+
+# sections a running worker can take over between frames; a change anywhere
+# else (except cameras:, which are added/removed/restarted) needs a restart
+LIVE_SECTIONS = ("zones", "tamper", "detection", "features", "overlay", "reload")
+
+ZONE_TYPES = ("general", "restricted")
+# every live setting with its default; a key removed from config.yaml falls
+# back to these on reload instead of keeping the value it had
+FEATURE_PARAMS = {
+    "intrusion": {"persist_frames": 8},
+    "abandoned": {"T_seconds": 8, "owner_dist": 180.0},
+    "fall": {"ar_thr": 0.55, "persist": 10},
+    "violence": {"dist_thr": 140.0, "speed_thr": 40.0, "persist": 6},
+}
+TAMPER_PARAMS = {
+    "warmup_frames": 60, "persist_frames": 15, "cooldown_seconds": 10.0, "blur_drop_ratio": 0.15,
+    "abs_blur_floor": 8.0, "freeze_seconds": 60, "hist_flat_thr": 0.990, "ema_alpha": 0.05,
+    "every_n_frames": 1, "every_ms": 0, "eval_width": 160, "freeze_hash_bits": 2,
+}
+
+def load(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+def _num(v) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+def validate(cfg) -> List[str]:
+    """Problems that would break a worker, [] if the config can be applied."""
+    if not isinstance(cfg, dict):
+        return ["config must be a mapping"]
+    errors = []
+
+    cams = cfg.get("cameras")
+    if not isinstance(cams, list) or not cams:
+        errors.append("cameras: need a non-empty list")
+    else:
+        ids = [c.get("id") if isinstance(c, dict) else None for c in cams]
+        for i, (c, cid) in enumerate(zip(cams, ids)):
+            if not cid or "source" not in c:
+                errors.append(f"cameras[{i}]: id and source are required")
+        dup = {x for x in ids if x and ids.count(x) > 1}
+        if dup:
+            errors.append(f"cameras: duplicate ids {sorted(dup)}")
+    if not isinstance(cfg.get("yolo"), dict):
+        errors.append("yolo: section missing")
+
+    zones = cfg.get("zones") or []
+    if not isinstance(zones, list):
+        errors.append("zones: must be a list")
+        zones = []
+    if len(zones) > 64:
+        errors.append("zones: at most 64 zones per camera")
+    names = set()
+    for i, z in enumerate(zones):
+        where = f"zones[{i}]"
+        if not isinstance(z, dict) or not z.get("name"):
+            errors.append(f"{where}: name is required")
+            continue
+        where = f"zones[{z['name']}]"
+        if z["name"] in names:
+            errors.append(f"{where}: duplicate name")
+        names.add(z["name"])
+        if z.get("type", "general") not in ZONE_TYPES:
+            errors.append(f"{where}: type must be one of {ZONE_TYPES}")
+        poly = z.get("polygon")
+        if (not isinstance(poly, list) or len(poly) < 3
+                or not all(isinstance(p, (list, tuple)) and len(p) == 2 and all(_num(v) for v in p) for p in poly)):
+            errors.append(f"{where}: polygon needs at least 3 [x, y] points")
+        if "loiter_seconds" in z and not (_num(z["loiter_seconds"]) and z["loiter_seconds"] > 0):
+            errors.append(f"{where}: loiter_seconds must be > 0")
+
+    tcfg = cfg.get("tamper") or {}
+    for k, v in tcfg.items():
+        if k not in TAMPER_PARAMS:
+            errors.append(f"tamper.{k}: unknown setting")
+        elif not (_num(v) and v >= 0):
+            errors.append(f"tamper.{k}: must be a number >= 0")
+    if _num(tcfg.get("eval_width", 160)) and tcfg.get("eval_width", 160) < 16:
+        errors.append("tamper.eval_width: must be >= 16")
+
+    dcfg = cfg.get("detection") or {}
+    if not (isinstance(dcfg.get("every_k", 1), int) and dcfg.get("every_k", 1) >= 1):
+        errors.append("detection.every_k: must be an integer >= 1")
+    for k in ("max_skip_seconds", "motion_width", "motion_thresh", "motion_min_area"):
+        if k in dcfg and not (_num(dcfg[k]) and dcfg[k] > 0):
+            errors.append(f"detection.{k}: must be > 0")
+
+    fcfg = cfg.get("features") or {}
+    for name, params in fcfg.items():
+        if name not in FEATURE_PARAMS:
+            errors.append(f"features.{name}: unknown feature")
+            continue
+        for k, v in (params or {}).items():
+            if k not in FEATURE_PARAMS[name]:
+                errors.append(f"features.{name}.{k}: unknown setting")
+            elif not (_num(v) and v > 0):
+                errors.append(f"features.{name}.{k}: must be > 0")
+    return errors
+
+def feature_params(fcfg: dict, name: str) -> dict:
+    """All settings of one feature: its features: entry over the defaults."""
+    given = (fcfg or {}).get(name) or {}
+    return {k: given.get(k, v) for k, v in FEATURE_PARAMS[name].items()}
+
+def tamper_params(tcfg: dict) -> dict:
+    given = tcfg or {}
+    return {k: given.get(k, v) for k, v in TAMPER_PARAMS.items()}
+
+def changed_sections(old: dict, new: dict) -> List[str]:
+    return sorted(k for k in set(old) | set(new) if old.get(k) != new.get(k))
+
+
+class ConfigWatcher(threading.Thread):
+    """Polls the config file's mtime and calls on_change() after it changed (and settled)."""
+
+    def __init__(self, path: str, on_change: Callable[[], None], interval: float = 2.0):
+        super().__init__(daemon=True, name="config-watch")
+        self.path = path
+        self.on_change = on_change
+        self.interval = max(0.2, float(interval))
+        self._stopping = False
+        self._mtime = self._stat()
+
+    def _stat(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def stop(self):
+        self._stopping = True
+
+    def run(self):
+        while not self._stopping:
+            time.sleep(self.interval)
+            m = self._stat()
+            if m is None or m == self._mtime:
+                continue
+            time.sleep(0.2)  # editors write in several steps
+            if self._stat() != m:
+                continue  # still changing; next round
+            self._mtime = m
+            try:
+                self.on_change()
+            except Exception as e:
+                print(f"[Config] reload failed: {e}")
@@ -0,0 +1,111 @@
+# cv-worker/utils/framectx.py
+import threading
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+class FrameCtxStats:
+    """Per-camera counters: derived images computed vs reused, and their bytes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.allocs = 0
+        self.bytes = 0
+        self.hits = 0
+
+    def _count(self, alloc_bytes: Optional[int]):
+        with self._lock:
+            if alloc_bytes is None:
+                self.hits += 1
+            else:
+                self.allocs += 1
+                self.bytes += alloc_bytes
+
+    def stats(self):
+        n = max(1, self.frames)
+        return {
+            "frames": self.frames,
+            "allocs_per_frame": round(self.allocs / n, 2),
+            "kb_per_frame": round(self.bytes / n / 1024.0, 1),
+            "reuses_per_frame": round(self.hits / n, 2),
+        }
+
+class FrameContext:
+    """
+    One captured frame plus lazily derived views of it, created once per
+    frame in CameraWorker.run and handed to every stage:
+      gray, rgb                 full-size conversions
+      small(width) / small_gray(width)   INTER_AREA downscales
+      letterbox(size)           (img RGB uint8 size x size, scale, (pad_x, pad_y))
+    Each view is computed on first use and memoized, so two stages asking
+    for the same view share one array. Views are read-only by convention;
+    copy before drawing on them.
+    """
+
+    def __init__(self, frame: np.ndarray, ts: float, seq: int = 0, stats: FrameCtxStats = None):
+        self.frame = frame
+        self.ts = ts
+        self.seq = seq
+        self._stats = stats
+        self._views: Dict[tuple, object] = {}
+        self._lock = threading.RLock()  # views build on other views
+        if stats is not None:
+            stats.frames += 1
+
+    @staticmethod
+    def of(frame, ts: float = 0.0) -> "FrameContext":
+        """Pass a FrameContext through, wrap a bare ndarray."""
+        if isinstance(frame, FrameContext):
+            return frame
+        return FrameContext(frame, ts)
+
+    @property
+    def shape(self):
+        return self.frame.shape
+
+    def _memo(self, key, build):
+        with self._lock:
+            v = self._views.get(key)
+            if v is None:
+                v = build()
+                self._views[key] = v
+                size = sum(a.nbytes for a in v if isinstance(a, np.ndarray)) if isinstance(v, tuple) else v.nbytes
+                if self._stats is not None:
+                    self._stats._count(size)
+            elif self._stats is not None:
+                self._stats._count(None)
+            return v
+
+    @property
+    def gray(self) -> np.ndarray:
+        return self._memo(("gray",), lambda: cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY))
+
+    @property
+    def rgb(self) -> np.ndarray:
+        return self._memo(("rgb",), lambda: cv2.cvtColor(self.frame, cv2.COLOR_BGR2RGB))
+
+    def small(self, width: int) -> np.ndarray:
+        h, w = self.frame.shape[:2]
+        if not width or w <= width:
+            return self.frame
+        sh = max(1, int(round(h * width / w)))
+        return self._memo(("small", width), lambda: cv2.resize(self.frame, (width, sh), interpolation=cv2.INTER_AREA))
+
+    def small_gray(self, width: int) -> np.ndarray:
+        if not width or self.frame.shape[1] <= width:
+            return self.gray
+        return self._memo(("small_gray", width), lambda: cv2.cvtColor(self.small(width), cv2.COLOR_BGR2GRAY))
+
+    def letterbox(self, size: int, pad_value: int = 114):
+        """Aspect-preserving resize of the RGB frame into a size x size canvas."""
+        def build():
+            h, w = self.frame.shape[:2]
+            r = min(size / h, size / w)
+            nw, nh = int(round(w * r)), int(round(h * r))
+            px, py = (size - nw) // 2, (size - nh) // 2
+            img = np.full((size, size, 3), pad_value, dtype=np.uint8)
+            img[py:py + nh, px:px + nw] = cv2.resize(self.rgb, (nw, nh), interpolation=cv2.INTER_LINEAR)
+            return img, r, (px, py)
+        return self._memo(("letterbox", size, pad_value), build)
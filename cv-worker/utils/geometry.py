@@ -1,3 +1,5 @@
+import numpy as np
+
 def point_in_poly(x, y, poly):
     inside = False
     n = len(poly)
@@ -12,3 +14,14 @@ def point_in_poly(x, y, poly):
 def bbox_center(b):
     x1, y1, x2, y2 = b
     return (0.5*(x1+x2), 0.5*(y1+y2))
+
+def points_in_poly(xs, ys, poly):
+    """Vectorized point_in_poly: same ray cast, for arrays of points -> bool array."""
+    px = np.asarray(xs, dtype=np.float64)[:, None]
+    py = np.asarray(ys, dtype=np.float64)[:, None]
+    p = np.asarray(poly, dtype=np.float64)
+    x1, y1 = p[:, 0][None, :], p[:, 1][None, :]
+    q = np.roll(p, -1, axis=0)
+    x2, y2 = q[:, 0][None, :], q[:, 1][None, :]
+    cond = ((y1 > py) != (y2 > py)) & (px < (x2 - x1) * (py - y1) / (y2 - y1 + 1e-9) + x1)
+    return (cond.sum(axis=1) % 2) == 1
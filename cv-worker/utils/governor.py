@@ -0,0 +1,127 @@
+# cv-worker/utils/governor.py
+import os
+import threading
+import time
+
+try:
+    import psutil
+except ImportError:  # optional; falls back to the load average
+    psutil = None
+
+def host_cpu() -> float:
+    """Host CPU utilisation 0..1 since the previous call."""
+    if psutil is not None:
+        return psutil.cpu_percent(interval=None) / 100.0
+    try:
+        return min(1.0, os.getloadavg()[0] / (os.cpu_count() or 1))
+    except (AttributeError, OSError):
+        return 0.0
+
+class FpsGovernor(threading.Thread):
+    """
+    Closed-loop analysis-rate control for every camera worker.
+    Every `interval` seconds it reads host CPU and each worker's measured
+    loop time and achieved rate, then adjusts worker.fps_target within
+    [worker.fps_min, worker.fps_max]:
+      - CPU above target_cpu: idle cameras are cut first (x down_factor);
+        busy ones only if no idle camera can give anything back
+      - CPU below target_cpu - hysteresis: busy cameras are raised first
+        (x up_factor), idle ones only when every busy camera is at its max
+      - a camera never gets a target its own loop time cannot sustain
+    "Busy" = events or tracks within the last active_seconds.
+    """
+
+    def __init__(self, interval: float = 2.0, target_cpu: float = 0.80, hysteresis: float = 0.10,
+                 up_factor: float = 1.25, down_factor: float = 0.8, active_seconds: float = 30.0):
+        super().__init__(daemon=True)
+        self.interval = float(interval)
+        self.target_cpu = float(target_cpu)
+        self.hysteresis = float(hysteresis)
+        self.up = float(up_factor)
+        self.down = float(down_factor)
+        self.active_seconds = float(active_seconds)
+        self._workers = {}
+        self._lock = threading.Lock()
+        self._stopping = False
+        self.cpu = 0.0
+        self.adjustments = 0
+        host_cpu()  # prime psutil's counter
+
+    def register(self, worker):
+        with self._lock:
+            self._workers[worker.id] = worker
+
+    def unregister(self, cam_id):
+        with self._lock:
+            self._workers.pop(cam_id, None)
+
+    def stop(self):
+        self._stopping = True
+
+    def is_active(self, w, now=None) -> bool:
+        now = time.time() if now is None else now
+        return (now - w.last_activity_ts) < self.active_seconds
+
+    @staticmethod
+    def _sustainable(w) -> float:
+        # fastest rate this worker's own loop can keep up with (10% slack)
+        return 900.0 / w.loop_ms if w.loop_ms > 0 else w.fps_max
+
+    def _set(self, w, fps):
+        fps = max(w.fps_min, min(w.fps_max, fps))
+        if abs(fps - w.fps_target) > 1e-3:
+            w.fps_target = fps
+            self.adjustments += 1
+
+    def step(self):
+        with self._lock:
+            workers = list(self._workers.values())
+        if not workers:
+            return
+        self.cpu = host_cpu()
+        now = time.time()
+        busy = [w for w in workers if self.is_active(w, now)]
+        idle = [w for w in workers if not self.is_active(w, now)]
+
+        # per-camera ceiling from measured loop time
+        for w in workers:
+            cap = self._sustainable(w)
+            if w.fps_target > cap:
+                self._set(w, cap)
+
+        if self.cpu > self.target_cpu:
+            shrink = [w for w in idle if w.fps_target > w.fps_min] or busy
+            for w in shrink:
+                self._set(w, w.fps_target * self.down)
+        elif self.cpu < self.target_cpu - self.hysteresis:
+            grow = [w for w in busy if w.fps_target < min(w.fps_max, self._sustainable(w))]
+            if not grow:
+                grow = [w for w in idle if w.fps_target < min(w.fps_max, self._sustainable(w))]
+            for w in grow:
+                self._set(w, min(w.fps_target * self.up, self._sustainable(w)))
+
+    def run(self):
+        while not self._stopping:
+            time.sleep(self.interval)
+            try:
+                self.step()
+            except Exception as e:
+                print(f"[Governor] step failed: {e}")
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            workers = list(self._workers.values())
+        return {
+            "cpu": round(self.cpu, 3),
+            "target_cpu": self.target_cpu,
+            "adjustments": self.adjustments,
+            "cameras": {w.id: {
+                "fps_target": round(w.fps_target, 2),
+                "fps_actual": round(w.fps_actual, 2),
+                "fps_min": w.fps_min,
+                "fps_max": w.fps_max,
+                "loop_ms": round(w.loop_ms, 1),
+                "active": self.is_active(w, now),
+            } for w in workers},
+        }
@@ -0,0 +1,244 @@
+# cv-worker/utils/heatarchive.py
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+
+class HeatmapArchive:
+    """
+    Persistent, non-decayed person-occupancy counts for one camera.
+      <root>/<camera_id>/YYYYMMDDHH.npy   (slots_per_hour, gh, gw) float32, one
+                                          slot per interval, written via memmap
+      <root>/<camera_id>/index.json       grid shape, interval, filled slots per hour
+    write(t_start, grid) stores one interval; submit() queues it for the
+    archive's own writer thread instead, so the memmap flush and index rewrite
+    never run on a camera loop. sum_range(t0, t1) adds up every
+    slot overlapping [t0, t1) by memory-mapping only the hour tiles involved.
+    Sums of whole past UTC days are cached (LRU, max_days entries).
+    readonly=True opens an archive another process writes; its index is
+    re-read whenever index.json changes.
+    """
+
+    def __init__(self, root: str, camera_id: str, shape, interval_seconds: int = 60, frame_size=None, max_days: int = 32,
+                 readonly: bool = False):
+        self.dir = os.path.join(root, camera_id)
+        os.makedirs(self.dir, exist_ok=True)
+        self.camera_id = camera_id
+        self.shape = (int(shape[0]), int(shape[1]))
+        self.interval = max(1, int(interval_seconds))
+        if 3600 % self.interval:
+            raise ValueError("heatmap archive interval must divide an hour")
+        self.slots_per_hour = 3600 // self.interval
+        self.frame_size = list(frame_size) if frame_size else None
+        self.max_days = int(max_days)
+        self.readonly = bool(readonly)
+        self._index_mtime = None
+
+        self._lock = threading.Lock()
+        self._tile_key = None    # hour currently open for writing
+        self._tile = None
+        self._day_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.index = self._load_index()
+
+        self._q: "queue.Queue" = queue.Queue(maxsize=64)
+        self._writer: Optional[threading.Thread] = None
+
+        # stats
+        self.writes = 0
+        self.dropped = 0
+        self.day_hits = 0
+        self.day_misses = 0
+
+    # ------------------ index ------------------
+    def _index_path(self):
+        return os.path.join(self.dir, "index.json")
+
+    def _load_index(self):
+        try:
+            with open(self._index_path(), "r", encoding="utf-8") as f:
+                idx = json.load(f)
+            if tuple(idx.get("shape", ())) == self.shape and idx.get("interval_seconds") == self.interval:
+                return idx
+            print(f"[HeatArchive] {self.camera_id}: grid/interval changed, starting a new index")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"[HeatArchive] {self.camera_id}: unreadable index ({e}), starting a new one")
+        return {"shape": list(self.shape), "interval_seconds": self.interval, "frame_size": self.frame_size, "hours": {}}
+
+    def _refresh(self):
+        """readonly: pick up slots the writing process added since the last read."""
+        try:
+            mtime = os.stat(self._index_path()).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._index_mtime:
+            return
+        idx = self._load_index()
+        with self._lock:
+            old = self.index["hours"]
+            for key, slots in idx["hours"].items():
+                if old.get(key) != slots:
+                    self._day_cache.pop(key[:8], None)
+            self.index = idx
+            self._index_mtime = mtime
+
+    def _save_index(self):
+        tmp = self._index_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.index, f)
+        os.replace(tmp, self._index_path())
+
+    @staticmethod
+    def _hour_key(ts: float) -> str:
+        return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y%m%d%H")
+
+    @staticmethod
+    def _hour_start(key: str) -> float:
+        return datetime.strptime(key, "%Y%m%d%H").replace(tzinfo=timezone.utc).timestamp()
+
+    def _tile_path(self, key: str) -> str:
+        return os.path.join(self.dir, key + ".npy")
+
+    # ------------------ write ------------------
+    def write(self, t_start: float, grid: np.ndarray):
+        """Store the counts of the interval starting at t_start (adds if the slot is reused)."""
+        if self.readonly:
+            raise RuntimeError("heatmap archive opened read-only")
+        key = self._hour_key(t_start)
+        slot = int((t_start - self._hour_start(key)) // self.interval)
+        with self._lock:
+            if self._tile_key != key:
+                self._close_tile()
+                path = self._tile_path(key)
+                if os.path.exists(path):
+                    self._tile = np.load(path, mmap_mode="r+")
+                else:
+                    self._tile = np.lib.format.open_memmap(
+                        path, mode="w+", dtype=np.float32, shape=(self.slots_per_hour,) + self.shape)
+                self._tile_key = key
+            self._tile[slot] += grid.astype(np.float32, copy=False)
+            self._tile.flush()
+
+            slots = self.index["hours"].setdefault(key, [])
+            if slot not in slots:
+                slots.append(slot)
+                slots.sort()
+            self._save_index()
+            # a finished day may have been cached before this (late) write
+            self._day_cache.pop(key[:8], None)
+            self.writes += 1
+
+    def submit(self, t_start: float, grid: np.ndarray):
+        """Queue write(t_start, grid) for the writer thread; never blocks. grid must not be reused."""
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._drain, name=f"heat-archive-{self.camera_id}", daemon=True)
+            self._writer.start()
+        try:
+            self._q.put_nowait((t_start, grid))
+        except queue.Full:
+            self.dropped += 1
+            print(f"[HeatArchive] {self.camera_id}: write queue full, dropping interval {t_start:.0f}")
+
+    def _drain(self):
+        while True:
+            item = self._q.get()
+            if item is None:
+                break
+            try:
+                self.write(*item)
+            except Exception as e:
+                print(f"[HeatArchive] {self.camera_id}: write failed: {e}")
+
+    def _close_tile(self):
+        if self._tile is not None:
+            self._tile.flush()
+            del self._tile
+            self._tile = None
+            self._tile_key = None
+
+    def close(self):
+        """Write what is still queued, then release the open tile."""
+        if self._writer is not None:
+            self._q.put(None)
+            self._writer.join(timeout=5.0)
+            self._writer = None
+        with self._lock:
+            self._close_tile()
+
+    # ------------------ read ------------------
+    def _sum_hour(self, hours: dict, key: str, s0: int = 0, s1: Optional[int] = None) -> Optional[np.ndarray]:
+        slots = hours.get(key)
+        if not slots:
+            return None
+        s1 = self.slots_per_hour if s1 is None else s1
+        if not any(s0 <= s < s1 for s in slots):
+            return None
+        arr = np.load(self._tile_path(key), mmap_mode="r")
+        return np.asarray(arr[s0:s1].sum(axis=0, dtype=np.float64))
+
+    def _sum_day(self, hours: dict, day: str) -> np.ndarray:
+        with self._lock:
+            hit = self._day_cache.get(day)
+            if hit is not None:
+                self._day_cache.move_to_end(day)
+                self.day_hits += 1
+                return hit
+            self.day_misses += 1
+        out = np.zeros(self.shape, dtype=np.float64)
+        for key in [k for k in hours if k.startswith(day)]:
+            part = self._sum_hour(hours, key)
+            if part is not None:
+                out += part
+        with self._lock:
+            self._day_cache[day] = out
+            while len(self._day_cache) > self.max_days:
+                self._day_cache.popitem(last=False)
+        return out
+
+    def sum_range(self, t0: float, t1: float) -> np.ndarray:
+        """Total counts over every interval overlapping [t0, t1) -> (gh, gw) float64."""
+        out = np.zeros(self.shape, dtype=np.float64)
+        if t1 <= t0:
+            return out
+        if self.readonly:
+            self._refresh()
+        today = datetime.fromtimestamp(time.time(), tz=timezone.utc).strftime("%Y%m%d")
+        # snapshot the index; tiles are read without holding the writer's lock
+        with self._lock:
+            hours = {k: list(v) for k, v in self.index["hours"].items()}
+        by_day = {}
+        for key in sorted(hours):
+            h0 = self._hour_start(key)
+            if h0 < t1 and h0 + 3600 > t0:
+                by_day.setdefault(key[:8], []).append((key, h0))
+        for day, day_hours in by_day.items():
+            d0 = datetime.strptime(day, "%Y%m%d").replace(tzinfo=timezone.utc).timestamp()
+            # whole past days come from the day cache
+            if t0 <= d0 and d0 + 86400 <= t1 and day < today:
+                out += self._sum_day(hours, day)
+                continue
+            for key, h0 in day_hours:
+                s0 = max(0, int((t0 - h0) // self.interval))
+                s1 = min(self.slots_per_hour, int(np.ceil((t1 - h0) / self.interval)))
+                part = self._sum_hour(hours, key, s0, s1)
+                if part is not None:
+                    out += part
+        return out
+
+    def stats(self):
+        return {
+            "hours": len(self.index["hours"]),
+            "writes": self.writes,
+            "queued": self._q.qsize(),
+            "dropped": self.dropped,
+            "day_cache": len(self._day_cache),
+            "day_hits": self.day_hits,
+            "day_misses": self.day_misses,
+        }
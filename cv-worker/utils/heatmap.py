@@ -1,8 +1,10 @@
 # cv-worker/utils/heatmap.py
 import numpy as np
 import cv2
+import hashlib
+import threading
 import time
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 
 _PALETTES = {
     "turbo": cv2.COLORMAP_TURBO,
@@ -18,28 +20,129 @@ class HeatmapAccumulator:
     - add_boxes(): increment regions covered by person bounding boxes
     - step_decay(): fades history over time
     - render(): colorized map (optionally overlaid on base frame)
+    The grid is kept at `scale` of the frame size and upsampled only in
+    render(). Decay is lazy: values are stored divided by a global factor
+    that step_decay() shrinks, and the grid itself is only touched when the
+    factor gets small enough to need folding back in. Per-frame cost is
+    therefore the area of the boxes added, not the image size.
+    A log-binned histogram of the nonzero cells is kept up to date the same
+    way (only the cells a box touches), so render() reads its clip
+    percentile from the histogram instead of sorting the grid. `version`
+    changes whenever boxes are added; a uniform decay does not change the
+    normalized render, so it leaves the version alone.
     """
 
-    def __init__(self, width: int, height: int, decay_per_sec: float = 0.12, blur_ksize: int = 33):
+    _RENORM_BELOW = 1e-4  # fold the decay factor into the grid below this
+    _HIST_PER_OCTAVE = 8  # percentile resolution ~9%
+    _HIST_LO, _HIST_HI = -32, 40  # log2 range of stored cell values
+
+    def __init__(self, width: int, height: int, decay_per_sec: float = 0.12, blur_ksize: int = 33, scale: float = 0.25):
         self.w = int(width)
         self.h = int(height)
         self.decay = float(decay_per_sec)
-        self.grid = np.zeros((self.h, self.w), dtype=np.float32)
+        self.scale = min(1.0, max(0.01, float(scale)))
+        self.gw = max(1, int(round(self.w * self.scale)))
+        self.gh = max(1, int(round(self.h * self.scale)))
+        self._grid = np.zeros((self.gh, self.gw), dtype=np.float32)  # value = _grid * _factor
+        self._factor = 1.0
         self.last_ts = time.time()
         # force odd kernel for Gaussian
         self.blur_ksize = int(blur_ksize) if int(blur_ksize) % 2 == 1 else int(blur_ksize) + 1
+        # same blur radius on the coarse grid
+        k = max(1, int(round(self.blur_ksize * self.scale)))
+        self._grid_blur = k if k % 2 == 1 else k + 1
+        self.renorms = 0
+        self.version = 0
+        self._hist = np.zeros((self._HIST_HI - self._HIST_LO) * self._HIST_PER_OCTAVE, dtype=np.int64)
+        self.archive = None
+        self._counts = None
+        self._interval_start = None
+
+    def attach_archive(self, archive):
+        """
+        Keep raw (non-decayed) counts per archive interval alongside the grid
+        and hand them to `archive` (utils.heatarchive.HeatmapArchive, same
+        (gh, gw) shape) from step_decay() whenever an interval ends; the disk
+        write happens on the archive's own thread.
+        """
+        self.archive = archive
+        self._counts = np.zeros_like(self._grid)
+        self._interval_start = None
+
+    def _bins(self, vals: np.ndarray) -> np.ndarray:
+        b = np.floor((np.log2(vals) - self._HIST_LO) * self._HIST_PER_OCTAVE).astype(np.int64)
+        return np.clip(b, 0, len(self._hist) - 1)
+
+    def _hist_add(self, vals: np.ndarray, sign: int):
+        vals = vals[vals > 0]
+        if len(vals):
+            self._hist += sign * np.bincount(self._bins(vals), minlength=len(self._hist))
+
+    def _rebuild_hist(self):
+        self._hist[:] = 0
+        self._hist_add(self._grid.ravel(), +1)
+
+    def percentile(self, q: float) -> float:
+        """Estimated q-th percentile of the nonzero (decayed) cell values."""
+        total = int(self._hist.sum())
+        if total == 0:
+            return 1.0
+        k = int(np.searchsorted(np.cumsum(self._hist), q / 100.0 * total))
+        k = min(k, len(self._hist) - 1)
+        upper = 2.0 ** ((k + 1) / self._HIST_PER_OCTAVE + self._HIST_LO)
+        return upper * self._factor
+
+    @property
+    def grid(self) -> np.ndarray:
+        """Current decayed values on the coarse (gh, gw) grid."""
+        return self._grid * np.float32(self._factor)
+
+    def _renormalize(self):
+        self._grid *= np.float32(self._factor)
+        self._grid[self._grid < 1e-7] = 0.0
+        self._factor = 1.0
+        self.renorms += 1
+        self._rebuild_hist()
+
+    def flush_interval(self):
+        """Hand the current interval's raw counts to the archive's writer thread and reset them."""
+        if self.archive is None or self._interval_start is None:
+            return
+        if self._counts.any():
+            self.archive.submit(self._interval_start, self._counts.copy())
+        self._counts[:] = 0.0
 
-    def step_decay(self):
-        now = time.time()
+    def _roll_interval(self, now: float):
+        start = now - (now % self.archive.interval)
+        if self._interval_start is None:
+            self._interval_start = start
+        elif start != self._interval_start:
+            self.flush_interval()
+            self._interval_start = start
+
+    def step_decay(self, now: Optional[float] = None):
+        now = time.time() if now is None else float(now)
+        if self.archive is not None:
+            self._roll_interval(now)
         dt = max(0.0, now - self.last_ts)
         self.last_ts = now
         if dt <= 0.0:
             return
-        # exponential-ish fade
-        self.grid *= max(0.0, 1.0 - self.decay * dt)
-        self.grid[self.grid < 1e-7] = 0.0
+        # exponential-ish fade, applied to the global factor only
+        f = max(0.0, 1.0 - self.decay * dt)
+        if f == 0.0:
+            self._grid[:] = 0.0
+            self._hist[:] = 0
+            self._factor = 1.0
+            self.version += 1
+            return
+        self._factor *= f
+        if self._factor < self._RENORM_BELOW:
+            self._renormalize()
 
     def add_boxes(self, boxes_xyxy: List[Tuple[int,int,int,int]], strength: float = 1.0):
+        v = float(strength) / self._factor
+        s = self.scale
         for (x1, y1, x2, y2) in boxes_xyxy:
             x1 = max(0, min(self.w - 1, int(x1)))
             y1 = max(0, min(self.h - 1, int(y1)))
@@ -47,23 +150,32 @@ class HeatmapAccumulator:
             y2 = max(0, min(self.h - 1, int(y2)))
             if x2 <= x1 or y2 <= y1:
                 continue
-            self.grid[y1:y2, x1:x2] += float(strength)
+            gx1, gy1 = int(x1 * s), int(y1 * s)
+            gx2 = max(gx1 + 1, int(round(x2 * s)))
+            gy2 = max(gy1 + 1, int(round(y2 * s)))
+            cells = self._grid[gy1:gy2, gx1:gx2]
+            self._hist_add(cells, -1)
+            cells += v
+            self._hist_add(cells, +1)
+            if self._counts is not None:
+                self._counts[gy1:gy2, gx1:gx2] += float(strength)
+            self.version += 1
 
-    def _normalize(self, clip_percentile: float = 95.0, gamma: float = 0.6):
-        g = self.grid.copy()
+    def _coarse_g8(self, clip_percentile: float, gamma: float):
+        g = self.grid
         # smooth before scaling for nicer isobands
-        if self.blur_ksize > 1:
-            g = cv2.GaussianBlur(g, (self.blur_ksize, self.blur_ksize), 0)
-
-        vmax = np.percentile(g[g > 0], clip_percentile) if np.any(g > 0) else 1.0
-        if vmax < 1e-6:
-            vmax = 1.0
+        if self._grid_blur > 1:
+            g = cv2.GaussianBlur(g, (self._grid_blur, self._grid_blur), 0)
+        # percentile of the unblurred cells, from the running histogram
+        vmax = max(self.percentile(clip_percentile), 1e-6)
         g = np.clip(g / vmax, 0.0, 1.0)
-
         # gamma to lift dark areas (more visible early activity)
         g = np.power(g, gamma)
-        g8 = (g * 255.0).astype(np.uint8)
-        return g8
+        return (g * 255.0).astype(np.uint8)
+
+    def _normalize(self, clip_percentile: float = 95.0, gamma: float = 0.6):
+        g8 = self._coarse_g8(clip_percentile, gamma)
+        return cv2.resize(g8, (self.w, self.h), interpolation=cv2.INTER_LINEAR)
 
     def render(
         self,
@@ -73,47 +185,112 @@ class HeatmapAccumulator:
         clip_percentile: float = 90.0,  # a bit more aggressive than 95
         gamma: float = 0.5,             # lift low values more
         draw_grid: bool = False,
+        base_gray: Optional[np.ndarray] = None,  # precomputed gray of the base frame
     ) -> np.ndarray:
-        # --- normalize to 0..255 with blur & gamma ---
-        g = self.grid.copy()
-        if self.blur_ksize > 1:
-            g = cv2.GaussianBlur(g, (self.blur_ksize, self.blur_ksize), 0)
-        vmax = np.percentile(g[g > 0], clip_percentile) if np.any(g > 0) else 1.0
-        vmax = max(vmax, 1e-6)
-        g = np.clip(g / vmax, 0.0, 1.0)
-        g = np.power(g, gamma)
-        g8 = (g * 255.0).astype(np.uint8)
-
-        # --- colorize ---
-        palette_map = {
-            "turbo": cv2.COLORMAP_TURBO, "magma": cv2.COLORMAP_MAGMA,
-            "inferno": cv2.COLORMAP_INFERNO, "plasma": cv2.COLORMAP_PLASMA,
-            "jet": cv2.COLORMAP_JET,
-        }
-        cmap = palette_map.get(palette.lower(), cv2.COLORMAP_TURBO)
-        heat = cv2.applyColorMap(g8, cmap)
-
-        # If no base, just return the heatmap
-        if base_frame_bgr is None:
-            return heat
-
-        # --- build visibility mask so we only overlay where signal exists ---
-        mask = (g8 > 8).astype(np.float32)    # threshold
-        mask = cv2.GaussianBlur(mask, (21, 21), 0)  # soften edges
-        mask = np.clip(mask, 0.0, 1.0) * alpha
-        mask3 = cv2.merge([mask, mask, mask])
-
-        # dim grayscale base a touch so colors pop
-        base = cv2.cvtColor(base_frame_bgr, cv2.COLOR_BGR2GRAY)
-        base = cv2.cvtColor(base, cv2.COLOR_GRAY2BGR)
-        base = (base * 0.8).astype(np.uint8)
-
-        out = (base * (1.0 - mask3) + heat * mask3).astype(np.uint8)
-
-        if draw_grid:
-            step = max(40, min(self.w, self.h) // 12)
-            for x in range(0, self.w, step):
-                cv2.line(out, (x, 0), (x, self.h), (50, 50, 50), 1, cv2.LINE_AA)
-            for y in range(0, self.h, step):
-                cv2.line(out, (0, y), (self.w, y), (50, 50, 50), 1, cv2.LINE_AA)
-        return out
+        # --- normalize to 0..255 with blur & gamma (coarse grid, then upsample) ---
+        g8 = self._normalize(clip_percentile, gamma)
+        return colorize(g8, palette=palette, alpha=alpha, base_gray=base_gray,
+                        base_frame_bgr=base_frame_bgr, draw_grid=draw_grid)
+
+
+def colorize(
+    g8: np.ndarray,
+    palette: str = "turbo",
+    alpha: float = 0.6,
+    base_gray: Optional[np.ndarray] = None,
+    base_frame_bgr: Optional[np.ndarray] = None,
+    draw_grid: bool = False,
+) -> np.ndarray:
+    """Full-size 0..255 intensity -> colormapped image, optionally blended over a base frame."""
+    h, w = g8.shape[:2]
+    cmap = _PALETTES.get(palette.lower(), cv2.COLORMAP_TURBO)
+    heat = cv2.applyColorMap(g8, cmap)
+
+    # If no base, just return the heatmap
+    if base_frame_bgr is None and base_gray is None:
+        return heat
+
+    # --- build visibility mask so we only overlay where signal exists ---
+    mask = (g8 > 8).astype(np.float32)    # threshold
+    mask = cv2.GaussianBlur(mask, (21, 21), 0)  # soften edges
+    mask = np.clip(mask, 0.0, 1.0) * alpha
+    mask3 = cv2.merge([mask, mask, mask])
+
+    # dim grayscale base a touch so colors pop
+    base = base_gray if base_gray is not None else cv2.cvtColor(base_frame_bgr, cv2.COLOR_BGR2GRAY)
+    base = cv2.cvtColor(base, cv2.COLOR_GRAY2BGR)
+    base = (base * 0.8).astype(np.uint8)
+
+    out = (base * (1.0 - mask3) + heat * mask3).astype(np.uint8)
+
+    if draw_grid:
+        step = max(40, min(w, h) // 12)
+        for x in range(0, w, step):
+            cv2.line(out, (x, 0), (x, h), (50, 50, 50), 1, cv2.LINE_AA)
+        for y in range(0, h, step):
+            cv2.line(out, (0, y), (w, y), (50, 50, 50), 1, cv2.LINE_AA)
+    return out
+
+
+def render_grid(
+    grid: np.ndarray,
+    width: int,
+    height: int,
+    blur_ksize: int = 35,
+    palette: str = "turbo",
+    alpha: float = 0.6,
+    clip_percentile: float = 90.0,
+    gamma: float = 0.5,
+    base_gray: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Render any coarse count grid (e.g. an archived range sum) the way
+    HeatmapAccumulator.render does; blur_ksize is in full-frame pixels.
+    """
+    g = np.asarray(grid, dtype=np.float32)
+    k = max(1, int(round(blur_ksize * g.shape[1] / max(1, width))))
+    k = k if k % 2 == 1 else k + 1
+    if k > 1:
+        g = cv2.GaussianBlur(g, (k, k), 0)
+    nz = grid[grid > 0]
+    vmax = max(float(np.percentile(nz, clip_percentile)) if len(nz) else 1.0, 1e-6)
+    g = np.power(np.clip(g / vmax, 0.0, 1.0), gamma)
+    g8 = cv2.resize((g * 255.0).astype(np.uint8), (int(width), int(height)), interpolation=cv2.INTER_LINEAR)
+    return colorize(g8, palette=palette, alpha=alpha, base_gray=base_gray)
+
+
+class HeatmapRenderCache:
+    """
+    Encoded heatmap images keyed by (camera, mode, palette, alpha). An entry
+    is served while it is younger than ttl seconds, however often the grid
+    changed meanwhile, and after that for as long as the grid version it was
+    rendered from is still current. So a busy scene is re-rendered (and gets
+    a new ETag) at most once per ttl, and an idle one not at all. get()
+    returns (etag, png bytes) or None; the ETag is a content hash, so a
+    client revalidating with If-None-Match gets a 304 until the picture changes.
+    """
+
+    def __init__(self, ttl: float = 1.0):
+        self.ttl = float(ttl)
+        self._lock = threading.Lock()
+        self._items: Dict[tuple, Tuple[float, int, str, bytes]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, version: int):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and (time.time() - item[0] < self.ttl or item[1] == version):
+                self.hits += 1
+                return item[2], item[3]
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, version: int, png: bytes) -> str:
+        etag = '"' + hashlib.sha1(png).hexdigest()[:20] + '"'
+        with self._lock:
+            self._items[key] = (time.time(), version, etag, png)
+        return etag
+
+    def stats(self):
+        return {"entries": len(self._items), "hits": self.hits, "misses": self.misses}
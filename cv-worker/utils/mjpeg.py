@@ -0,0 +1,120 @@
+# cv-worker/utils/mjpeg.py
+import itertools
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import cv2
+
+class FrameHub:
+    """
+    Per-camera broadcast of overlay frames to MJPEG viewers.
+      - publish() just swaps in the newest item; the worker never draws, encodes or waits
+      - each item is rendered (render(item) -> BGR frame) and JPEG-encoded at most
+        once, by the first viewer that pulls it, so nothing is drawn or encoded
+        while nobody is watching
+      - every subscriber gets latest-frame-wins delivery; a slow client only
+        skips frames, it never holds up the worker or other viewers
+    """
+
+    def __init__(self, quality: int = 80, render: Optional[Callable[[Any], np.ndarray]] = None):
+        self.quality = int(quality)
+        self.render = render or (lambda item: item)
+        self._cv = threading.Condition()
+        self._seq = 0
+        self._item: Any = None
+        self._enc_lock = threading.Lock()
+        self._jpg_seq = 0
+        self._jpg: Optional[bytes] = None
+        self._ids = itertools.count(1)
+        self.subscribers: Dict[int, "Subscriber"] = {}
+        self.encoded = 0
+        self.closed = False
+
+    def publish(self, item: Any):
+        with self._cv:
+            self._seq += 1
+            self._item = item
+            self._cv.notify_all()
+
+    def close(self):
+        with self._cv:
+            self.closed = True
+            self._cv.notify_all()
+
+    def subscribe(self) -> "Subscriber":
+        sub = Subscriber(self, next(self._ids))
+        with self._cv:
+            self.subscribers[sub.id] = sub
+        return sub
+
+    def unsubscribe(self, sub: "Subscriber"):
+        with self._cv:
+            self.subscribers.pop(sub.id, None)
+
+    def _wait_newer(self, after_seq: int, timeout: float) -> Tuple[int, Any]:
+        with self._cv:
+            if self._seq <= after_seq and not self.closed:
+                self._cv.wait(timeout)
+            return self._seq, self._item
+
+    def _encode(self, seq: int, item: Any) -> Tuple[int, Optional[bytes]]:
+        with self._enc_lock:
+            if self._jpg_seq >= seq:
+                return self._jpg_seq, self._jpg
+            ok, jpg = cv2.imencode(".jpg", self.render(item), [int(cv2.IMWRITE_JPEG_QUALITY), self.quality])
+            if not ok:
+                return seq, None
+            self._jpg_seq, self._jpg = seq, jpg.tobytes()
+            self.encoded += 1
+            return self._jpg_seq, self._jpg
+
+    def snapshot_jpeg(self) -> Optional[bytes]:
+        """Latest rendered frame for one-off consumers (no subscription)."""
+        with self._cv:
+            seq, item = self._seq, self._item
+        if item is None:
+            return None
+        return self._encode(seq, item)[1]
+
+    def stats(self) -> dict:
+        with self._cv:
+            subs = list(self.subscribers.values())
+        return {
+            "subscribers": len(subs),
+            "published": self._seq,
+            "encoded": self.encoded,
+            "clients": [s.stats() for s in subs],
+        }
+
+
+class Subscriber:
+    def __init__(self, hub: FrameHub, sub_id: int):
+        self.hub = hub
+        self.id = sub_id
+        self.last_seq = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def get(self, timeout: float = 1.0) -> Optional[bytes]:
+        """JPEG bytes of the newest frame not yet seen, or None on timeout."""
+        seq, item = self.hub._wait_newer(self.last_seq, timeout)
+        if seq <= self.last_seq or item is None:
+            return None
+        seq, jpg = self.hub._encode(seq, item)
+        if jpg is None:
+            return None
+        if self.last_seq:
+            self.dropped += max(0, seq - self.last_seq - 1)
+        self.last_seq = seq
+        self.delivered += 1
+        return jpg
+
+    def stats(self) -> dict:
+        total = self.delivered + self.dropped
+        return {
+            "id": self.id,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "drop_rate": round(self.dropped / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,34 @@
+# cv-worker/utils/motion.py
+import cv2
+import numpy as np
+
+from .framectx import FrameContext
+
+class MotionGate:
+    """
+    Cheap "did anything change" test on a small blurred gray image.
+    The frame is compared with a running-average background; the scene
+    counts as moving when more than min_area of the pixels differ by more
+    than thresh gray levels. Uses the FrameContext's downscale, so it
+    costs a few hundred microseconds per frame.
+    """
+
+    def __init__(self, width: int = 160, thresh: int = 18, min_area: float = 0.002, alpha: float = 0.05):
+        self.width = int(width)
+        self.thresh = float(thresh)
+        self.min_area = float(min_area)
+        self.alpha = float(alpha)
+        self._bg = None
+        self.last_fraction = 0.0
+
+    def moving(self, frame) -> bool:
+        ctx = FrameContext.of(frame)
+        g = cv2.GaussianBlur(ctx.small_gray(self.width), (5, 5), 0)
+        if self._bg is None or self._bg.shape != g.shape:
+            self._bg = g.astype(np.float32)
+            self.last_fraction = 1.0
+            return True
+        diff = cv2.absdiff(g, cv2.convertScaleAbs(self._bg))
+        self.last_fraction = float(np.count_nonzero(diff > self.thresh)) / diff.size
+        cv2.accumulateWeighted(g, self._bg, self.alpha)
+        return self.last_fraction >= self.min_area
@@ -0,0 +1,22 @@
+# cv-worker/utils/overlay.py
+from typing import Any, List, NamedTuple, Optional
+
+import numpy as np
+import cv2
+
+class OverlaySnapshot(NamedTuple):
+    """What the worker publishes per frame; drawing happens only when someone pulls it."""
+    frame: np.ndarray
+    tracks: List[dict]
+    zones: Optional[Any] = None  # utils.zones.Zones, or None to skip zone outlines
+
+def render_overlay(snap: OverlaySnapshot) -> np.ndarray:
+    out = snap.frame.copy()
+    if snap.zones is not None:
+        out = snap.zones.draw(out)
+    for t in snap.tracks:
+        x1,y1,x2,y2 = map(int, t["xyxy"])
+        cv2.rectangle(out, (x1,y1), (x2,y2), (0,200,255), 2)
+        lbl = f'{t["class_name"]}#{t["track_id"]}'
+        cv2.putText(out, lbl, (x1, max(20,y1-6)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255,255,255), 2, cv2.LINE_AA)
+    return out
@@ -1,16 +1,152 @@
+import threading
+import weakref
 from collections import deque
-from typing import Deque, Tuple
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
 import numpy as np
+import cv2
 
 # Stores (ts_float, frame_bgr)
 class RingBuffer:
-    def __init__(self, seconds: float, fps: int):
+    """
+    Pre-roll ring with a per-camera memory budget.
+      - mode="raw":  one contiguous (N,H,W,3) uint8 block allocated on the first
+                     push; frames are copied into their slot in place
+      - mode="jpeg": JPEG bytes per frame, evicted by count and by bytes
+    dump() returns a RingWindow of zero-copy views; a push that is about to
+    overwrite a slot a window still has to read copies that one frame into
+    the window first, so only frames the clip writer has not reached are copied.
+    """
+    def __init__(self, seconds: float, fps: int, mode: str = "raw", budget_mb: Optional[float] = None, jpeg_quality: int = 85):
         self.capacity = max(1, int(seconds * fps))
-        self.buf: Deque[Tuple[float, np.ndarray]] = deque(maxlen=self.capacity)
+        self.mode = (mode or "raw").lower()
+        if self.mode not in ("raw", "jpeg"):
+            raise ValueError(f"Unknown ring buffer mode: {mode}")
+        self.budget = int(budget_mb * 1024 * 1024) if budget_mb else None
+        self.jpeg_quality = int(jpeg_quality)
+        self.seq = 0  # frames pushed so far
+
+        # raw mode
+        self.frames: Optional[np.ndarray] = None
+        self.ts = np.zeros(self.capacity, dtype=np.float64)
+        self._windows = weakref.WeakSet()  # open RingWindows over self.frames
+
+        # jpeg mode
+        self.buf: Deque[Tuple[int, float, bytes]] = deque()
+        self.nbytes = 0
+
+    def _alloc(self, shape):
+        n = max(1, int(np.prod(shape)))
+        cap = self.capacity if not self.budget else max(1, min(self.capacity, self.budget // n))
+        self.frames = np.empty((cap,) + tuple(shape), dtype=np.uint8)
+        self.ts = np.zeros(cap, dtype=np.float64)
+        # slots are numbered from the new block; windows over the old one keep it alive
+        self.seq = 0
+        self._windows = weakref.WeakSet()
+        print(f"[RingBuffer] raw {cap}x{shape} = {self.frames.nbytes / 1e6:.1f} MB")
 
     def push(self, ts, frame):
-        self.buf.append((ts, frame))
+        seq = self.seq
+        if self.mode == "jpeg":
+            ok, jpg = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+            if not ok:
+                return
+            data = jpg.tobytes()
+            self.buf.append((seq, ts, data))
+            self.nbytes += len(data)
+            while len(self.buf) > 1 and (len(self.buf) > self.capacity or (self.budget and self.nbytes > self.budget)):
+                self.nbytes -= len(self.buf.popleft()[2])
+        else:
+            if self.frames is None or self.frames.shape[1:] != frame.shape:
+                self._alloc(frame.shape)
+                seq = self.seq
+            i = seq % len(self.frames)
+            if seq >= len(self.frames):
+                for w in list(self._windows):
+                    w._evict(seq - len(self.frames))
+            np.copyto(self.frames[i], frame)
+            self.ts[i] = ts
+        self.seq = seq + 1
+
+    def __len__(self):
+        if self.mode == "jpeg":
+            return len(self.buf)
+        return 0 if self.frames is None else min(self.seq, len(self.frames))
+
+    def memory_bytes(self) -> int:
+        return self.nbytes if self.mode == "jpeg" else (0 if self.frames is None else self.frames.nbytes)
+
+    # window over what is buffered right now (oldest first); `since` drops
+    # older frames, so a ring sized for fps_cap still yields pre_seconds of
+    # video when the analysis rate is lower
+    def dump(self, since: Optional[float] = None) -> "RingWindow":
+        if self.mode == "jpeg":
+            buf = [e for e in self.buf if since is None or e[1] >= since]
+            return RingWindow([(s, t) for s, t, _ in buf], blobs=[d for _, _, d in buf])
+        n = len(self)
+        if n == 0:
+            return RingWindow([])
+        cap = len(self.frames)
+        entries = [(s, float(self.ts[s % cap])) for s in range(self.seq - n, self.seq)]
+        if since is not None:
+            entries = [e for e in entries if e[1] >= since]
+        w = RingWindow(entries, frames=self.frames)
+        self._windows.add(w)
+        return w
+
+
+class RingWindow:
+    """
+    Sequence of (ts, frame) over a RingBuffer snapshot.
+    Raw frames are read from the ring in place; the ring calls _evict() before
+    it overwrites a slot, and a frame not read yet is copied aside then.
+    Iteration hands each frame out through one scratch buffer (valid until the
+    next one), copied under the window lock so a concurrent push can never
+    tear it. JPEG frames are decoded on access.
+    """
+    def __init__(self, entries: List[Tuple[int, float]], blobs: Optional[List[bytes]] = None, frames: Optional[np.ndarray] = None):
+        self.entries = entries
+        self.blobs = blobs
+        self.frames = frames
+        self.first = entries[0][0] if entries else 0
+        self.next = 0  # entries before this were read by __iter__
+        self.saved: Dict[int, np.ndarray] = {}  # entry index -> frame copied before its slot was reused
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _evict(self, seq: int):
+        i = seq - self.first
+        if self.next <= i < len(self.entries):
+            with self._lock:
+                if i >= self.next:
+                    self.saved[i] = self.frames[seq % len(self.frames)].copy()
+
+    def _read(self, i, out=None) -> np.ndarray:
+        with self._lock:
+            f = self.saved.pop(i, None) if out is not None else self.saved.get(i)
+            if f is None:
+                src = self.frames[self.entries[i][0] % len(self.frames)]
+                if out is None:
+                    return src.copy()
+                np.copyto(out, src)
+                f = out
+            if out is not None:
+                self.next = max(self.next, i + 1)
+            return f
+
+    def __getitem__(self, i) -> Tuple[float, np.ndarray]:
+        """Random access for entries iteration has not passed yet; raw frames come back as a copy."""
+        ts = self.entries[i][1]
+        if self.blobs is not None:
+            return ts, cv2.imdecode(np.frombuffer(self.blobs[i], dtype=np.uint8), cv2.IMREAD_COLOR)
+        return ts, self._read(i % len(self.entries))
 
-    # return a copy (list) to avoid mutation while writing file
-    def dump(self):
-        return list(self.buf)
+    def __iter__(self) -> Iterator[Tuple[float, np.ndarray]]:
+        if self.blobs is not None:
+            for i in range(len(self.entries)):
+                yield self[i]
+            return
+        scratch = np.empty(self.frames.shape[1:], dtype=np.uint8) if self.entries else None
+        for i in range(self.next, len(self.entries)):
+            yield self.entries[i][1], self._read(i, scratch)
@@ -0,0 +1,197 @@
+# cv-worker/utils/segments.py
+import os
+import queue
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import cv2
+
+from .clipwriter import FFMPEG_EXE
+
+class SegmentRecorder(threading.Thread):
+    """
+    Continuous recording into a bounded ring of short H.264 Matroska segments.
+      - one long-lived ffmpeg reads raw bgr24 frames from stdin at a constant fps;
+        frames are placed on that clock by their capture ts, i.e. repeated when
+        the camera loop runs slower (FPS governor, stalls) and dropped when faster
+      - keyframes are forced every segment_seconds, so segment k holds frames
+        [k*F, (k+1)*F) with F = fps * segment_seconds
+      - files wrap after segment_count segments (seg_000.mkv .. seg_NNN.mkv)
+    segments_for(t0, t1) maps wall-clock times to the closed segment files, which
+    ClipWriter stream-copies into an MP4 without re-encoding.
+    Point seg_dir at a tmpfs (e.g. /dev/shm) to keep the ring in RAM.
+    """
+
+    def __init__(self, camera_id: str, seg_dir: str, fps=15, width=640, height=480, segment_seconds=2, segment_count=8):
+        super().__init__(daemon=True, name=f"seg-{camera_id}")
+        self.camera_id = camera_id
+        self.dir = Path(seg_dir) / "".join(ch for ch in str(camera_id) if ch.isalnum() or ch in ("-", "_"))
+        self.fps = int(fps)
+        self.width = int(width)
+        self.height = int(height)
+        self.seg_seconds = max(1, int(segment_seconds))
+        self.count = max(3, int(segment_count))
+        self.per_seg = self.fps * self.seg_seconds
+        self.list_path = self.dir / "segments.csv"
+
+        self.q: "queue.Queue" = queue.Queue(maxsize=max(2, self.fps))
+        self.proc: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+        self.n_written = 0
+        self.seg_start: Dict[int, float] = {}  # segment index -> wall ts of its first frame
+        self._t0: Optional[float] = None  # wall ts of output frame 0
+        self._last = None  # bytes of the last frame piped, repeated to fill gaps
+        self.dropped = 0
+        self.repeated = 0
+        self.skipped = 0
+        self._stopping = False
+        os.makedirs(self.dir, exist_ok=True)
+
+    def _spawn(self):
+        for p in self.dir.glob("seg_*.mkv"):
+            p.unlink(missing_ok=True)
+        self.list_path.unlink(missing_ok=True)
+        cmd = [
+            FFMPEG_EXE, "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24",
+            "-s", f"{self.width}x{self.height}", "-framerate", str(self.fps),
+            "-i", "-",
+            "-an", "-vcodec", "libx264", "-pix_fmt", "yuv420p",
+            "-preset", "ultrafast", "-tune", "zerolatency",
+            "-force_key_frames", f"expr:gte(t,n_forced*{self.seg_seconds})",
+            "-f", "segment",
+            "-segment_time", str(self.seg_seconds),
+            "-segment_format", "matroska",
+            "-segment_wrap", str(self.count),
+            "-segment_list", self.list_path.as_posix(),
+            "-segment_list_type", "csv",
+            "-segment_list_size", str(self.count),
+            "-reset_timestamps", "1",
+            (self.dir / "seg_%03d.mkv").as_posix(),
+        ]
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    # called from the camera loop; never blocks
+    def push(self, ts: float, frame: np.ndarray):
+        try:
+            self.q.put_nowait((ts, frame))
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        self._spawn()
+        while not self._stopping:
+            try:
+                ts, frame = self.q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            slot = self._slot(ts)
+            if slot < self.n_written:
+                self.skipped += 1  # that output frame already has a picture
+                continue
+            h, w = frame.shape[:2]
+            if (w, h) != (self.width, self.height):
+                frame = cv2.resize(frame, (self.width, self.height), interpolation=cv2.INTER_LINEAR)
+            buf = memoryview(np.ascontiguousarray(frame)).cast("B")
+            try:
+                # output frames between the previous capture and this one repeat the previous picture
+                while self.n_written < slot:
+                    self._write(self._last)
+                    self.repeated += 1
+                self._write(buf)
+            except (BrokenPipeError, OSError, ValueError) as e:
+                if self._stopping:
+                    break  # stop() closed the pipe under us
+                print(f"[SegmentRecorder {self.camera_id}] ffmpeg pipe closed ({e}); restarting")
+                with self._lock:
+                    self.n_written = 0
+                    self.seg_start.clear()
+                self._t0 = None
+                self._spawn()
+                continue
+            self._last = buf
+
+    def _slot(self, ts: float) -> int:
+        """Output frame index (on the constant-fps clock) of a frame captured at `ts`."""
+        if self._t0 is None:
+            self._t0 = ts
+        slot = int((ts - self._t0) * self.fps + 1e-6)
+        if slot - self.n_written > self.per_seg:
+            # long stall: hold the last picture for one segment, then resync the clock
+            slot = self.n_written + self.per_seg
+            self._t0 = ts - slot / self.fps
+        return slot
+
+    def _write(self, buf):
+        self.proc.stdin.write(buf)
+        with self._lock:
+            n = self.n_written
+            k, i = divmod(n, self.per_seg)
+            if i == 0:
+                self.seg_start[k] = self._t0 + n / self.fps
+                self.seg_start.pop(k - self.count - 1, None)
+            self.n_written = n + 1
+
+    def _closed_until(self) -> float:
+        """Stream time (s) up to which ffmpeg has finished writing segments."""
+        try:
+            lines = self.list_path.read_text().strip().splitlines()
+        except OSError:
+            return 0.0
+        done = 0.0
+        for ln in lines:
+            parts = ln.split(",")
+            if len(parts) >= 3:
+                try:
+                    done = max(done, float(parts[2]))
+                except ValueError:
+                    pass
+        return done
+
+    def segments_for(self, t0: float, t1: float, timeout: float = 0.0) -> List[Path]:
+        """Closed segment files covering wall-clock [t0, t1], oldest first.
+        Waits up to `timeout` for the segment holding t1 to be closed."""
+        deadline = time.time() + timeout
+        while True:
+            with self._lock:
+                starts = dict(self.seg_start)
+                cur = (self.n_written - 1) // self.per_seg if self.n_written else -1
+            done_k = int(self._closed_until() / self.seg_seconds + 1e-6)  # segments [0, done_k) closed
+            last_needed = max((k for k, s in starts.items() if s <= t1), default=-1)
+            if last_needed < done_k or time.time() >= deadline:
+                break
+            time.sleep(0.1)
+
+        out = []
+        for k in sorted(starts):
+            if k >= done_k or k <= cur - self.count:
+                continue  # still open, or already overwritten by the wrap
+            end = starts.get(k + 1, float("inf"))
+            if starts[k] <= t1 and end >= t0:
+                out.append(self.dir / f"seg_{k % self.count:03d}.mkv")
+        return out
+
+    def stats(self) -> dict:
+        return {
+            "segments_written": self.n_written // self.per_seg,
+            "frames_dropped": self.dropped,
+            "frames_repeated": self.repeated,
+            "frames_skipped": self.skipped,
+        }
+
+    def stop(self):
+        self._stopping = True
+        # let run() finish its write first; it only respawns ffmpeg while not stopping
+        if self.is_alive() and self is not threading.current_thread():
+            self.join(timeout=2.0)
+        try:
+            if self.proc and self.proc.stdin:
+                self.proc.stdin.close()
+            if self.proc:
+                self.proc.wait(timeout=2.0)
+        except Exception:
+            pass
@@ -0,0 +1,155 @@
+# cv-worker/utils/shmring.py
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+# control block (float64 slots)
+SEQ, OCCUPANCY, HEAT_VERSION, HEAT_BEGIN, HEAT_END, FPS_TARGET, FPS_ACTUAL, FPS_MIN, FPS_MAX, \
+    LOOP_MS, VIEWERS, HEARTBEAT, FRAME_TS = range(13)
+_CTL = 16
+# per-slot header: seqlock begin / end, frame ts, track rows
+_S_BEGIN, _S_END, _S_TS, _S_N = range(4)
+# track row: id, x1, y1, x2, y2, class_id, conf, lost
+TRACK_COLS = 8
+
+def _align(n: int) -> int:
+    return (n + 63) & ~63
+
+class CameraShm:
+    """
+    One camera's worker -> API handoff in a single shared-memory segment.
+      ctl     (16,) float64               latest seq, occupancy, heatmap version,
+                                          fps figures, viewer count, heartbeat
+      slots   (K, 4) float64              per-slot seqlock + ts + track count
+      frames  (K, H, W, 3) uint8          frame ring
+      tracks  (K, max_tracks, 8) float32  the overlay rows for each frame
+      heat    (gh, gw) float32            decayed heatmap grid
+    The worker process create()s it and is the only writer; the API process
+    attach()es by name and reads numpy views straight out of the segment.
+    Slots and the heat grid use a seqlock (begin/end counters), so a reader
+    can tell whether what it just used was overwritten underneath it.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, shape, grid_shape, slots: int, max_tracks: int, owner: bool):
+        self.shm = shm
+        self.name = shm.name
+        self.owner = owner
+        self.h, self.w = int(shape[0]), int(shape[1])
+        self.gh, self.gw = int(grid_shape[0]), int(grid_shape[1])
+        self.k = int(slots)
+        self.max_tracks = int(max_tracks)
+
+        buf, off = shm.buf, 0
+        def view(dtype, shp):
+            nonlocal off
+            a = np.ndarray(shp, dtype=dtype, buffer=buf, offset=off)
+            off += _align(a.nbytes)
+            return a
+        self.ctl = view(np.float64, (_CTL,))
+        self.slots = view(np.float64, (self.k, 4))
+        self.frames = view(np.uint8, (self.k, self.h, self.w, 3))
+        self.tracks = view(np.float32, (self.k, self.max_tracks, TRACK_COLS))
+        self.heat = view(np.float32, (self.gh, self.gw))
+
+    @staticmethod
+    def nbytes(shape, grid_shape, slots: int, max_tracks: int) -> int:
+        h, w = shape
+        return (_align(_CTL * 8) + _align(slots * 4 * 8) + _align(slots * h * w * 3)
+                + _align(slots * max_tracks * TRACK_COLS * 4) + _align(grid_shape[0] * grid_shape[1] * 4))
+
+    @classmethod
+    def create(cls, shape, grid_shape, slots: int = 4, max_tracks: int = 256) -> "CameraShm":
+        size = cls.nbytes(shape, grid_shape, slots, max_tracks)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        ring = cls(shm, shape, grid_shape, slots, max_tracks, owner=True)
+        ring.ctl[:] = 0
+        ring.slots[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name: str, shape, grid_shape, slots: int, max_tracks: int) -> "CameraShm":
+        return cls(shared_memory.SharedMemory(name=name), shape, grid_shape, slots, max_tracks, owner=False)
+
+    def layout(self) -> dict:
+        """What attach() needs on the other side."""
+        return {"name": self.name, "shape": (self.h, self.w), "grid_shape": (self.gh, self.gw),
+                "slots": self.k, "max_tracks": self.max_tracks}
+
+    # ------------------ writer ------------------
+    def write_frame(self, ts: float, frame: np.ndarray, tracks) -> int:
+        """Copy one frame + its TrackBatch rows into the next slot -> its seq."""
+        seq = int(self.ctl[SEQ]) + 1
+        i = seq % self.k
+        self.slots[i, _S_BEGIN] = seq
+        if frame.shape[:2] == (self.h, self.w):
+            self.frames[i] = frame
+        else:  # sources may change resolution mid-stream
+            import cv2
+            self.frames[i] = cv2.resize(frame, (self.w, self.h))
+        n = min(len(tracks), self.max_tracks)
+        if n:
+            rows = self.tracks[i, :n]
+            rows[:, 0] = tracks.ids[:n]
+            rows[:, 1:5] = tracks.boxes[:n]
+            rows[:, 5] = tracks.class_ids[:n]
+            rows[:, 6] = tracks.confs[:n]
+            rows[:, 7] = tracks.lost[:n]
+        self.slots[i, _S_TS] = ts
+        self.slots[i, _S_N] = n
+        self.slots[i, _S_END] = seq
+        self.ctl[FRAME_TS] = ts
+        self.ctl[SEQ] = seq
+        return seq
+
+    def write_heat(self, grid: np.ndarray, version: int):
+        b = self.ctl[HEAT_BEGIN] + 1
+        self.ctl[HEAT_BEGIN] = b
+        self.heat[:] = grid
+        self.ctl[HEAT_VERSION] = version
+        self.ctl[HEAT_END] = b
+
+    # ------------------ reader ------------------
+    @property
+    def seq(self) -> int:
+        return int(self.ctl[SEQ])
+
+    def read(self, seq: Optional[int] = None) -> Optional[Tuple[int, float, np.ndarray, np.ndarray]]:
+        """(seq, ts, frame view, track rows view) of `seq` (default latest), None if gone."""
+        seq = self.seq if seq is None else int(seq)
+        if seq <= 0:
+            return None
+        i = seq % self.k
+        if self.slots[i, _S_END] != seq:
+            return None
+        n = int(self.slots[i, _S_N])
+        return seq, float(self.slots[i, _S_TS]), self.frames[i], self.tracks[i, :n]
+
+    def valid(self, seq: int) -> bool:
+        """True while slot `seq` has not been (partly) overwritten."""
+        i = seq % self.k
+        return self.slots[i, _S_BEGIN] == seq and self.slots[i, _S_END] == seq
+
+    def read_heat(self, retries: int = 3) -> Tuple[int, np.ndarray]:
+        """(version, copy of the heat grid) taken between two writer updates."""
+        grid = None
+        for _ in range(retries):
+            e = self.ctl[HEAT_END]
+            version = int(self.ctl[HEAT_VERSION])
+            grid = self.heat.copy()
+            if self.ctl[HEAT_BEGIN] == e:
+                break
+        return version, grid
+
+    def close(self):
+        # drop our views first so the mapping can be released
+        self.ctl = self.slots = self.frames = self.tracks = self.heat = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # a reader still holds a view; the mapping goes with the process
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
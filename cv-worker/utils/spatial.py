@@ -0,0 +1,121 @@
+# cv-worker/utils/spatial.py
+import math
+
+import numpy as np
+
+DEFAULT_CELL = 192.0  # px; radius queries scan ceil(r / cell) rings of cells
+# below these distance-matrix sizes plain NumPy beats the grid (bench_spatial.py)
+BRUTE_PAIRS = 96 * 96
+BRUTE_NEAREST = 1 << 16
+
+class GridIndex:
+    """
+    Uniform-grid neighbour index over (N,2) points, built once per frame.
+      pairs_within(r)          -> (i, j, d) for every i < j with d < r
+      nearest(queries, r)      -> (idx, d) nearest point closer than r, or -1
+    Points are bucketed by cell and sorted by cell key, so a query only looks
+    at the cells around it instead of all N points; small inputs (BRUTE_*)
+    just use one distance matrix, which is faster there. Results are exact and
+    ordered like the brute-force loops they replace (pairs in row-major i<j
+    order, ties in nearest() go to the lowest point index).
+    """
+
+    def __init__(self, points, cell: float = DEFAULT_CELL):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.cell = float(cell)
+        self.n = len(self.points)
+        self._keys = None  # cell buckets, built on the first grid query
+
+    def _build(self):
+        self._cx = np.floor(self.points[:, 0] / self.cell).astype(np.int64)
+        self._cy = np.floor(self.points[:, 1] / self.cell).astype(np.int64)
+        keys = self._key(self._cx, self._cy)
+        self._order = np.argsort(keys, kind="stable")
+        self._keys, self._start, self._count = np.unique(keys[self._order], return_index=True, return_counts=True)
+
+    @staticmethod
+    def _key(cx, cy):
+        # cells stay well inside +/- 2**31 for any sane frame size
+        return (cx << 32) + (cy & 0xFFFFFFFF)
+
+    def __len__(self):
+        return self.n
+
+    def _candidates(self, qcx, qcy, r, half=False):
+        """(qi, pj) for every query point and point in a cell within reach of r.
+        half=True scans only the forward half of the neighbourhood (self-join)."""
+        if self._keys is None:
+            self._build()
+        reach = max(1, int(math.ceil(r / self.cell)))
+        qs, ps = [], []
+        q = np.arange(len(qcx))
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                if half and (dx < 0 or (dx == 0 and dy < 0)):
+                    continue
+                key = self._key(qcx + dx, qcy + dy)
+                pos = np.minimum(np.searchsorted(self._keys, key), len(self._keys) - 1)
+                found = self._keys[pos] == key
+                if not found.any():
+                    continue
+                cnt = self._count[pos[found]]
+                total = int(cnt.sum())
+                qi = np.repeat(q[found], cnt)
+                first = np.repeat(self._start[pos[found]], cnt)
+                within = np.arange(total) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+                qs.append(qi)
+                ps.append(self._order[first + within])
+        if not qs:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        return np.concatenate(qs), np.concatenate(ps)
+
+    def pairs_within(self, r: float):
+        empty = np.zeros(0, dtype=np.int64)
+        if self.n < 2:
+            return empty, empty, np.zeros(0)
+        if self.n * self.n <= BRUTE_PAIRS:
+            p = self.points
+            d = np.hypot(p[:, None, 0] - p[None, :, 0], p[:, None, 1] - p[None, :, 1])
+            i, j = np.nonzero(np.triu(d < r, k=1))
+            return i, j, d[i, j]
+        if self._keys is None:
+            self._build()
+        a, b = self._candidates(self._cx, self._cy, r, half=True)
+        # the home cell is joined with itself, so keep each of its pairs once
+        same = (self._cx[a] == self._cx[b]) & (self._cy[a] == self._cy[b])
+        keep = np.where(same, a < b, True)
+        i, j = np.minimum(a[keep], b[keep]), np.maximum(a[keep], b[keep])
+        d = np.hypot(self.points[i, 0] - self.points[j, 0], self.points[i, 1] - self.points[j, 1])
+        keep = d < r
+        i, j, d = i[keep], j[keep], d[keep]
+        order = np.lexsort((j, i))
+        return i[order], j[order], d[order]
+
+    def nearest(self, queries, r: float):
+        q = np.asarray(queries, dtype=np.float64).reshape(-1, 2)
+        idx = np.full(len(q), -1, dtype=np.int64)
+        dist = np.full(len(q), np.inf)
+        if self.n == 0 or len(q) == 0:
+            return idx, dist
+        if self.n * len(q) <= BRUTE_NEAREST:
+            d = np.hypot(q[:, None, 0] - self.points[None, :, 0], q[:, None, 1] - self.points[None, :, 1])
+            j = d.argmin(axis=1)
+            dj = d[np.arange(len(q)), j]
+            hit = dj < r
+            idx[hit], dist[hit] = j[hit], dj[hit]
+            return idx, dist
+        qcx = np.floor(q[:, 0] / self.cell).astype(np.int64)
+        qcy = np.floor(q[:, 1] / self.cell).astype(np.int64)
+        qi, pj = self._candidates(qcx, qcy, r)
+        d = np.hypot(q[qi, 0] - self.points[pj, 0], q[qi, 1] - self.points[pj, 1])
+        keep = d < r
+        qi, pj, d = qi[keep], pj[keep], d[keep]
+        if len(qi):
+            order = np.lexsort((pj, d, qi))
+            qi, pj, d = qi[order], pj[order], d[order]
+            first = np.ones(len(qi), dtype=bool)
+            first[1:] = qi[1:] != qi[:-1]
+            idx[qi[first]] = pj[first]
+            dist[qi[first]] = d[first]
+        return idx, dist
@@ -1,11 +1,82 @@
 import cv2
-from .geometry import point_in_poly
+import numpy as np
+from .geometry import point_in_poly, points_in_poly
+
+class ZoneIndex:
+    """
+    All zones of one camera, answering "which zones contain these N points" at once.
+      - with a frame size: polygons are rasterized once into a bitmask image
+        (bit i = zone i, up to 64 zones; the narrowest uint that holds them),
+        so a lookup is one fancy-index read
+      - points outside the frame, or no frame size: bbox prefilter plus the
+        vectorized ray cast from utils.geometry (same result as point_in_poly)
+    Build it once per camera and share it; rebuild only when the zones change.
+    """
+
+    def __init__(self, zone_cfgs, width=None, height=None):
+        self.zones = list(zone_cfgs or [])
+        if len(self.zones) > 64:
+            raise ValueError(f"{len(self.zones)} zones configured, at most 64 per camera")
+        self.key = ZoneIndex.config_key(self.zones)
+        self.polys = [np.asarray(z["polygon"], dtype=np.float64).reshape(-1, 2) for z in self.zones]
+        self.bboxes = np.array([[p[:, 0].min(), p[:, 1].min(), p[:, 0].max(), p[:, 1].max()] for p in self.polys]).reshape(-1, 4)
+        self.col = {z["name"]: i for i, z in enumerate(self.zones)}
+
+        self.mask = None
+        if width and height and self.zones:
+            dtype = next(t for t in (np.uint8, np.uint16, np.uint32, np.uint64) if len(self.zones) <= np.iinfo(t).bits)
+            self.mask = np.zeros((int(height), int(width)), dtype=dtype)
+            tmp = np.zeros((int(height), int(width)), dtype=np.uint8)
+            for i, p in enumerate(self.polys):
+                tmp[:] = 0
+                cv2.fillPoly(tmp, [np.round(p).astype(np.int32)], 1)
+                self.mask[tmp > 0] |= dtype(1 << i)
+
+    @staticmethod
+    def config_key(zone_cfgs):
+        return tuple((z.get("name"), tuple(map(tuple, z["polygon"]))) for z in (zone_cfgs or []))
+
+    def membership(self, points) -> np.ndarray:
+        """(N,2) points -> (N, n_zones) bool, column i = inside self.zones[i]."""
+        pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        n, z = len(pts), len(self.zones)
+        out = np.zeros((n, z), dtype=bool)
+        if n == 0 or z == 0:
+            return out
+
+        todo = np.ones(n, dtype=bool)
+        if self.mask is not None:
+            h, w = self.mask.shape
+            xi = np.floor(pts[:, 0]).astype(np.int64)
+            yi = np.floor(pts[:, 1]).astype(np.int64)
+            inb = (xi >= 0) & (xi < w) & (yi >= 0) & (yi < h)
+            if inb.any():
+                bits = self.mask[yi[inb], xi[inb]]
+                dt = self.mask.dtype.type
+                out[inb] = ((bits[:, None] >> np.arange(z, dtype=dt)[None, :]) & dt(1)).astype(bool)
+            todo = ~inb
+
+        if todo.any():
+            idx = np.flatnonzero(todo)
+            for i, (p, bb) in enumerate(zip(self.polys, self.bboxes)):
+                sel = idx[(pts[idx, 0] >= bb[0]) & (pts[idx, 0] <= bb[2]) & (pts[idx, 1] >= bb[1]) & (pts[idx, 1] <= bb[3])]
+                if len(sel):
+                    out[sel, i] = points_in_poly(pts[sel, 0], pts[sel, 1], p)
+        return out
+
+    def where(self, x, y):
+        row = self.membership([[x, y]])[0]
+        return [z for z, hit in zip(self.zones, row) if hit]
+
 
 class Zones:
-    def __init__(self, zone_cfgs):
+    def __init__(self, zone_cfgs, index: ZoneIndex = None):
         self.zones = zone_cfgs or []
+        self.index = index
 
     def where(self, x, y):
+        if self.index is not None:
+            return self.index.where(x, y)
         hits = []
         for z in self.zones:
             if point_in_poly(x, y, z["polygon"]):
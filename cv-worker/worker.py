@@ -0,0 +1,473 @@
+# cv-worker/worker.py
+from datetime import datetime, timezone
+import os, time, threading, yaml
+from typing import Optional
+import cv2
+
+try:
+    cv2.setNumThreads(1)
+except Exception:
+    pass
+
+from detectors import build_detector
+from detectors.service import InferenceService
+from tracking.simple_tracker import CentroidTracker
+from tracking.iou_tracker import IouTracker
+from utils import config as cfgutil
+from utils.zones import Zones, ZoneIndex
+from utils.bus import EventBus
+from features.intrusion import IntrusionDetector
+from features.loitering import LoiteringDetector
+from features.abandoned import AbandonedDetector
+from features.tamper import TamperDetector
+from features.fall import FallDetector
+from features.violence_proxy import ViolenceProxy
+from utils.ringbuffer import RingBuffer
+from utils.clipwriter import ClipWriter
+from utils.segments import SegmentRecorder
+from utils.heatmap import HeatmapAccumulator
+from utils.heatarchive import HeatmapArchive
+from utils.capture import FrameGrabber
+from utils.mjpeg import FrameHub
+from utils.overlay import OverlaySnapshot, render_overlay
+from utils.framectx import FrameContext, FrameCtxStats
+from utils.motion import MotionGate
+from utils.governor import FpsGovernor
+
+def iso_utc(ts):
+    if isinstance(ts, (int, float)):
+        return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat(timespec="milliseconds").replace("+00:00","Z")
+    if isinstance(ts, str):
+        return ts
+    return datetime.now(tz=timezone.utc).isoformat(timespec="milliseconds").replace("+00:00","Z")
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.yaml")
+CFG = yaml.safe_load(open(CONFIG_PATH, "r", encoding="utf-8"))
+DETECT_TIMEOUT = 5.0  # seconds a camera waits for its detections before coasting the frame
+
+class CameraWorker(threading.Thread):
+    def __init__(self, cam_id: str, source, infer: InferenceService, overlay_cfg, fps_cap=15, zones_cfg=None, bus: EventBus = None, clips_dir="C:/Hackathons/HoneyWell/clips", fps_min=None):
+        super().__init__(daemon=True)
+        self.id = cam_id
+        self.last_frame = None
+        self.last_ctx = None
+        self.ctx_stats = FrameCtxStats()
+        self.current_occupancy = 0
+
+        if isinstance(source, int):
+            self.cap = cv2.VideoCapture(source, cv2.CAP_DSHOW)
+        else:
+            self.cap = cv2.VideoCapture(source)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"[{cam_id}] Could not open camera/video source: {source}")
+        live = isinstance(source, int) or str(source).lower().startswith(("rtsp:", "rtmp:", "http:", "https:"))
+        self.grabber = FrameGrabber(self.cap, name=cam_id, realtime=not live)
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.frame_age_ms = 0.0
+
+        self.tamper = make_tamper(CFG.get("tamper") or {})
+        self.det = infer
+        self.trk = make_tracker(CFG.get("tracker") or {})
+        self.overlay_cfg = overlay_cfg
+
+        # detection gating: skip YOLO on static scenes and/or run it every K
+        # frames; in between the tracker coasts (predict()) on interval skips
+        # and holds still (hold()) while the motion gate sees nothing move
+        dcfg = CFG.get("detection") or {}
+        self.detect_every = max(1, int(dcfg.get("every_k", 1)))
+        self.max_skip = float(dcfg.get("max_skip_seconds", 2.0))
+        self.motion = make_motion_gate(dcfg)
+        self._frames_since_detect = 0
+        self._last_detect_ts = None
+        self.frames_inferred = 0
+        self.skipped_static = 0
+        self.skipped_interval = 0
+        self.detect_errors = 0
+        self.detect_ms = 0.0
+
+        self.hub = FrameHub(quality=80, render=render_overlay)
+        self.fps_cap = int(fps_cap)
+        # analysis rate; the FPS governor moves fps_target inside [fps_min, fps_max]
+        self.fps_max = float(fps_cap)
+        self.fps_min = min(self.fps_max, float(fps_min if fps_min is not None else 1))
+        self.fps_target = self.fps_max
+        self.fps_actual = 0.0
+        self.loop_ms = 0.0
+        self.last_activity_ts = 0.0
+        self._stopping = False
+
+        w = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 640
+        h = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 480
+        self.frame_size = (w, h)
+
+        # one rasterized zone index shared by everything that asks "which zone?"
+        self.zone_index = ZoneIndex(zones_cfg or [], width=w, height=h)
+        self.zones = Zones(zones_cfg or [], index=self.zone_index)
+
+        self.features = make_features(zones_cfg or [], self.zone_index, CFG.get("features") or {})
+        self.intrusion, self.loitering, self.abandoned, self.fall, self.violence = self.features
+        self._pending_cfg = None  # prepared by apply_config(), swapped in between frames
+        self.config_reloads = 0
+        self.bus = bus
+        # set in worker processes: hands frames/state to the API process (workerproc.ShmPublisher)
+        self.publisher = None
+
+        # pre-roll buffer; keep post-roll = 0 to avoid stalls
+        self.pre_seconds = 7
+        self.post_seconds = 0
+        pcfg = CFG.get("preroll") or {}
+        self.rbuf = RingBuffer(
+            seconds=self.pre_seconds,
+            fps=self.fps_cap,
+            mode=pcfg.get("mode", "raw"),
+            budget_mb=pcfg.get("budget_mb"),
+            jpeg_quality=pcfg.get("jpeg_quality", 85),
+        )
+
+        hcfg = CFG.get("heatmap") or {}
+        self.heatmap = HeatmapAccumulator(
+            width=w, height=h,
+            decay_per_sec=hcfg.get("decay_per_sec", 0.15),
+            blur_ksize=hcfg.get("blur_ksize", 35),
+            scale=hcfg.get("scale", 0.25),
+        )
+        acfg = hcfg.get("archive") or {}
+        if acfg.get("enabled", False):
+            self.heatmap.attach_archive(HeatmapArchive(
+                root=acfg.get("dir", "heatmaps"), camera_id=cam_id,
+                shape=(self.heatmap.gh, self.heatmap.gw),
+                interval_seconds=acfg.get("interval_seconds", 60),
+                frame_size=(w, h),
+            ))
+
+        ccfg = CFG.get("clips") or {}
+        self.writer = ClipWriter(out_dir=clips_dir, fps=self.fps_cap, width=w, height=h, reuse_horizon=ccfg.get("reuse_horizon_seconds", 1.0))
+        self._clip_jobs = []  # clips waiting for post-roll frames
+
+        # optional continuous recording; clips become a remux of recorded segments
+        self.segrec = None
+        if ccfg.get("mode", "encode") == "segments":
+            self.segrec = SegmentRecorder(
+                cam_id,
+                seg_dir=ccfg.get("segments_dir", os.path.join(clips_dir, "_segments")),
+                fps=self.fps_cap, width=w, height=h,
+                segment_seconds=ccfg.get("segment_seconds", 2),
+                segment_count=ccfg.get("segment_count", 8),
+            )
+
+    def stop(self):
+        self._stopping = True
+        self.hub.close()
+        self.grabber.stop()
+        self.writer.stop()
+        if self.segrec:
+            self.segrec.stop()
+
+    def apply_config(self, cfg: dict):
+        """
+        Take over the live sections of a validated config (zones, feature,
+        tamper and detection settings). The zone index is rasterized here, on
+        the caller's thread; the worker swaps everything in at the top of its
+        next frame, so no frame sees half of it. Per-track state is kept for
+        zones that still exist.
+        """
+        zones_cfg = cfg.get("zones") or []
+        w, h = self.frame_size
+        index = ZoneIndex(zones_cfg, width=w, height=h)
+        self._pending_cfg = {
+            "zone_index": index,
+            "zones": Zones(zones_cfg, index=index),
+            "features": cfg.get("features") or {},
+            "tamper": cfg.get("tamper") or {},
+            "detection": cfg.get("detection") or {},
+            "overlay": cfg.get("overlay") or {},
+        }
+
+    def _swap_config(self):
+        p, self._pending_cfg = self._pending_cfg, None
+        if p["zone_index"].key != self.zone_index.key or p["zones"].zones != self.zones.zones:
+            self.zone_index, self.zones = p["zone_index"], p["zones"]
+            self.intrusion.set_zones(self.zone_index)
+            self.loitering.set_zones(self.zone_index)
+        # full settings (defaults included), so keys deleted from the file reset
+        fcfg = p["features"]
+        self.intrusion.configure(**cfgutil.feature_params(fcfg, "intrusion"))
+        self.abandoned.configure(**cfgutil.feature_params(fcfg, "abandoned"))
+        self.fall.configure(**cfgutil.feature_params(fcfg, "fall"))
+        self.violence.configure(**cfgutil.feature_params(fcfg, "violence"))
+        self.tamper.configure(**cfgutil.tamper_params(p["tamper"]))
+
+        dcfg = p["detection"]
+        self.detect_every = max(1, int(dcfg.get("every_k", 1)))
+        self.max_skip = float(dcfg.get("max_skip_seconds", 2.0))
+        gate = make_motion_gate(dcfg)
+        if gate is None or self.motion is None or \
+                (self.motion.width, self.motion.thresh, self.motion.min_area) != (gate.width, gate.thresh, gate.min_area):
+            self.motion = gate  # otherwise keep the learnt background
+        self.overlay_cfg = p["overlay"]
+        self.config_reloads += 1
+
+    def _skip_reason(self, ctx, now):
+        """None = run detection on this frame, else why it is skipped."""
+        moving = self.motion.moving(ctx) if self.motion else True  # keeps the background current
+        if self._last_detect_ts is None or now - self._last_detect_ts >= self.max_skip:
+            return None
+        if not moving:
+            return "static"
+        if self._frames_since_detect + 1 < self.detect_every:
+            return "interval"
+        return None
+
+    def detection_stats(self) -> dict:
+        seen = self.frames_inferred + self.skipped_static + self.skipped_interval
+        skipped = self.skipped_static + self.skipped_interval
+        return {
+            "infer_fraction": round(self.frames_inferred / max(1, seen), 3),
+            "inferred": self.frames_inferred,
+            "skipped_static": self.skipped_static,
+            "skipped_interval": self.skipped_interval,
+            "errors": self.detect_errors,
+            "detect_ms_avg": round(self.detect_ms, 1),
+            "saved_ms_est": round(skipped * self.detect_ms, 0),
+            "motion_fraction": round(self.motion.last_fraction, 4) if self.motion else None,
+        }
+
+    def metrics(self) -> dict:
+        return {
+            "frames_processed": self.frames_processed,
+            "frames_dropped": self.frames_dropped,
+            "frame_age_ms": round(self.frame_age_ms, 1),
+            "read_failures": self.grabber.read_failures,
+            "clips": self.writer.stats(),
+            "preroll_mb": round(self.rbuf.memory_bytes() / 1e6, 1),
+            "segments": self.segrec.stats() if self.segrec else None,
+            "stream": self.hub.stats(),
+            "tamper": self.tamper.stats(),
+            "frame_ctx": self.ctx_stats.stats(),
+            "detection": self.detection_stats(),
+            "fps": {"target": round(self.fps_target, 2), "actual": round(self.fps_actual, 2), "loop_ms": round(self.loop_ms, 1)},
+            "heatmap_archive": self.heatmap.archive.stats() if self.heatmap.archive else None,
+            "config_reloads": self.config_reloads,
+        }
+
+    def run(self):
+        last = 0.0
+        last_seq = 0
+        busy = False
+        self.grabber.start()
+        self.writer.start()
+        if self.segrec:
+            self.segrec.start()
+
+        while not self._stopping:
+            if self._pending_cfg is not None:
+                self._swap_config()
+            if busy:
+                # time spent on the previous frame, for the FPS governor
+                ms = (time.time() - last) * 1000.0
+                self.loop_ms = ms if not self.loop_ms else 0.9 * self.loop_ms + 0.1 * ms
+                busy = False
+            # pace first, then take the freshest frame so it is never stale
+            period = 1.0 / max(0.1, self.fps_target)
+            wait = period - (time.time() - last)
+            if wait > 0:
+                time.sleep(wait)
+            got = self.grabber.latest(after_seq=last_seq, timeout=1.0)
+            if got is None:
+                continue
+            seq, now, frame = got
+            if last_seq:
+                self.frames_dropped += seq - last_seq - 1
+            last_seq = seq
+            if last:
+                rate = 1.0 / max(1e-3, time.time() - last)
+                self.fps_actual = rate if not self.fps_actual else 0.9 * self.fps_actual + 0.1 * rate
+            last = time.time()
+            busy = True
+            self.frames_processed += 1
+            self.frame_age_ms = (last - now) * 1000.0
+            # derived images (gray, rgb, downscales) are computed once and shared
+            ctx = FrameContext(frame, now, seq, stats=self.ctx_stats)
+
+            # push to pre-roll (or the segment recorder, which keeps its own history)
+            if self.segrec:
+                self.segrec.push(now, frame)
+            else:
+                self.rbuf.push(now, frame)
+
+            # tamper feature may emit events
+            for ev in self.tamper.step_frame(ctx, now, self.id):
+                self.bus.post_event(ev)
+
+            # detect + track; on skipped frames the tracker coasts or holds
+            skip = self._skip_reason(ctx, now)
+            dets = None
+            if skip is None:
+                t0 = time.perf_counter()
+                try:
+                    dets = self.det.submit(self.id, ctx).result(timeout=DETECT_TIMEOUT)
+                except Exception as e:  # failed batch, timeout or shutdown: coast this frame
+                    self.detect_errors += 1
+                    if self.detect_errors == 1 or self.detect_errors % 100 == 0:
+                        print(f"[{self.id}] detection failed ({self.detect_errors}x): {e!r}")
+            if dets is not None:
+                ms = (time.perf_counter() - t0) * 1000.0
+                self.detect_ms = ms if not self.frames_inferred else 0.9 * self.detect_ms + 0.1 * ms
+                self.frames_inferred += 1
+                self._frames_since_detect = 0
+                self._last_detect_ts = now
+                tracks = self.trk.update(dets)
+            elif skip is None:
+                tracks = self.trk.predict()
+            else:
+                self._frames_since_detect += 1
+                if skip == "static":
+                    self.skipped_static += 1
+                    tracks = self.trk.hold()
+                else:
+                    self.skipped_interval += 1
+                    tracks = self.trk.predict()
+
+            # occupancy + heatmap straight from the columnar batch
+            persons = tracks.of_class("person")
+            self.current_occupancy = len(persons)
+            self.heatmap.step_decay(now)
+            if len(persons):
+                self.heatmap.add_boxes(tracks.boxes[persons].astype(int).tolist(), strength=1.0)
+
+            # features → events
+            event_batch = []
+            for f in self.features:
+                event_batch.extend(f.step(tracks, now, self.id))
+            if event_batch or len(tracks):
+                self.last_activity_ts = time.time()  # governor favours busy cameras
+
+            # overlays are drawn lazily by whoever pulls the snapshot
+            self.last_frame = frame
+            self.last_ctx = ctx
+            show_zones = self.overlay_cfg.get("show_zones", True)
+            self.hub.publish(OverlaySnapshot(frame, tracks, self.zones if show_zones else None))
+            if self.publisher is not None:
+                self.publisher.publish(self, now, frame, tracks)
+
+            # post-roll for clips that are still collecting frames
+            for job in self._clip_jobs:
+                if now <= job["until"]:
+                    job["post"].append((now, frame))
+
+            # one clip per batch, shared by every event in it; post right away
+            # with the clip URL, encoding happens on the writer thread
+            if event_batch:
+                until = now + self.post_seconds
+                label = "-".join(sorted({ev["event_type"] for ev in event_batch}))
+                if self.segrec:
+                    name, is_new = self.writer.reserve(self.id, now - self.pre_seconds, until)
+                    if is_new:
+                        self.writer.enqueue_cut(self.id, label, self.segrec, now - self.pre_seconds, until, name=name)
+                else:
+                    # reserve first: a clip-cache hit never touches the ring
+                    name, is_new = self.writer.reserve(self.id, now - self.pre_seconds, until)
+                    if is_new:
+                        self._clip_jobs.append({"event_id": label, "name": name, "pre": self.rbuf.dump(since=now - self.pre_seconds), "post": [], "until": until})
+                for ev in event_batch:
+                    ev.setdefault("artifacts", {})
+                    ev["artifacts"]["clip_mp4"] = f"http://localhost:8080/media/{name}"
+                    # ensure ISO time
+                    ev["ts_utc"] = iso_utc(ev.get("ts_utc", now))
+                    self.bus.post_event(ev)
+
+            if self._clip_jobs:
+                ready = [j for j in self._clip_jobs if now >= j["until"]]
+                self._clip_jobs = [j for j in self._clip_jobs if now < j["until"]]
+                for job in ready:
+                    self.writer.enqueue(self.id, job["event_id"], job["pre"], job["post"], name=job["name"])
+
+        # keep the partial interval of archived heatmap counts
+        self.heatmap.flush_interval()
+        if self.heatmap.archive is not None:
+            self.heatmap.archive.close()
+
+# ---------- builders shared by the API process, worker processes and replay.py ----------
+def make_tamper(tconf: dict) -> TamperDetector:
+    return TamperDetector(**cfgutil.tamper_params(tconf))
+
+def make_tracker(kcfg: dict):
+    if kcfg.get("engine", "centroid") == "iou":
+        return IouTracker(
+            max_lost=kcfg.get("max_lost", 15),
+            dist_thr=kcfg.get("dist_thr", 80.0),
+            iou_weight=kcfg.get("iou_weight", 0.6),
+            class_gated=kcfg.get("class_gated", True),
+        )
+    return CentroidTracker(max_lost=kcfg.get("max_lost", 15), dist_thr=kcfg.get("dist_thr", 80.0))
+
+def make_motion_gate(dcfg: dict) -> Optional[MotionGate]:
+    if not dcfg.get("motion_gate", False):
+        return None
+    return MotionGate(
+        width=dcfg.get("motion_width", 160),
+        thresh=dcfg.get("motion_thresh", 18),
+        min_area=dcfg.get("motion_min_area", 0.002),
+    )
+
+def make_features(zones_cfg, zone_index: ZoneIndex, fcfg: dict) -> list:
+    """[intrusion, loitering, abandoned, fall, violence], in the order the worker steps them."""
+    return [
+        IntrusionDetector(zones_cfg, index=zone_index, **cfgutil.feature_params(fcfg, "intrusion")),
+        LoiteringDetector(zones_cfg, index=zone_index),
+        AbandonedDetector(**cfgutil.feature_params(fcfg, "abandoned")),
+        FallDetector(**cfgutil.feature_params(fcfg, "fall")),
+        ViolenceProxy(**cfgutil.feature_params(fcfg, "violence")),
+    ]
+
+def make_inference(warmup: bool = True) -> InferenceService:
+    ycfg = CFG["yolo"]
+    bcfg = ycfg.get("batch") or {}
+    det = build_detector(ycfg)
+    if warmup:
+        t0 = time.perf_counter()
+        det.warmup()
+        print(f"[cv] detector warm-up {(time.perf_counter() - t0) * 1000.0:.0f} ms")
+    svc = InferenceService(det, max_batch=bcfg.get("max_batch", 8), max_wait_ms=bcfg.get("max_wait_ms", 10))
+    svc.start()
+    print(f"[cv] inference service up (backend={det.backend}, int8={bool(ycfg.get('int8'))}, max_batch={svc.max_batch}, max_wait_ms={bcfg.get('max_wait_ms', 10)})")
+    return svc
+
+def make_event_bus(spool_dir=None) -> EventBus:
+    bcfg = CFG.get("events") or {}
+    bus = EventBus(
+        api_url=bcfg.get("api_url", "http://localhost:8080/api"),
+        batch_size=bcfg.get("batch_size", 20),
+        max_age_ms=bcfg.get("max_age_ms", 250),
+        spool_dir=spool_dir or bcfg.get("spool_dir", "spool"),
+    )
+    bus.start()
+    return bus
+
+def make_governor():
+    gcfg = CFG.get("governor") or {}
+    if not gcfg.get("enabled", False):
+        return None
+    gov = FpsGovernor(
+        interval=gcfg.get("interval_seconds", 2.0),
+        target_cpu=gcfg.get("target_cpu", 0.80),
+        active_seconds=gcfg.get("active_seconds", 30),
+    )
+    gov.start()
+    return gov
+
+def make_worker(cam: dict, infer: Optional[InferenceService], bus: EventBus) -> CameraWorker:
+    """Opens the source; `infer` may be set later (worker.det) as long as it is before start()."""
+    gcfg = CFG.get("governor") or {}
+    return CameraWorker(
+        cam_id=cam["id"],
+        source=cam["source"],
+        infer=infer,
+        overlay_cfg=CFG["overlay"],
+        fps_cap=cam.get("fps_cap", 15),
+        zones_cfg=CFG.get("zones", []),
+        bus=bus,
+        clips_dir="C:/Hackathons/HoneyWell/clips",
+        fps_min=cam.get("fps_min", gcfg.get("min_fps", 2)),
+    )
@@ -0,0 +1,470 @@
+# cv-worker/workerproc.py
+"""
+Camera workers in separate processes (execution.mode: processes).
+
+Each worker process runs a group of CameraWorkers with its own detector,
+InferenceService, EventBus and FPS governor, so capture, tracking, features
+and inference of different groups no longer share one interpreter lock.
+What the API needs comes back through one utils.shmring.CameraShm segment
+per camera: frames + overlay rows, occupancy, the decayed heatmap grid and
+fps figures. The API process wraps each segment in a RemoteCamera that
+exposes the CameraWorker attributes the endpoints use (hub, heatmap,
+last_ctx, current_occupancy, metrics(), fps_*), so /stream, /snapshot,
+/heatmap and /occupancy serve remote cameras unchanged.
+Small, infrequent messages (ready/error, class names, metrics) go over a
+multiprocessing queue; a per-process control queue carries reloaded configs
+the other way. A camera whose per-frame heartbeat stops (hung process or
+source) is reported "stale" in /health until frames come back.
+"""
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from tracking.batch import TrackBatch
+from utils.framectx import FrameContext
+from utils.heatarchive import HeatmapArchive
+from utils.heatmap import render_grid
+from utils.mjpeg import FrameHub
+from utils.overlay import OverlaySnapshot, render_overlay
+from utils import shmring
+from utils.shmring import CameraShm
+from utils.zones import Zones, ZoneIndex
+
+# ---------- worker-process side ----------
+class ShmPublisher:
+    """
+    Called by CameraWorker after every analysed frame. Scalars are written
+    every frame; the frame itself (one memcpy into the ring) only while the
+    API process has stream viewers, otherwise every idle_frame_seconds so
+    snapshots and heatmap overlays have a recent base; the heatmap grid
+    when it changed, at most every heat_interval.
+    """
+
+    def __init__(self, worker, status_q, slots: int = 4, max_tracks: int = 256,
+                 idle_frame_seconds: float = 1.0, heat_interval: float = 0.2):
+        self.ring = CameraShm.create(
+            shape=(worker.heatmap.h, worker.heatmap.w),
+            grid_shape=(worker.heatmap.gh, worker.heatmap.gw),
+            slots=slots, max_tracks=max_tracks,
+        )
+        self.status_q = status_q
+        self.idle_frame_seconds = float(idle_frame_seconds)
+        self.heat_interval = float(heat_interval)
+        self._last_frame = 0.0
+        self._last_heat = 0.0
+        self._heat_version = -1
+        self._names = {}
+        self.frames_written = 0
+
+    def publish(self, w, now: float, frame: np.ndarray, tracks: TrackBatch):
+        ctl = self.ring.ctl
+        ctl[shmring.OCCUPANCY] = w.current_occupancy
+        ctl[shmring.FPS_TARGET] = w.fps_target
+        ctl[shmring.FPS_ACTUAL] = w.fps_actual
+        ctl[shmring.FPS_MIN] = w.fps_min
+        ctl[shmring.FPS_MAX] = w.fps_max
+        ctl[shmring.LOOP_MS] = w.loop_ms
+        ctl[shmring.HEARTBEAT] = time.time()
+
+        if ctl[shmring.VIEWERS] > 0 or now - self._last_frame >= self.idle_frame_seconds:
+            if len(tracks):
+                self._learn_names(w.id, tracks)
+            self.ring.write_frame(now, frame, tracks)
+            self._last_frame = now
+            self.frames_written += 1
+
+        hm = w.heatmap
+        if hm.version != self._heat_version and now - self._last_heat >= self.heat_interval:
+            self.ring.write_heat(hm.grid, hm.version)
+            self._heat_version = hm.version
+            self._last_heat = now
+
+    def _learn_names(self, cam_id: str, tracks: TrackBatch):
+        # overlay rows carry class ids; names travel once over the queue
+        new = {}
+        for ci, name in zip(tracks.class_ids.tolist(), tracks.class_names):
+            if ci not in self._names:
+                self._names[ci] = new[ci] = name
+        if new:
+            self.status_q.put(("names", cam_id, new))
+
+    def close(self):
+        self.ring.close()
+
+
+def run_group(group: int, cams: List[dict], status_q, stop_evt, ctl_q=None, stats_interval: float = 2.0):
+    """Worker process entry point: run `cams` until stop_evt is set."""
+    import worker as wk
+
+    ecfg = wk.CFG.get("execution") or {}
+    spool = (wk.CFG.get("events") or {}).get("spool_dir", "spool")
+    infer = wk.make_inference()
+    bus = wk.make_event_bus(spool_dir=os.path.join(spool, f"proc{group}"))  # one spool writer per directory
+    gov = wk.make_governor()
+
+    running = []
+    for cam in cams:
+        try:
+            w = wk.make_worker(cam, infer, bus)
+        except Exception as e:
+            status_q.put(("error", cam["id"], str(e)))
+            continue
+        w.publisher = ShmPublisher(
+            w, status_q,
+            slots=ecfg.get("ring_slots", 4),
+            idle_frame_seconds=ecfg.get("idle_frame_seconds", 1.0),
+        )
+        arch = w.heatmap.archive
+        status_q.put(("ready", w.id, {
+            "group": group,
+            "pid": os.getpid(),
+            "layout": w.publisher.ring.layout(),
+            "frame_size": (w.heatmap.w, w.heatmap.h),
+            "blur_ksize": w.heatmap.blur_ksize,
+            "archive": {"root": os.path.dirname(arch.dir), "interval_seconds": arch.interval} if arch else None,
+        }))
+        if gov is not None:
+            gov.register(w)
+        w.start()
+        running.append(w)
+        print(f"[proc{group}] started worker for {w.id} (source={cam['source']})")
+
+    next_stats = time.time() + stats_interval
+    try:
+        while not stop_evt.wait(0.25):
+            while ctl_q is not None:
+                try:
+                    kind, data = ctl_q.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == "config":  # validated by the API process
+                    wk.CFG.clear()
+                    wk.CFG.update(data)
+                    for w in running:
+                        w.apply_config(data)
+                    print(f"[proc{group}] config reloaded")
+            if time.time() < next_stats:
+                continue
+            next_stats = time.time() + stats_interval
+            status_q.put(("stats", group, {
+                "pid": os.getpid(),
+                "inference": infer.stats(),
+                "events": bus.stats(),
+                "cameras": {w.id: w.metrics() for w in running},
+            }))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for w in running:
+            w.stop()
+        for w in running:
+            w.join(timeout=2.0)
+            w.publisher.close()
+        infer.stop()
+        bus.stop()
+        if gov is not None:
+            gov.stop()
+
+
+# ---------- API-process side ----------
+class SharedHeatmap:
+    """The part of HeatmapAccumulator the /heatmap endpoints use, read from shared memory."""
+
+    def __init__(self, ring: CameraShm, width: int, height: int, blur_ksize: int, archive: Optional[HeatmapArchive] = None):
+        self.ring = ring
+        self.w, self.h = int(width), int(height)
+        self.gw, self.gh = ring.gw, ring.gh
+        self.blur_ksize = blur_ksize
+        self.archive = archive
+
+    @property
+    def version(self) -> int:
+        return int(self.ring.ctl[shmring.HEAT_VERSION])
+
+    @property
+    def grid(self) -> np.ndarray:
+        return self.ring.read_heat()[1]
+
+    def render(self, base_gray=None, palette: str = "turbo", alpha: float = 0.6, **kw) -> np.ndarray:
+        return render_grid(self.grid, self.w, self.h, blur_ksize=self.blur_ksize, palette=palette,
+                           alpha=alpha, base_gray=base_gray, **kw)
+
+
+class RemoteCamera:
+    """API-side stand-in for a CameraWorker running in a worker process."""
+
+    def __init__(self, cam_id: str, info: dict, zones_cfg, overlay_cfg):
+        self.id = cam_id
+        self.group = info["group"]
+        self.pid = info["pid"]
+        self.ring = CameraShm.attach(**info["layout"])
+        w, h = info["frame_size"]
+        self.names: Dict[int, str] = {}
+        self.zones = Zones(zones_cfg or [], index=ZoneIndex(zones_cfg or [], width=w, height=h))
+        self.show_zones = overlay_cfg.get("show_zones", True)
+        self.hub = FrameHub(quality=80, render=self._render)
+
+        archive = None
+        if info.get("archive"):
+            a = info["archive"]
+            archive = HeatmapArchive(root=a["root"], camera_id=cam_id, shape=(self.ring.gh, self.ring.gw),
+                                     interval_seconds=a["interval_seconds"], frame_size=(w, h), readonly=True)
+        self.heatmap = SharedHeatmap(self.ring, w, h, info["blur_ksize"], archive)
+
+        self._stopping = False
+        self._seq = 0
+        self._ctx = None
+        self._metrics = {}
+        self._attached = time.time()
+
+    # CameraWorker attributes, straight from the control block
+    @property
+    def current_occupancy(self) -> int:
+        return int(self.ring.ctl[shmring.OCCUPANCY])
+
+    @property
+    def fps_target(self) -> float:
+        return float(self.ring.ctl[shmring.FPS_TARGET])
+
+    @property
+    def fps_actual(self) -> float:
+        return float(self.ring.ctl[shmring.FPS_ACTUAL])
+
+    @property
+    def fps_min(self) -> float:
+        return float(self.ring.ctl[shmring.FPS_MIN])
+
+    @property
+    def fps_max(self) -> float:
+        return float(self.ring.ctl[shmring.FPS_MAX])
+
+    @property
+    def loop_ms(self) -> float:
+        return float(self.ring.ctl[shmring.LOOP_MS])
+
+    @property
+    def last_ctx(self) -> Optional[FrameContext]:
+        # copy the newest slot; if the worker overwrote it meanwhile, take the next newest
+        for _ in range(3):
+            got = self.ring.read()
+            if got is None:
+                return self._ctx
+            seq, ts, frame, _ = got
+            if self._ctx is not None and self._ctx.seq == seq:
+                return self._ctx
+            pixels = frame.copy()  # ctx memoizes, so it gets its own pixels
+            if self.ring.valid(seq):
+                self._ctx = FrameContext(pixels, ts, seq)
+                break
+        return self._ctx
+
+    @property
+    def heartbeat_age(self) -> float:
+        """Seconds since the worker process last published a frame of this camera."""
+        return time.time() - max(self._attached, float(self.ring.ctl[shmring.HEARTBEAT]))
+
+    def set_zones(self, zones_cfg, overlay_cfg):
+        w, h = self.heatmap.w, self.heatmap.h
+        self.zones = Zones(zones_cfg or [], index=ZoneIndex(zones_cfg or [], width=w, height=h))
+        self.show_zones = overlay_cfg.get("show_zones", True)
+
+    def poll(self):
+        """Tell the worker whether frames are wanted; hand new ones to the hub."""
+        self.ring.ctl[shmring.VIEWERS] = len(self.hub.subscribers)
+        seq = self.ring.seq
+        if seq != self._seq:
+            self._seq = seq
+            self.hub.publish(seq)
+
+    def _tracks(self, rows: np.ndarray) -> TrackBatch:
+        return TrackBatch(
+            ids=rows[:, 0], boxes=rows[:, 1:5], class_ids=rows[:, 5], confs=rows[:, 6], lost=rows[:, 7],
+            class_names=[self.names.get(int(c), str(int(c))) for c in rows[:, 5]],
+        )
+
+    def _render(self, seq: int) -> np.ndarray:
+        # draw straight from the ring slot; if the worker lapped us meanwhile, redo with the newest
+        out = None
+        for _ in range(3):
+            got = self.ring.read(seq) or self.ring.read()
+            if got is None:
+                break
+            seq, _, frame, rows = got
+            out = render_overlay(OverlaySnapshot(frame, self._tracks(rows), self.zones if self.show_zones else None))
+            if self.ring.valid(seq):
+                break
+            seq = self.ring.seq
+        return out if out is not None else np.zeros((self.ring.h, self.ring.w, 3), np.uint8)
+
+    def metrics(self) -> dict:
+        return dict(self._metrics, process=self.group)
+
+    def stop(self):
+        self._stopping = True
+        self.hub.close()
+
+    def close(self):
+        self._ctx = None
+        self.ring.close()
+
+
+class WorkerProcesses:
+    """Starts the worker processes, then keeps RemoteCameras fed and reports their health."""
+
+    def __init__(self, cams: List[dict], zones_cfg, overlay_cfg, cameras_per_process: int = 1,
+                 start_timeout: float = 120.0, poll_ms: float = 5.0, stale_seconds: float = 5.0,
+                 on_state: Optional[Callable[[str, str, Optional[str]], None]] = None):
+        n = max(1, int(cameras_per_process))
+        self.groups = [cams[i:i + n] for i in range(0, len(cams), n)]
+        self.zones_cfg = zones_cfg
+        self.overlay_cfg = overlay_cfg
+        self.start_timeout = float(start_timeout)
+        self.poll_s = max(0.001, float(poll_ms) / 1000.0)
+        # a camera whose heartbeat is older than this is reported stale (hung process / source)
+        self.stale_seconds = float(stale_seconds)
+        self.on_state = on_state or (lambda cam_id, state, error=None: None)
+        self._stale = set()
+        # spawn: a clean interpreter per worker, same on Windows and Linux, and no
+        # fork of a process that already runs threads
+        self._mp = mp.get_context("spawn")
+        self._status = self._mp.Queue()
+        self._stop_evt = self._mp.Event()
+        self._ctl = [self._mp.Queue() for _ in self.groups]
+        self.procs: List[mp.Process] = []
+        self.cameras: Dict[str, RemoteCamera] = {}
+        self._group_stats: Dict[int, dict] = {}
+        self._dead = set()
+        self._stop = False
+
+    def start(self) -> Dict[str, RemoteCamera]:
+        for g, cams in enumerate(self.groups):
+            p = self._mp.Process(target=run_group, args=(g, cams, self._status, self._stop_evt, self._ctl[g]),
+                                 name=f"cv-proc{g}", daemon=True)
+            p.start()
+            self.procs.append(p)
+            print(f"[procs] worker process {g} (pid {p.pid}): {[c['id'] for c in cams]}")
+
+        # wait until every camera reported in (model load + capture open)
+        pending = {c["id"] for cams in self.groups for c in cams}
+        errors = {}
+        deadline = time.time() + self.start_timeout
+        while pending and time.time() < deadline:
+            if not any(p.is_alive() for p in self.procs):
+                break
+            try:
+                msg = self._status.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if msg[0] == "error":
+                pending.discard(msg[1])
+                errors[msg[1]] = msg[2]
+            else:
+                self._handle(msg)
+                if msg[0] == "ready":
+                    pending.discard(msg[1])
+        if errors or pending:
+            self.stop()
+            detail = "; ".join([f"{k}: {v}" for k, v in errors.items()] + [f"{k}: no response" for k in pending])
+            raise RuntimeError(f"[procs] worker processes failed to start: {detail}")
+
+        threading.Thread(target=self._listen, name="procs-status", daemon=True).start()
+        threading.Thread(target=self._poll, name="procs-poll", daemon=True).start()
+        return self.cameras
+
+    def _handle(self, msg):
+        kind, key, data = msg
+        if kind == "ready":
+            self.cameras[key] = RemoteCamera(key, data, self.zones_cfg, self.overlay_cfg)
+        elif kind == "names":
+            cam = self.cameras.get(key)
+            if cam is not None:
+                cam.names.update(data)
+        elif kind == "stats":
+            self._group_stats[key] = data
+            for cid, m in data["cameras"].items():
+                if cid in self.cameras:
+                    self.cameras[cid]._metrics = m
+        elif kind == "error":
+            print(f"[procs] {key}: {data}")
+
+    def _listen(self):
+        while not self._stop:
+            try:
+                msg = self._status.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            try:
+                self._handle(msg)
+            except Exception as e:
+                print(f"[procs] bad status message {msg[:2]}: {e}")
+
+    def _poll(self):
+        next_check = 0.0
+        while not self._stop:
+            for cam in list(self.cameras.values()):
+                cam.poll()
+            if time.time() >= next_check:
+                next_check = time.time() + 0.5
+                self._check_health()
+            time.sleep(self.poll_s)
+
+    def _check_health(self):
+        for g, p in enumerate(self.procs):
+            if g not in self._dead and not p.is_alive():
+                self._dead.add(g)
+                print(f"[procs] worker process {g} exited (code {p.exitcode})")
+                for c in self.groups[g]:
+                    if c["id"] in self.cameras:
+                        self.cameras[c["id"]].stop()
+                    self.on_state(c["id"], "failed", f"worker process exited (code {p.exitcode})")
+        for g, cams in enumerate(self.groups):
+            if g in self._dead:
+                continue
+            for c in cams:
+                cam = self.cameras.get(c["id"])
+                if cam is None:
+                    continue
+                age = cam.heartbeat_age
+                if age > self.stale_seconds and cam.id not in self._stale:
+                    self._stale.add(cam.id)
+                    print(f"[procs] {cam.id}: no heartbeat for {age:.1f} s")
+                    self.on_state(cam.id, "stale", f"no frame published for {age:.0f} s")
+                elif age <= self.stale_seconds and cam.id in self._stale:
+                    self._stale.discard(cam.id)
+                    print(f"[procs] {cam.id}: heartbeat back")
+                    self.on_state(cam.id, "ready")
+
+    def reload(self, cfg: dict):
+        """Hand a validated config to every worker process and redraw zones here."""
+        for q in self._ctl:
+            q.put(("config", cfg))
+        for cam in self.cameras.values():
+            cam.set_zones(cfg.get("zones", []), cfg.get("overlay") or {})
+
+    def stop(self):
+        self._stop = True
+        self._stop_evt.set()
+        for cam in self.cameras.values():
+            cam.stop()
+        for p in self.procs:
+            p.join(timeout=5.0)
+            if p.is_alive():
+                p.terminate()
+        for cam in self.cameras.values():
+            cam.close()
+
+    def stats(self) -> dict:
+        return {str(g): {
+            "pid": p.pid,
+            "alive": p.is_alive(),
+            "cameras": [c["id"] for c in self.groups[g]],
+            "inference": self._group_stats.get(g, {}).get("inference"),
+            "events": self._group_stats.get(g, {}).get("events"),
+        } for g, p in enumerate(self.procs)}